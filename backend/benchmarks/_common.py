@@ -0,0 +1,64 @@
+"""
+INEI Inventory - Utilidades compartidas por los benchmarks
+Los datos de prueba salen de generate_synthetic_data.py: mismos lotes
+deterministas que el generador a escala censal, pero generados en este
+proceso (los benchmarks pueblan decenas de miles de items, no millones).
+
+Cada benchmark fija DB_NAME antes de importar este módulo: `seed` vacía las
+colecciones generadas.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import bson
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import generate_synthetic_data as generator  # noqa: E402
+import server  # noqa: E402
+
+ESTADOS = generator.ESTADOS
+USERS_PER_SEDE = 2
+SEED_BATCH_SIZE = 5000
+
+def percentile(samples, pct: float) -> float:
+    """Percentil por rango más cercano; `samples` no necesita estar ordenado"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def use_generator(seed: int) -> list:
+    """Preparar el contexto del generador en este proceso; devuelve sus usuarios
+
+    Los usuarios no tienen contraseña: los benchmarks inician sesión como admin.
+    """
+    as_of = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    users = generator.build_users(seed, USERS_PER_SEDE, as_of, hashed_password="")
+    generator.init_worker(generator.build_context(seed, as_of, users))
+    return users
+
+def synthetic_items(start: int, count: int) -> list:
+    """Items [start, start + count) del generador (después de `use_generator`)
+
+    El DNI depende solo del índice, así que los items que un benchmark crea
+    no chocan con los poblados si usan índices a partir de `items`.
+    """
+    batch = generator.generate_batch(start, start, count)
+    return [bson.decode(raw) for raw in batch["inventory"]]
+
+async def seed(items: int, seed: int = 42):
+    """Reemplazar inventario, reparaciones, auditoría y usuarios no admin por datos sintéticos"""
+    users = use_generator(seed)
+    await generator.prepare_database(replace=True)
+    await server.db.users.insert_many(users, ordered=False)
+    for index, offset in enumerate(range(0, items, SEED_BATCH_SIZE)):
+        batch = generator.generate_batch(index, offset, min(SEED_BATCH_SIZE, items - offset))
+        for name, documents in batch.items():
+            if documents:
+                # Decodificados: mongomock-motor (modo memory) no acepta RawBSONDocument
+                await server.db[name].insert_many([bson.decode(raw) for raw in documents], ordered=False)
+    await generator.finish_load()
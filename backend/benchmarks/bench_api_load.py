@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Benchmark de carga de la API (extremo a extremo)
+Levanta la aplicación, puebla un inventario sintético y ejecuta escenarios
+concurrentes: tormenta de logins, sondeo del dashboard, creación de items,
+búsqueda, exportación Excel/PDF y backup. Guarda throughput y p50/p95/p99 de
+cada escenario en JSON y, si hay una línea base, la compara y termina con
+código 1 ante una regresión. Sin línea base (o si fue tomada con otro modo,
+tamaño o escala) termina con código 2, salvo con --save-baseline.
+
+Hay una línea base por modo: benchmarks/api_load_baseline_<modo>.json. La de
+memory viene incluida en el repositorio (--items 2000 --scale 0.2 --runs 2:
+con --runs N cada escenario se ejecuta N veces y se guarda el peor valor de
+cada métrica, porque los escenarios de pocas peticiones son ruidosos); las de
+spawn y url dependen del servidor de MongoDB y se fijan en cada máquina.
+
+Poblar borra el inventario, las reparaciones, la auditoría y los usuarios no
+admin de DB_NAME. Contra MongoDB (spawn y url) solo se hace si DB_NAME empieza
+por "inei_benchmark" o con --allow-wipe; para medir un servidor con datos
+reales, usar --skip-seed.
+
+Modos:
+    spawn   (por defecto) arranca `uvicorn server:app` contra MONGO_URL en un
+            directorio temporal (backups/ y reports/ no ensucian el repo)
+    url     usa un servidor ya en ejecución (mismo MONGO_URL/DB_NAME)
+    memory  ejecuta la app en este proceso sobre mongomock-motor (instalarlo
+            aparte); sin $text, así que la búsqueda por nombre se omite
+
+Uso:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_api_load.py --items 20000
+    python benchmarks/bench_api_load.py --save-baseline          # fijar la línea base
+    python benchmarks/bench_api_load.py --mode memory --items 2000 --scale 0.2   # contra la base incluida
+    python benchmarks/bench_api_load.py --mode memory --items 2000 --scale 0.2 --runs 2 --save-baseline
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+os.environ.setdefault("DB_NAME", "inei_benchmark_load")
+# Sin backups programados ni caché de reportes: cada exportación se genera
+os.environ.setdefault("BACKUP_ENABLED", "False")
+os.environ.setdefault("REPORT_CACHE_ENABLED", "False")
+
+from _common import BACKEND_DIR, percentile, seed, synthetic_items, use_generator  # noqa: E402
+import server  # noqa: E402
+
+BENCHMARK_DB_PREFIX = "inei_benchmark"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_load_baseline_{mode}.json")
+# Campos de `meta` que deben coincidir para que la comparación tenga sentido
+BASELINE_KEYS = ("mode", "items", "scale")
+
+# ----------------------------------------
+# Escenarios
+# ----------------------------------------
+# Cada llamada recibe (cliente, contexto, número de petición) y devuelve la
+# respuesta; el contexto lleva el token y los datos de muestra.
+
+async def login_request(client, ctx, i):
+    return await client.post("/api/auth/login", json={"username": ctx["username"], "password": ctx["password"]})
+
+async def dashboard_request(client, ctx, i):
+    path = "/api/stats" if i % 2 == 0 else "/api/notifications/alerts"
+    return await client.get(path, headers=ctx["headers"])
+
+async def create_item_request(client, ctx, i):
+    item = synthetic_items(ctx["next_index"] + i, 1)[0]
+    payload = {key: value.isoformat() if isinstance(value, datetime) else value
+               for key, value in item.items() if key != "_id"}
+    return await client.post("/api/inventory", headers=ctx["headers"], json=payload)
+
+async def search_request(client, ctx, i):
+    sample = ctx["samples"][i % len(ctx["samples"])]
+    queries = [
+        {"dni": sample["dni"]},
+        {"numero_serie": sample["numero_serie"][:7]},
+        {"telefono": sample["telefono"][:6], "estado": sample["estado"]},
+    ]
+    if ctx["text_search"]:
+        queries.append({"persona": " ".join(sample["persona"].split()[:2])})
+    return await client.post("/api/inventory/search", headers=ctx["headers"], json=queries[i % len(queries)])
+
+async def excel_request(client, ctx, i):
+    return await client.get("/api/inventory/export/excel/enhanced", headers=ctx["headers"])
+
+async def pdf_request(client, ctx, i):
+    return await client.get("/api/reports/inventory/pdf", headers=ctx["headers"])
+
+async def backup_request(client, ctx, i):
+    return await client.post("/api/admin/backup", headers=ctx["headers"])
+
+# (nombre, concurrencia, peticiones, llamada)
+SCENARIOS = [
+    ("login_storm", 50, 200, login_request),
+    ("dashboard_polling", 20, 1000, dashboard_request),
+    ("item_creation", 20, 500, create_item_request),
+    ("search", 20, 1000, search_request),
+    ("export_excel", 2, 4, excel_request),
+    ("export_pdf", 2, 4, pdf_request),
+    ("backup", 1, 2, backup_request),
+]
+
+async def run_scenario(client, ctx, concurrency: int, requests: int, call) -> dict:
+    """Lanzar `requests` peticiones con `concurrency` workers y resumir latencias"""
+    counter = itertools.count()
+    latencies, failures = [], []
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            try:
+                response = await call(client, ctx, i)
+                ok = response.status_code < 400
+                status = response.status_code
+            except httpx.HTTPError as e:
+                ok, status = False, type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                failures.append(status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(failures),
+        "error_rate": round(len(failures) / requests, 4) if requests else 0.0,
+        "error_samples": sorted({str(status) for status in failures})[:5],
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0
+    }
+
+# ----------------------------------------
+# Línea base
+# ----------------------------------------
+
+# Cómo combinar varias corridas de un escenario: el peor valor de cada métrica
+WORST_OF_RUNS = {"seconds": max, "throughput_rps": min, "p50_ms": max, "p95_ms": max, "p99_ms": max,
+                 "max_ms": max, "errors": max, "error_rate": max}
+
+def merge_runs(runs: list) -> dict:
+    """Combinar los resúmenes de un escenario en varias corridas (peor caso)"""
+    merged = dict(runs[0])
+    for key, pick in WORST_OF_RUNS.items():
+        merged[key] = pick(run[key] for run in runs)
+    merged["error_samples"] = sorted({sample for run in runs for sample in run["error_samples"]})[:5]
+    return merged
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """Regresiones: p95 o throughput peor que la base más la tolerancia, o más errores"""
+    regressions = []
+    print(f"\nComparación con la línea base del {baseline['meta']['timestamp']} (tolerancia {tolerance:.0%})")
+    for name, current in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"  {name:<20} sin línea base")
+            continue
+        p95_change = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        rps_change = current["throughput_rps"] / base["throughput_rps"] - 1 if base["throughput_rps"] else 0.0
+        print(f"  {name:<20} p95 {base['p95_ms']:9.1f} -> {current['p95_ms']:9.1f} ms ({p95_change:+.0%})  "
+              f"rps {base['throughput_rps']:8.1f} -> {current['throughput_rps']:8.1f} ({rps_change:+.0%})")
+        if p95_change > tolerance and current["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+        if rps_change < -tolerance:
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} rps")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name}: errores {base['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    return regressions
+
+# ----------------------------------------
+# Arranque de la aplicación
+# ----------------------------------------
+
+async def wait_until_ready(client, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if (await client.get("/api")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError("El servidor no respondió a tiempo")
+        await asyncio.sleep(0.5)
+
+def spawn_server(port: int, workdir: str) -> subprocess.Popen:
+    """uvicorn en un proceso aparte; hereda MONGO_URL y DB_NAME de este entorno"""
+    command = [sys.executable, "-m", "uvicorn", "server:app", "--app-dir", BACKEND_DIR,
+               "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=workdir, env=dict(os.environ))
+
+async def start_in_memory(workdir: str):
+    """Sustituir la base por mongomock-motor y ejecutar el arranque en este proceso"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("El modo memory necesita mongomock-motor: pip install mongomock-motor")
+    os.chdir(workdir)
+    server.db = AsyncMongoMockClient()[server.DB_NAME]
+    return httpx.ASGITransport(app=server.app)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la API")
+    parser.add_argument("--mode", choices=["spawn", "url", "memory"], default="spawn")
+    parser.add_argument("--url", default="http://localhost:8001", help="servidor para --mode url")
+    parser.add_argument("--port", type=int, default=8765, help="puerto para --mode spawn")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica el número de peticiones")
+    parser.add_argument("--only", nargs="*", help="escenarios a ejecutar (por defecto, todos)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--allow-wipe", action="store_true",
+                        help=f"poblar aunque DB_NAME no empiece por '{BENCHMARK_DB_PREFIX}' (borra sus datos)")
+    parser.add_argument("--runs", type=int, default=1, help="corridas de cada escenario; se guarda la peor")
+    parser.add_argument("--output", default=f"api_load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--baseline", help="por defecto benchmarks/api_load_baseline_<modo>.json")
+    parser.add_argument("--save-baseline", action="store_true", help="guardar estos resultados como línea base")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="ignorar subidas de p95 menores a esto (ruido en latencias muy bajas)")
+    args = parser.parse_args()
+    args.baseline = args.baseline or DEFAULT_BASELINE.format(mode=args.mode)
+    if (args.mode != "memory" and not args.skip_seed and not args.allow_wipe
+            and not server.DB_NAME.startswith(BENCHMARK_DB_PREFIX)):
+        parser.error(f"poblar borraría los datos de {server.DB_NAME}: usar una base '{BENCHMARK_DB_PREFIX}*', "
+                     f"--skip-seed o --allow-wipe")
+
+    workdir = tempfile.mkdtemp(prefix="inei_load_")
+    process = None
+    transport = None
+    base_url = args.url
+
+    if args.mode == "memory":
+        transport = await start_in_memory(workdir)
+        base_url = "http://benchmark"
+    if not args.skip_seed:
+        print(f"Poblando {args.items} items en {server.DB_NAME}...")
+        await seed(args.items, args.seed)
+    else:
+        use_generator(args.seed)
+    if args.mode == "memory":
+        await server.startup_event()
+    elif args.mode == "spawn":
+        process = spawn_server(args.port, workdir)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    limits = httpx.Limits(max_connections=100)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=600) as client:
+            await wait_until_ready(client, 60)
+            login = await client.post("/api/auth/login", json={"username": args.username, "password": args.password})
+            login.raise_for_status()
+            samples = await server.db.inventory.aggregate([{"$sample": {"size": 200}}]).to_list(length=200)
+            ctx = {
+                "username": args.username,
+                "password": args.password,
+                "headers": {"Authorization": f"Bearer {login.json()['access_token']}"},
+                "samples": samples or synthetic_items(0, 1),
+                "text_search": args.mode != "memory",
+                # Índices (y por lo tanto DNI) fuera del rango poblado y
+                # distintos entre corridas con --skip-seed
+                "next_index": args.items + int(time.time()) % 9000 * 1000
+            }
+
+            results = {
+                "meta": {
+                    "timestamp": datetime.now().isoformat(),
+                    "mode": args.mode,
+                    "items": args.items,
+                    "scale": args.scale,
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "cpus": os.cpu_count(),
+                    "runs": args.runs
+                },
+                "scenarios": {}
+            }
+            runs = {}
+            for run in range(1, args.runs + 1):
+                if args.runs > 1:
+                    print(f"Corrida {run}/{args.runs}")
+                for name, concurrency, requests, call in SCENARIOS:
+                    if args.only and name not in args.only:
+                        continue
+                    requests = max(1, int(requests * args.scale))
+                    summary = await run_scenario(client, ctx, concurrency, requests, call)
+                    # Los items creados en la corrida siguiente usan índices nuevos
+                    ctx["next_index"] += requests
+                    runs.setdefault(name, []).append(summary)
+                    print(f"{name:<20} {summary['throughput_rps']:8.1f} req/s  p50={summary['p50_ms']:8.1f}  "
+                          f"p95={summary['p95_ms']:8.1f}  p99={summary['p99_ms']:8.1f} ms  "
+                          f"errores={summary['errors']}/{requests} {' '.join(summary['error_samples'])}")
+            results["scenarios"] = {name: merge_runs(summaries) for name, summaries in runs.items()}
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if args.mode == "memory":
+            await server.shutdown_event()
+            os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados: {os.path.abspath(args.output)}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No hay línea base en {args.baseline}; usar --save-baseline para fijarla", file=sys.stderr)
+        return 2
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    mismatched = [key for key in BASELINE_KEYS if baseline["meta"].get(key) != results["meta"][key]]
+    if mismatched:
+        print("La línea base no es comparable: " + ", ".join(
+            f"{key}={baseline['meta'].get(key)} (ahora {results['meta'][key]})" for key in mismatched
+        ), file=sys.stderr)
+        return 2
+    regressions = compare_with_baseline(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print("\nREGRESIONES:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("Sin regresiones respecto de la línea base")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Benchmark de tormenta de logins
+Lanza logins concurrentes contra un servidor en ejecución y, al mismo tiempo,
+mide la latencia de un endpoint no relacionado (GET /api). Si bcrypt se
+ejecutara en el event loop, el p99 del endpoint no relacionado se dispararía.
+
+Uso:
+    uvicorn server:app --port 8001   # en otra terminal
+    python benchmarks/bench_login_storm.py --url http://localhost:8001 --logins 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+async def login_worker(client, queue, args, latencies, failures):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        response = await client.post("/api/auth/login", json={
+            "username": args.username, "password": args.password
+        })
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            failures.append(response.status_code)
+
+async def probe(client, stop, latencies, interval):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/api")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tormenta de logins")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        # Línea base: latencia de GET /api sin carga
+        idle = []
+        idle_stop = asyncio.Event()
+        idle_task = asyncio.create_task(probe(client, idle_stop, idle, args.probe_interval))
+        await asyncio.sleep(2)
+        idle_stop.set()
+        await idle_task
+
+        queue = asyncio.Queue()
+        for i in range(args.logins):
+            queue.put_nowait(i)
+
+        login_latencies, failures, loaded = [], [], []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, loaded, args.probe_interval))
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            login_worker(client, queue, args, login_latencies, failures)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe_task
+
+    print(f"Logins: {args.logins} en {elapsed:.2f}s ({args.logins / elapsed:.1f}/s), fallidos: {len(failures)}")
+    print(f"  login      p50={statistics.median(login_latencies):8.1f} ms  p99={percentile(login_latencies, 0.99):8.1f} ms")
+    print(f"GET /api sin carga   p50={statistics.median(idle):8.1f} ms  p99={percentile(idle, 0.99):8.1f} ms  (n={len(idle)})")
+    print(f"GET /api con logins  p50={statistics.median(loaded):8.1f} ms  p99={percentile(loaded, 0.99):8.1f} ms  (n={len(loaded)})")
+
+if __name__ == "__main__":
+    asyncio.run(main())
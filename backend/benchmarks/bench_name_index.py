@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Benchmark del índice de nombres en memoria
+Construye NameIndex con nombres sintéticos (con y sin tildes) y mide el
+tiempo de construcción y la latencia p50/p99 de las sugerencias: prefijos
+mientras se escribe, nombres completos y nombres con errores de tipeo.
+No necesita MongoDB.
+
+Uso:
+    python benchmarks/bench_name_index.py --names 1000000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from _common import percentile
+import server
+
+NOMBRES = ["José", "María", "Luis", "Ana", "Carlos", "Rosa", "Jorge", "Lucía", "Pedro", "Carmen",
+           "Juan", "Elena", "Miguel", "Sofía", "Andrés", "Raúl", "Inés", "Martín", "Julia", "Víctor"]
+APELLIDOS = ["Pérez", "Quispe", "Mamani", "Flores", "Huamán", "Rodríguez", "García", "Chávez", "Ramos",
+             "Núñez", "Condori", "Apaza", "Vargas", "Torres", "Cáceres", "Gutiérrez", "Ccori", "Yupanqui",
+             "Ticona", "Mendoza"]
+
+def vocabulary(rng: random.Random, size: int, base: list) -> list:
+    """Ampliar una lista base con variantes para acercarse a un padrón real"""
+    words = list(base)
+    suffixes = ["a", "o", "es", "ez", "ano", "ini", "illo", "ón", "ía", "er"]
+    while len(words) < size:
+        words.append(rng.choice(base) + rng.choice(suffixes) + rng.choice(["", "", "s", "n", "r"]))
+    return words
+
+def typo(word: str, rng: random.Random) -> str:
+    """Introducir un error: omitir, duplicar o cambiar una letra"""
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(["drop", "double", "swap"])
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + rng.choice("aeiourstn") + word[i + 1:]
+
+def summary(name: str, samples: list):
+    p50 = statistics.median(samples)
+    p99 = percentile(samples, 0.99)
+    print(f"{name:<26} p50={p50:7.2f} ms  p99={p99:7.2f} ms  (n={len(samples)})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de nombres")
+    parser.add_argument("--names", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    nombres = vocabulary(rng, 2000, NOMBRES)
+    apellidos = vocabulary(rng, 8000, APELLIDOS)
+    people = [
+        f"{rng.choice(nombres)} {rng.choice(nombres)} {rng.choice(apellidos)} {rng.choice(apellidos)}"
+        for _ in range(args.names)
+    ]
+
+    index = server.NameIndex("inventory", "inventory", "persona")
+    start = time.perf_counter()
+    index.load((str(i), name) for i, name in enumerate(people))
+    index.finish_load()
+    elapsed = time.perf_counter() - start
+    print(f"Construcción: {args.names} nombres en {elapsed:.2f}s "
+          f"({args.names / elapsed:,.0f} nombres/s) -> {index.metrics()}")
+
+    sample = rng.sample(people, args.queries)
+    scenarios = {
+        "prefijo (3 letras)": [name.split()[2][:3] for name in sample],
+        "nombre + prefijo": [f"{name.split()[0]} {name.split()[2][:4]}" for name in sample],
+        "nombre completo": sample,
+        "sin tildes": [server.unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+                       for name in sample],
+        "con error de tipeo": [" ".join(typo(word, rng) for word in name.split()[1:3]) for name in sample],
+    }
+    for name, queries in scenarios.items():
+        samples, hits = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            results = index.search(query, 10)
+            samples.append((time.perf_counter() - start) * 1000)
+            hits += bool(results)
+        summary(name, samples)
+        print(f"{'':<26} con resultados: {hits}/{len(queries)}")
+
+    # Actualizaciones incrementales
+    start = time.perf_counter()
+    for i in range(10000):
+        index.add(str(i), f"{rng.choice(nombres)} {rng.choice(apellidos)}")
+    print(f"Actualizaciones: {10000 / (time.perf_counter() - start):,.0f} por segundo")
+
+if __name__ == "__main__":
+    main()
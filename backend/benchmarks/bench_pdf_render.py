@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Benchmark de latencia durante el renderizado de PDF
+Pide /api/reports/inventory/pdf sobre un inventario grande y, mientras se
+renderiza, mide la latencia de GET /api y GET /api/auth/me. Con reportlab en
+el event loop, esas peticiones esperarían a que termine el PDF.
+
+Uso:
+    DB_NAME=inei_benchmark_pdf uvicorn server:app --port 8001   # en otra terminal
+    python benchmarks/bench_pdf_render.py --url http://localhost:8001 --items 50000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+# El benchmark borra y repuebla el inventario: nunca usar la base de producción
+os.environ.setdefault("DB_NAME", "inei_benchmark_pdf")
+
+from _common import percentile, seed  # noqa: E402
+
+async def probe(client, headers, stop, samples):
+    while not stop.is_set():
+        for path in ("/api", "/api/auth/me"):
+            start = time.perf_counter()
+            await client.get(path, headers=headers)
+            samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.02)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de renderizado PDF")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print(f"Poblando {args.items} items...")
+        await seed(args.items, args.seed)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client:
+        login = await client.post("/api/auth/login", json={"username": args.username, "password": args.password})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        samples = []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, headers, stop, samples))
+        start = time.perf_counter()
+        response = await client.get("/api/reports/inventory/pdf", headers=headers)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe_task
+
+    print(f"PDF: status={response.status_code} {len(response.content) / 1024 / 1024:.1f} MB en {elapsed:.1f}s")
+    print(f"Otras peticiones durante el render: n={len(samples)} "
+          f"p50={statistics.median(samples):.1f} ms  p99={percentile(samples, 0.99):.1f} ms  "
+          f"max={max(samples):.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Benchmark de /api/inventory/search
+Puebla un inventario sintético (500k items por defecto) y mide p50/p99 del
+buscador planificado frente a la búsqueda ingenua con una regex sin anclar
+por campo, que obliga a recorrer la colección.
+
+Uso:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_search.py --items 500000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import statistics
+import time
+
+os.environ.setdefault("DB_NAME", "inei_benchmark_search")
+
+from _common import ESTADOS, percentile, seed  # noqa: E402
+import server  # noqa: E402
+
+async def sample_queries(rng: random.Random, count: int) -> dict:
+    """Armar consultas representativas a partir de documentos reales"""
+    docs = await server.db.inventory.aggregate([{"$sample": {"size": count}}]).to_list(length=count)
+    S = server.InventorySearch
+    return {
+        "dni exacto": [S(dni=d["dni"]) for d in docs],
+        "prefijo serie": [S(numero_serie=d["numero_serie"][:7]) for d in docs],
+        "prefijo teléfono": [S(telefono=d["telefono"][:6]) for d in docs],
+        "prefijo IMEI + estado": [S(imei=d["imei"][:8], estado=d["estado"]) for d in docs if d.get("imei")],
+        "nombre (texto)": [S(persona=" ".join(d["persona"].split()[:2])) for d in docs],
+        "nombre + modelo": [S(persona=d["persona"], modelo=d["modelo"]) for d in docs],
+        "estado (poco selectivo)": [S(estado=rng.choice(ESTADOS)) for _ in docs],
+    }
+
+def naive_query(search) -> dict:
+    """Búsqueda ingenua: una regex sin anclar e insensible a mayúsculas por campo"""
+    clauses = []
+    for field, value in search.dict(exclude={"sort_by", "sort_order", "limit", "robado"}).items():
+        if value:
+            clauses.append({field: {"$regex": re.escape(value), "$options": "i"}})
+    return {"$and": clauses} if clauses else {}
+
+def summary(name: str, samples: list):
+    p50 = statistics.median(samples)
+    p99 = percentile(samples, 0.99)
+    print(f"{name:<28} p50={p50:9.2f} ms  p99={p99:9.2f} ms  (n={len(samples)})")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de inventario")
+    parser.add_argument("--items", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--naive-queries", type=int, default=10,
+                        help="consultas ingenuas por escenario (cada una recorre la colección)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if not args.skip_seed:
+        print(f"Poblando {args.items} items en {server.DB_NAME}...")
+        await seed(args.items, args.seed)
+
+    scenarios = await sample_queries(rng, args.queries)
+    for name, searches in scenarios.items():
+        samples, drivers = [], set()
+        for search in searches:
+            start = time.perf_counter()
+            _, plan = await server.search_inventory(search)
+            samples.append((time.perf_counter() - start) * 1000)
+            drivers.add(plan["driver"])
+        summary(f"{name}", samples)
+        print(f"{'':<28} guiado por: {', '.join(sorted(str(d) for d in drivers))}")
+
+        naive = []
+        for search in searches[:args.naive_queries]:
+            start = time.perf_counter()
+            await server.db.inventory.find(naive_query(search)).limit(server.SEARCH_DEFAULT_RESULTS).to_list(length=None)
+            naive.append((time.perf_counter() - start) * 1000)
+        summary(f"  regex por campo", naive)
+
+if __name__ == "__main__":
+    asyncio.run(main())
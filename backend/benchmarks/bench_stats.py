@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Benchmark de /api/stats
+Compara la latencia del cálculo secuencial original (diez consultas una tras
+otra) con el motor de estadísticas ($facet + consultas en paralelo + caché).
+
+Uso:
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_stats.py --items 50000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DB_NAME", "inei_benchmark_stats")
+
+from _common import percentile, seed  # noqa: E402
+import server  # noqa: E402
+
+async def legacy_stats(db):
+    """Réplica del cálculo original: consultas secuenciales"""
+    await db.users.count_documents({})
+    await db.users.count_documents({"is_active": True})
+    await db.inventory.count_documents({})
+    await db.inventory.count_documents({"estado": "bien"})
+    await db.inventory.count_documents({"estado": "mal estado"})
+    await db.inventory.count_documents({"estado": "en reparacion"})
+    await db.inventory.count_documents({"robado": True})
+    await db.repairs.count_documents({})
+    pipeline = [{"$group": {"_id": "$dispositivo", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}]
+    [doc async for doc in db.inventory.aggregate(pipeline)]
+    [doc async for doc in db.audit_logs.find().sort("timestamp", -1).limit(10)]
+
+async def measure(name: str, func, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    p50 = statistics.median(samples)
+    p99 = percentile(samples, 0.99)
+    print(f"{name:<32} p50={p50:8.2f} ms  p99={p99:8.2f} ms  (n={iterations})")
+    return p50
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de /api/stats")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    db = server.db
+    if not args.skip_seed:
+        print(f"Poblando {args.items} items en {server.DB_NAME}...")
+        await seed(args.items, args.seed)
+
+    before = await measure("secuencial (original)", lambda: legacy_stats(db), args.iterations)
+    after = await measure("$facet + gather", server.compute_system_stats, args.iterations)
+    cached = await measure("$facet + gather + caché", server.get_cached_system_stats, args.iterations)
+
+    print(f"\nMejora sin caché: {before / after:.1f}x  |  con caché: {before / max(cached, 1e-6):.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
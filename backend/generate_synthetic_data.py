@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Generador de datos sintéticos a escala censal
+Puebla la base configurada en .env (o DB_NAME) con items de inventario
+válidos según InventoryItemEnhanced, usuarios por sede, reparaciones y logs de
+auditoría coherentes entre sí, para dimensionar hardware y probar índices.
+
+El resultado es determinista para una misma semilla (y --batch-size): cada
+lote se genera con su propio generador aleatorio derivado de (semilla, nº de
+lote), así que no importa en qué proceso ni en qué orden se genere. Los lotes
+se construyen en paralelo en un pool de procesos, que devuelve BSON ya
+codificado; aquí solo se insertan con `insert_many` no ordenado y varios lotes
+en vuelo. Los índices se crean al final (más rápido que mantenerlos durante
+la carga); los DNI son únicos por construcción.
+
+Uso:
+    DB_NAME=inei_capacidad python generate_synthetic_data.py --items 1000000 --seed 2025
+    DB_NAME=inei_capacidad python generate_synthetic_data.py --items 5000000 --workers 8 --replace
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+import server
+
+MIN_ITEMS = 10000
+MAX_ITEMS = 5000000
+
+# (sede, código, peso relativo de equipos asignados)
+SEDES = [
+    ("Arequipa 06 - Socabaya", "AQP06", 4),
+    ("Arequipa 01 - Cercado", "AQP01", 5),
+    ("Lima 01 - Cercado de Lima", "LIM01", 12),
+    ("Lima 02 - San Juan de Lurigancho", "LIM02", 12),
+    ("Lima 03 - Comas", "LIM03", 9),
+    ("Lima 04 - Villa El Salvador", "LIM04", 8),
+    ("Callao 01 - Callao", "CAL01", 6),
+    ("La Libertad 01 - Trujillo", "LLI01", 7),
+    ("Piura 01 - Castilla", "PIU01", 7),
+    ("Lambayeque 01 - Chiclayo", "LAM01", 5),
+    ("Cusco 01 - Wanchaq", "CUS01", 5),
+    ("Puno 01 - Juliaca", "PUN01", 5),
+    ("Junín 01 - Huancayo", "JUN01", 5),
+    ("Cajamarca 01 - Cajamarca", "CAJ01", 5),
+    ("Áncash 01 - Huaraz", "ANC01", 4),
+    ("Loreto 01 - Iquitos", "LOR01", 4),
+    ("Ica 01 - Ica", "ICA01", 3),
+    ("Ayacucho 01 - Huamanga", "AYA01", 3),
+    ("Ucayali 01 - Callería", "UCA01", 2),
+    ("Tacna 01 - Tacna", "TAC01", 2),
+]
+
+# (dispositivo, modelo, prefijo de serie, tiene IMEI, valor estimado, proveedor, peso)
+CATALOGO = [
+    ("Tablet Samsung", "Galaxy Tab A8", "R9PT", True, 899.0, "Samsung Electronics Perú", 40),
+    ("Tablet Samsung", "Galaxy Tab A9+", "R9RW", True, 1049.0, "Samsung Electronics Perú", 15),
+    ("Tablet Lenovo", "Tab M10 Gen 3", "HA1K", True, 749.0, "Lenovo Perú", 20),
+    ("Celular Huawei", "Y9 Prime", "L5Y9", True, 699.0, "Huawei del Perú", 8),
+    ("Celular Samsung", "Galaxy A14", "R58T", True, 649.0, "Samsung Electronics Perú", 12),
+    ("Power Bank", "PowerTech 10000", "PTB", False, 89.0, "Distribuidora Andina", 5),
+]
+
+NOMBRES = ["José", "María", "Luis", "Ana", "Carlos", "Rosa", "Jorge", "Lucía", "Pedro", "Carmen",
+           "Juan", "Elena", "Miguel", "Sofía", "Andrés", "Raúl", "Inés", "Martín", "Julia", "Víctor",
+           "Manuel", "Patricia", "César", "Gladys", "Wilber", "Yeni", "Edwin", "Marleny", "Fredy", "Roxana",
+           "Alberto", "Milagros", "Hugo", "Flor", "Percy", "Nélida", "Walter", "Ruth", "Óscar", "Maribel"]
+APELLIDOS = ["Pérez", "Quispe", "Mamani", "Flores", "Huamán", "Rodríguez", "García", "Chávez", "Ramos", "Núñez",
+             "Condori", "Apaza", "Vargas", "Torres", "Cáceres", "Gutiérrez", "Ccori", "Yupanqui", "Ticona",
+             "Mendoza", "Sánchez", "Díaz", "Rojas", "Castillo", "Espinoza", "Vásquez", "Cruz", "Gómez",
+             "Salazar", "Paredes", "Álvarez", "Chambi", "Huanca", "Layme", "Coaquira", "Choque", "Villca",
+             "Palomino", "Medina", "Zevallos", "Delgado", "Córdova", "Ríos", "Aguilar", "Herrera", "Benavides",
+             "Cárdenas", "Ortiz", "Lozano", "Alarcón", "Tapia", "Calla", "Sucso", "Pari", "Cutipa", "Llerena",
+             "Manrique", "Begazo", "Talavera"]
+DOMINIOS = ["gmail.com", "gmail.com", "gmail.com", "hotmail.com", "outlook.com", "yahoo.com"]
+ESTADOS = ["bien", "mal estado", "en reparacion"]
+MOTIVOS_REPARACION = ["Pantalla rota", "No carga", "Batería hinchada", "Puerto USB dañado",
+                      "No enciende", "Táctil sin respuesta", "Falla de señal", "Botón de encendido dañado"]
+SOLUCIONES = ["Cambio de pantalla", "Cambio de batería", "Cambio de puerto de carga",
+              "Restablecimiento de fábrica", "Cambio de flex", "Equipo reemplazado"]
+USER_AGENTS = ["Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/124.0",
+               "Mozilla/5.0 (X11; Linux x86_64) Firefox/126.0",
+               "Mozilla/5.0 (Linux; Android 13) Chrome/124.0 Mobile"]
+
+# Permutación afín sobre los 90 millones de DNI de 8 cifras (10000000-99999999):
+# 48271 es coprimo con 90_000_000, así que índices distintos dan DNI distintos
+DNI_SPACE = 90000000
+DNI_MULTIPLIER = 48271
+
+def ascii_fold(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+def luhn_digit(digits: str) -> str:
+    """Dígito verificador de Luhn (el último dígito de un IMEI)"""
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+def seeded_object_id(rng: random.Random, moment: datetime) -> ObjectId:
+    """ObjectId reproducible: marca de tiempo real + 8 bytes del generador"""
+    return ObjectId(int(moment.timestamp()).to_bytes(4, "big") + rng.randbytes(8))
+
+def build_users(seed: int, users_per_sede: int, as_of: datetime, hashed_password: str) -> list:
+    """Operadores y usuarios de consulta por sede (el admin lo crea el servidor)"""
+    rng = random.Random(f"{seed}:users")
+    users = []
+    for sede, code, _ in SEDES:
+        for k in range(users_per_sede):
+            created_at = as_of - timedelta(days=rng.randrange(200, 400))
+            nombre, apellido = rng.choice(NOMBRES), rng.choice(APELLIDOS)
+            username = f"{code.lower()}.{ascii_fold(nombre)}{k:03d}"
+            users.append({
+                "_id": seeded_object_id(rng, created_at),
+                "username": username,
+                "email": f"{username}@inei.gob.pe",
+                "full_name": f"{nombre} {apellido} {rng.choice(APELLIDOS)}",
+                "role": server.UserRole.READONLY if k % 10 == 9 else server.UserRole.OPERATOR,
+                "is_active": rng.random() > 0.03,
+                "sede": sede,
+                "hashed_password": hashed_password,
+                "created_at": created_at
+            })
+    return users
+
+# ----------------------------------------
+# Generación por lotes (procesos del pool)
+# ----------------------------------------
+
+_context: dict = {}
+
+def init_worker(context: dict):
+    _context.update(context)
+
+def audit_entry(rng: random.Random, user: dict, action: str, resource_type: str, resource_id: str,
+                details: dict, moment: datetime) -> dict:
+    return {
+        "_id": seeded_object_id(rng, moment),
+        "user_id": user["id"],
+        "username": user["username"],
+        "action": action,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        "details": details,
+        "ip_address": f"10.{rng.randrange(1, 40)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+        "user_agent": rng.choice(USER_AGENTS),
+        "timestamp": moment,
+        "sede": user["sede"]
+    }
+
+def generate_batch(batch_index: int, start: int, count: int) -> dict:
+    """Generar los items [start, start + count) con sus reparaciones y auditoría
+
+    Devuelve listas de documentos BSON ya codificados por colección.
+    """
+    ctx = _context
+    rng = random.Random(f"{ctx['seed']}:batch:{batch_index}")
+    as_of = ctx["as_of"]
+    procurement_start = ctx["procurement_start"]
+    sede_weights = ctx["sede_weights"]
+    catalog_weights = [entry[6] for entry in CATALOGO]
+    estado_weights = ctx["estado_weights"]
+    inventory, repairs, audit_logs = [], [], []
+
+    for i in range(start, start + count):
+        sede_index = rng.choices(range(len(SEDES)), weights=sede_weights)[0]
+        sede, code, _ = SEDES[sede_index]
+        user = rng.choice(ctx["users_by_sede"][sede_index])
+        dispositivo, modelo, serial_prefix, has_imei, valor, proveedor, _ = rng.choices(CATALOGO, weights=catalog_weights)[0]
+
+        nombre = rng.choice(NOMBRES)
+        segundo = f" {rng.choice(NOMBRES)}" if rng.random() < 0.6 else ""
+        apellido1, apellido2 = rng.choice(APELLIDOS), rng.choice(APELLIDOS)
+        dni = str(10000000 + (i * DNI_MULTIPLIER + ctx["dni_offset"]) % DNI_SPACE)
+
+        fecha_compra = procurement_start + timedelta(days=rng.randrange(180))
+        fecha_entrega = fecha_compra + timedelta(days=rng.randrange(10, 120), minutes=rng.randrange(600, 1080))
+        fecha_entrega = min(fecha_entrega, as_of - timedelta(days=1))
+        updated_at = fecha_entrega + timedelta(seconds=rng.randrange(max(int((as_of - fecha_entrega).total_seconds()), 1)))
+        estado = rng.choices(ESTADOS, weights=estado_weights)[0]
+        motivo = rng.choice(MOTIVOS_REPARACION) if estado == "en reparacion" else ""
+        imei = None
+        if has_imei:
+            body = f"35{rng.randrange(10 ** 12):012d}"
+            imei = body + luhn_digit(body)
+
+        item_id = seeded_object_id(rng, fecha_entrega)
+        item = {
+            "_id": item_id,
+            "persona": f"{nombre}{segundo} {apellido1} {apellido2}",
+            "dni": dni,
+            "dispositivo": dispositivo,
+            "control_patrimonial": f"CP-{code}-{i:07d}",
+            "modelo": modelo,
+            "numero_serie": f"{serial_prefix}{rng.randrange(16 ** 8):08X}",
+            "imei": imei,
+            "funda_tablet": dispositivo.startswith("Tablet") and rng.random() < 0.9,
+            "plan_datos": has_imei and rng.random() < 0.7,
+            "power_tech": rng.random() < 0.25,
+            "telefono": f"9{rng.randrange(10 ** 8):08d}",
+            "correo_personal": f"{ascii_fold(nombre)}.{ascii_fold(apellido1)}{dni[-4:]}@{rng.choice(DOMINIOS)}",
+            "fecha_entrega": fecha_entrega,
+            "estado": estado,
+            "robado": rng.random() < ctx["robado_rate"],
+            "motivo_reparacion": motivo,
+            "ubicacion_actual": f"Sede {sede}",
+            "responsable_entrega": user["full_name"],
+            "observaciones": rng.choice(["", "", "", "Entregado con cargador", "Pantalla con rayones leves"]),
+            "valor_estimado": valor,
+            "garantia_vence": fecha_compra + timedelta(days=rng.choice([365, 730])),
+            "proveedor": proveedor,
+            "fecha_compra": fecha_compra,
+            "created_by": user["username"],
+            "updated_by": user["username"],
+            "created_at": fecha_entrega,
+            "updated_at": updated_at
+        }
+        inventory.append(bson.encode(item))
+        audit_logs.append(bson.encode(audit_entry(
+            rng, user, "CREATE", "inventory", str(item_id),
+            {"persona": item["persona"], "dispositivo": dispositivo}, fecha_entrega
+        )))
+        if updated_at > fecha_entrega and rng.random() < ctx["audit_update_rate"]:
+            audit_logs.append(bson.encode(audit_entry(
+                rng, user, "UPDATE", "inventory", str(item_id), {"dni": dni}, updated_at
+            )))
+
+        # Reparaciones: una abierta si el item está en reparación y, aparte,
+        # reparaciones ya cerradas en su historial
+        history = []
+        if rng.random() < ctx["repair_rate"]:
+            ingreso = fecha_entrega + timedelta(seconds=rng.randrange(max(int((updated_at - fecha_entrega).total_seconds()), 1)))
+            cierre = min(ingreso + timedelta(hours=rng.lognormvariate(3.8, 0.8)), updated_at)
+            history.append((ingreso, cierre, rng.choice(MOTIVOS_REPARACION)))
+        if estado == "en reparacion":
+            history.append((updated_at, None, motivo))
+        for ingreso, cierre, repair_motivo in history:
+            repair_id = seeded_object_id(rng, ingreso)
+            repair = {
+                "_id": repair_id,
+                "persona": item["persona"],
+                "dni": dni,
+                "dispositivo": dispositivo,
+                "modelo": modelo,
+                "numero_serie": item["numero_serie"],
+                "motivo_reparacion": repair_motivo,
+                "observaciones": "",
+                "fecha_ingreso": ingreso,
+                "status": server.RepairStatus.CERRADA if cierre else server.RepairStatus.ABIERTA,
+                "fecha_cierre": cierre,
+                "created_by": user["username"],
+                "updated_by": user["username"],
+                "created_at": ingreso,
+                "updated_at": cierre or ingreso
+            }
+            if cierre:
+                repair["solucion"] = rng.choice(SOLUCIONES)
+                repair["closed_by"] = user["username"]
+            repairs.append(bson.encode(repair))
+            audit_logs.append(bson.encode(audit_entry(
+                rng, user, "CREATE", "repair", str(repair_id), {"dni": dni, "dispositivo": dispositivo}, ingreso
+            )))
+
+    return {"inventory": inventory, "repairs": repairs, "audit_logs": audit_logs}
+
+# ----------------------------------------
+# Carga
+# ----------------------------------------
+
+# inventory_stats no se borra: su `epoch` y `data_version` identifican los
+# reportes cacheados, y reiniciarlos podría hacer pasar por vigente un reporte
+# de los datos anteriores. finish_load reconcilia los contadores y sube la versión.
+GENERATED_COLLECTIONS = ["inventory", "repairs", "audit_logs", "repair_stats",
+                         "repair_devices", "alert_snapshots"]
+
+async def prepare_database(replace: bool):
+    """Vaciar las colecciones generadas (con --replace) o negarse si ya hay datos"""
+    if not replace:
+        if await server.db.inventory.estimated_document_count():
+            raise RuntimeError(f"{server.DB_NAME}.inventory ya tiene datos; usar --replace para reemplazarlos")
+        return
+    for name in GENERATED_COLLECTIONS:
+        await server.db.drop_collection(name)
+    await server.db.users.delete_many({"role": {"$ne": server.UserRole.ADMIN}})
+
+async def insert_batch(result: dict) -> dict:
+    """Insertar el BSON de un lote sin volver a codificarlo"""
+    counts = {}
+    for name, documents in result.items():
+        if documents:
+            await server.db[name].insert_many([RawBSONDocument(raw) for raw in documents], ordered=False)
+        counts[name] = len(documents)
+    return counts
+
+def validate_sample(result: dict, size: int):
+    """Comprobar una muestra contra los modelos de la API antes de seguir"""
+    for raw in result["inventory"][:size]:
+        server.InventoryItemEnhanced(**bson.decode(raw))
+    for raw in result["repairs"][:size]:
+        server.RepairCreate(**bson.decode(raw))
+    for raw in result["audit_logs"][:size]:
+        server.AuditLog(**bson.decode(raw))
+
+def build_context(seed: int, as_of: datetime, users: list, robado_rate: float = 0.015,
+                  repair_rate: float = 0.08, audit_update_rate: float = 0.3) -> dict:
+    """Parámetros compartidos por los lotes (lo que reciben los procesos en `init_worker`)"""
+    users_by_sede = [
+        [{"id": str(user["_id"]), "username": user["username"], "full_name": user["full_name"], "sede": user["sede"]}
+         for user in users if user["sede"] == sede and user["role"] == server.UserRole.OPERATOR]
+        for sede, _, _ in SEDES
+    ]
+    return {
+        "seed": seed,
+        "as_of": as_of,
+        "procurement_start": as_of - timedelta(days=540),
+        "sede_weights": [weight for _, _, weight in SEDES],
+        "estado_weights": [85, 9, 6],
+        "robado_rate": robado_rate,
+        "repair_rate": repair_rate,
+        "audit_update_rate": audit_update_rate,
+        "dni_offset": random.Random(f"{seed}:dni").randrange(DNI_SPACE),
+        "users_by_sede": users_by_sede
+    }
+
+async def finish_load():
+    """Índices y datos derivados, una vez insertados todos los lotes"""
+    await server.ensure_indexes()
+    await server.reconcile_inventory_stats()
+    # Aunque los contadores coincidan, los documentos son otros
+    await server.bump_inventory_data_version()
+    await server.reconcile_repair_stats()
+    await server.NotificationService.refresh_equipment_alerts()
+
+async def generate(args) -> dict:
+    as_of = datetime.fromisoformat(args.as_of)
+    start = time.perf_counter()
+    await prepare_database(args.replace)
+
+    hashed_password = server.get_password_hash(args.user_password)
+    users = build_users(args.seed, args.users_per_sede, as_of, hashed_password)
+    await server.db.users.insert_many(users, ordered=False)
+    context = build_context(args.seed, as_of, users, args.robado_rate, args.repair_rate, args.audit_update_rate)
+    totals = {"inventory": 0, "repairs": 0, "audit_logs": 0}
+    batches = [(index, offset, min(args.batch_size, args.items - offset))
+               for index, offset in enumerate(range(0, args.items, args.batch_size))]
+    semaphore = asyncio.Semaphore(args.inflight)
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(context,)) as pool:
+        async def run_batch(index: int, offset: int, count: int):
+            async with semaphore:
+                result = await loop.run_in_executor(pool, generate_batch, index, offset, count)
+                if index == 0 and args.validate:
+                    validate_sample(result, args.validate)
+                counts = await insert_batch(result)
+            for name, count in counts.items():
+                totals[name] += count
+            done = totals["inventory"]
+            if index % 20 == 0 or done == args.items:
+                elapsed = time.perf_counter() - start
+                print(f"  {done:>9,}/{args.items:,} items  {done / elapsed:,.0f} items/s", flush=True)
+
+        await asyncio.gather(*[run_batch(*batch) for batch in batches])
+    load_seconds = time.perf_counter() - start
+
+    print("Creando índices y conciliando contadores...", flush=True)
+    await finish_load()
+
+    documents = sum(totals.values()) + len(users)
+    return {
+        "database": server.DB_NAME,
+        "seed": args.seed,
+        "users": len(users),
+        **totals,
+        "documents": documents,
+        "load_seconds": round(load_seconds, 2),
+        "docs_per_second": round(documents / load_seconds),
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar datos sintéticos del inventario INEI")
+    parser.add_argument("--items", type=int, default=100000, help=f"entre {MIN_ITEMS:,} y {MAX_ITEMS:,}")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--as-of", default="2025-11-30", help="fecha de referencia de los datos (ISO)")
+    parser.add_argument("--users-per-sede", type=int, default=25)
+    parser.add_argument("--user-password", default="censo2025", help="contraseña de los usuarios generados")
+    parser.add_argument("--robado-rate", type=float, default=0.015)
+    parser.add_argument("--repair-rate", type=float, default=0.08, help="items con una reparación ya cerrada")
+    parser.add_argument("--audit-update-rate", type=float, default=0.3, help="items con un UPDATE auditado")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="procesos generadores")
+    parser.add_argument("--inflight", type=int, default=None, help="lotes en vuelo (por defecto workers + 2)")
+    parser.add_argument("--validate", type=int, default=200, help="documentos del primer lote validados con pydantic")
+    parser.add_argument("--replace", action="store_true", help="vaciar antes las colecciones generadas")
+    args = parser.parse_args()
+
+    if not MIN_ITEMS <= args.items <= MAX_ITEMS:
+        parser.error(f"--items debe estar entre {MIN_ITEMS:,} y {MAX_ITEMS:,}")
+    if args.users_per_sede < 2:
+        parser.error("--users-per-sede debe ser al menos 2")
+    args.inflight = args.inflight or args.workers + 2
+
+    print(f"Generando {args.items:,} items en {server.DB_NAME} (semilla {args.seed}, {args.workers} procesos)...")
+    try:
+        report = asyncio.run(generate(args))
+    except Exception as e:
+        print(f"Error generando datos: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+INEI Inventory - Restauración de backups
+Restaura un archivo inei_backup_*.zip (o la cadena completa de un backup
+incremental) en la base de datos configurada en .env.
+
+Uso:
+    python restore_backup.py backups/inei_backup_20250101_020000.zip
+    python restore_backup.py backups/inei_backup_20250103_020000_inc.zip --mode replace
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from server import restore_backup
+
+def main():
+    parser = argparse.ArgumentParser(description="Restaurar un backup del inventario INEI")
+    parser.add_argument("backup", help="Ruta al archivo inei_backup_*.zip")
+    parser.add_argument("--mode", choices=["merge", "replace"], default="merge",
+                        help="merge: conservar documentos existentes; replace: vaciar colecciones antes")
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(restore_backup(args.backup, args.mode))
+    except Exception as e:
+        print(f"Error restaurando backup: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"{report['documents']} documentos en {report['seconds']}s ({report['docs_per_second']} docs/s)")
+
+if __name__ == "__main__":
+    main()
@@ -3,28 +3,49 @@
 # BACKEND MEJORADO - server.py
 # ========================================
 
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks, status
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks, Header, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, Response, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field, validator, EmailStr
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, validator, EmailStr, ValidationError
+from typing import Optional, List, Dict, Any, AsyncIterator, Set
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, ExecutionTimeout
 import pandas as pd
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 import io
 import os
+import sys
 import json
+import re
+import unicodedata
+import base64
+import bisect
+import heapq
+import itertools
 import hashlib
-import jwt
+import hmac
+import contextvars
+from jose import jwt
 from passlib.context import CryptContext
 from loguru import logger
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 from decouple import config
 import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import time
+import threading
+import socket
 import tempfile
 import zipfile
 from reportlab.lib.pagesizes import letter, A4
@@ -74,6 +95,68 @@ ALGORITHM = config("ALGORITHM", default="HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=480, cast=int)
 MONGO_URL = config("MONGO_URL", default="mongodb://localhost:27017")
 DB_NAME = config("DB_NAME", default="inei_inventario_v2")
+AUDIT_LOGS_MAX_LIMIT = config("AUDIT_LOGS_MAX_LIMIT", default=500, cast=int)
+STATS_CACHE_TTL_SECONDS = config("STATS_CACHE_TTL_SECONDS", default=5, cast=float)
+PRINCIPAL_CACHE_SIZE = config("PRINCIPAL_CACHE_SIZE", default=1024, cast=int)
+PRINCIPAL_CACHE_TTL_SECONDS = config("PRINCIPAL_CACHE_TTL_SECONDS", default=30, cast=float)
+BCRYPT_ROUNDS = config("BCRYPT_ROUNDS", default=12, cast=int)
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=4, cast=int)
+PASSWORD_HASH_CONCURRENCY = config("PASSWORD_HASH_CONCURRENCY", default=PASSWORD_HASH_WORKERS, cast=int)
+AUDIT_BATCH_SIZE = config("AUDIT_BATCH_SIZE", default=200, cast=int)
+AUDIT_FLUSH_INTERVAL_SECONDS = config("AUDIT_FLUSH_INTERVAL_SECONDS", default=1.0, cast=float)
+AUDIT_QUEUE_MAX_SIZE = config("AUDIT_QUEUE_MAX_SIZE", default=10000, cast=int)
+AUDIT_ENQUEUE_TIMEOUT_SECONDS = config("AUDIT_ENQUEUE_TIMEOUT_SECONDS", default=2.0, cast=float)
+BACKUP_CHUNK_DOCS = config("BACKUP_CHUNK_DOCS", default=1000, cast=int)
+BACKUP_INCREMENTALS_PER_CHAIN = config("BACKUP_INCREMENTALS_PER_CHAIN", default=6, cast=int)
+BACKUP_RETENTION_CHAINS = config("BACKUP_RETENTION_CHAINS", default=4, cast=int)
+BACKUP_WATERMARK_OVERLAP_SECONDS = config("BACKUP_WATERMARK_OVERLAP_SECONDS", default=300, cast=int)
+RESTORE_BATCH_SIZE = config("RESTORE_BATCH_SIZE", default=1000, cast=int)
+RESTORE_PARALLEL_BATCHES = config("RESTORE_PARALLEL_BATCHES", default=4, cast=int)
+EXCEL_ROW_CHUNK = config("EXCEL_ROW_CHUNK", default=1000, cast=int)
+EXCEL_WIDTH_SAMPLE_ROWS = config("EXCEL_WIDTH_SAMPLE_ROWS", default=1000, cast=int)
+REPORTS_DIR = "reports"
+REPORT_WORKERS = config("REPORT_WORKERS", default=2, cast=int)
+REPORT_MAX_CONCURRENT = config("REPORT_MAX_CONCURRENT", default=REPORT_WORKERS, cast=int)
+REPORTS_RETENTION_HOURS = config("REPORTS_RETENTION_HOURS", default=24, cast=int)
+REPORT_CACHE_ENABLED = config("REPORT_CACHE_ENABLED", default=True, cast=bool)
+MAX_FILE_SIZE = config("MAX_FILE_SIZE", default=10485760, cast=int)
+IMPORT_CHUNK_ROWS = config("IMPORT_CHUNK_ROWS", default=5000, cast=int)
+IMPORT_BATCH_SIZE = config("IMPORT_BATCH_SIZE", default=1000, cast=int)
+BULK_MAX_ITEMS = config("BULK_MAX_ITEMS", default=5000, cast=int)
+UPLOAD_FOLDER = config("UPLOAD_FOLDER", default="uploads")
+JOBS_DIR = "jobs"
+JOB_WORKERS = config("JOB_WORKERS", default=2, cast=int)
+JOB_MAX_ATTEMPTS = config("JOB_MAX_ATTEMPTS", default=3, cast=int)
+JOB_PROGRESS_INTERVAL_SECONDS = config("JOB_PROGRESS_INTERVAL_SECONDS", default=1.0, cast=float)
+JOB_RETENTION_HOURS = config("JOB_RETENTION_HOURS", default=72, cast=int)
+JOB_LEASE_SECONDS = config("JOB_LEASE_SECONDS", default=60, cast=float)
+INVENTORY_STATS_RECONCILE_ATTEMPTS = config("INVENTORY_STATS_RECONCILE_ATTEMPTS", default=3, cast=int)
+INVENTORY_PAGE_SIZE = config("INVENTORY_PAGE_SIZE", default=100, cast=int)
+INVENTORY_MAX_PAGE_SIZE = config("INVENTORY_MAX_PAGE_SIZE", default=1000, cast=int)
+SEARCH_DEFAULT_RESULTS = config("SEARCH_DEFAULT_RESULTS", default=100, cast=int)
+SEARCH_MAX_RESULTS = config("SEARCH_MAX_RESULTS", default=500, cast=int)
+SEARCH_MAX_TIME_MS = config("SEARCH_MAX_TIME_MS", default=2000, cast=int)
+SEARCH_TEXT_SELECTIVITY = config("SEARCH_TEXT_SELECTIVITY", default=0.01, cast=float)
+SEARCH_TEXT_MIN_WORD_LENGTH = config("SEARCH_TEXT_MIN_WORD_LENGTH", default=5, cast=int)
+ALERTS_REFRESH_MINUTES = config("ALERTS_REFRESH_MINUTES", default=5, cast=int)
+ALERT_MAX_IDS = config("ALERT_MAX_IDS", default=50000, cast=int)
+ALERT_IDS_IN_SUMMARY = config("ALERT_IDS_IN_SUMMARY", default=100, cast=int)
+DASHBOARD_FEED_TICK_SECONDS = config("DASHBOARD_FEED_TICK_SECONDS", default=15, cast=float)
+DASHBOARD_FEED_DEBOUNCE_SECONDS = config("DASHBOARD_FEED_DEBOUNCE_SECONDS", default=0.5, cast=float)
+DASHBOARD_FEED_QUEUE_SIZE = config("DASHBOARD_FEED_QUEUE_SIZE", default=100, cast=int)
+DASHBOARD_HEARTBEAT_SECONDS = config("DASHBOARD_HEARTBEAT_SECONDS", default=20, cast=float)
+DASHBOARD_STREAM_TICKET_SECONDS = config("DASHBOARD_STREAM_TICKET_SECONDS", default=30, cast=int)
+NAME_INDEX_MIN_PREFIX = config("NAME_INDEX_MIN_PREFIX", default=2, cast=int)
+NAME_INDEX_MAX_EXPANSIONS = config("NAME_INDEX_MAX_EXPANSIONS", default=200, cast=int)
+NAME_INDEX_POOL = config("NAME_INDEX_POOL", default=2000, cast=int)
+NAME_INDEX_MATCH_CACHE_SIZE = config("NAME_INDEX_MATCH_CACHE_SIZE", default=4096, cast=int)
+NAME_INDEX_IDS_PER_NAME = config("NAME_INDEX_IDS_PER_NAME", default=20, cast=int)
+NAME_SUGGEST_MAX_LIMIT = config("NAME_SUGGEST_MAX_LIMIT", default=50, cast=int)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+EVENT_LOOP_LAG_INTERVAL_SECONDS = config("EVENT_LOOP_LAG_INTERVAL_SECONDS", default=0.5, cast=float)
+SLOW_REQUEST_LOG_SIZE = config("SLOW_REQUEST_LOG_SIZE", default=50, cast=int)
+PROFILE_MAX_SECONDS = config("PROFILE_MAX_SECONDS", default=60, cast=float)
+PROFILE_DEFAULT_INTERVAL_MS = config("PROFILE_DEFAULT_INTERVAL_MS", default=10, cast=float)
 
 # Configuración de logging
 logger.add("logs/inei_inventory_{time:YYYY-MM-DD}.log", 
@@ -82,6 +165,304 @@ logger.add("logs/inei_inventory_{time:YYYY-MM-DD}.log",
           level="INFO",
           format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}")
 
+# ========================================
+# MÉTRICAS (FORMATO PROMETHEUS)
+# ========================================
+
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+METRICS_JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    """Etiquetas en formato de exposición, con el escape que pide Prometheus"""
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Contador monotónico con etiquetas
+
+    Es seguro entre hilos: los listeners de pymongo lo actualizan desde los
+    hilos de Motor, no desde el event loop.
+    """
+    
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Histograma con buckets fijos por combinación de etiquetas
+
+    Cada serie guarda los conteos por bucket (no acumulados), la suma y el
+    total; los acumulados se calculan al exponer, así observar es O(log b).
+    """
+    
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, labels: tuple, value: float):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total, count in sorted(snapshot, key=lambda entry: entry[0]):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                extra = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, extra)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+class Gauge:
+    """Valor instantáneo leído al exponer desde una función
+
+    `collect` devuelve un número o un dict {tupla de etiquetas: valor}.
+    """
+    
+    def __init__(self, name: str, help_text: str, collect, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.collect = collect
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.warning(f"No se pudo leer la métrica {self.name}: {e}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Conjunto de métricas del proceso expuesto en /api/metrics"""
+    
+    def __init__(self):
+        self._metrics: List[Any] = []
+    
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+http_requests_total = metrics.register(Counter(
+    "inei_http_requests_total", "Peticiones HTTP por método, plantilla de ruta y código",
+    ("method", "route", "status")))
+http_request_duration = metrics.register(Histogram(
+    "inei_http_request_duration_seconds", "Latencia de las peticiones HTTP hasta el último byte",
+    ("method", "route")))
+mongo_command_duration = metrics.register(Histogram(
+    "inei_mongo_command_duration_seconds", "Duración de los comandos de MongoDB por colección y operación",
+    ("collection", "command"), METRICS_FAST_BUCKETS))
+mongo_command_failures = metrics.register(Counter(
+    "inei_mongo_command_failures_total", "Comandos de MongoDB fallidos por colección y operación",
+    ("collection", "command")))
+mongo_pool_checkout_wait = metrics.register(Histogram(
+    "inei_mongo_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool de MongoDB",
+    ("outcome",), METRICS_FAST_BUCKETS))
+event_loop_lag = metrics.register(Histogram(
+    "inei_event_loop_lag_seconds", "Retraso del event loop respecto de un temporizador periódico",
+    (), METRICS_FAST_BUCKETS))
+scheduler_job_duration = metrics.register(Histogram(
+    "inei_scheduler_job_duration_seconds", "Duración de los trabajos del scheduler",
+    ("job", "outcome"), METRICS_JOB_BUCKETS))
+backup_duration = metrics.register(Histogram(
+    "inei_backup_duration_seconds", "Duración de create_backup por tipo y resultado",
+    ("kind", "outcome"), METRICS_JOB_BUCKETS))
+
+class RequestTrace:
+    """Tiempo acumulado por tramo (mongo, openpyxl, reportlab...) de una petición
+
+    Los tramos pueden solaparse (consultas en paralelo con gather) y se suman
+    desde varios hilos, por eso cada uno guarda tiempo acumulado y veces.
+    """
+    
+    __slots__ = ("spans", "_lock")
+    
+    def __init__(self):
+        self.spans: Dict[str, list] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                span[0] += seconds
+                span[1] += 1
+
+# La traza de la petición en curso. Motor copia el contexto a sus hilos, así
+# que el listener de comandos la ve; asyncio.to_thread también lo copia.
+current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+@contextmanager
+def trace_span(name: str):
+    """Sumar la duración del bloque al tramo `name` de la petición en curso"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Mide cada comando de MongoDB a partir de los eventos de pymongo
+
+    El nombre de la colección solo viene en el evento de inicio, así que se
+    guarda hasta que llega el de fin (que trae la duración medida por el driver).
+    La duración también se suma a la traza de la petición en curso.
+    """
+    
+    def __init__(self):
+        self._pending: Dict[tuple, tuple] = {}
+    
+    def started(self, event):
+        command = event.command_name
+        if command == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(command)
+        if not isinstance(collection, str):
+            collection = "-"
+        self._pending[(event.connection_id, event.request_id)] = (collection, command)
+    
+    def _finish(self, event) -> tuple:
+        labels = self._pending.pop((event.connection_id, event.request_id), ("-", event.command_name))
+        seconds = event.duration_micros / 1e6
+        mongo_command_duration.observe(labels, seconds)
+        # Los eventos se publican en el hilo de la operación, con el contexto de la petición
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(f"mongo:{labels[0]}.{labels[1]}", seconds)
+        return labels
+    
+    def succeeded(self, event):
+        self._finish(event)
+    
+    def failed(self, event):
+        mongo_command_failures.inc(self._finish(event))
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Mide la espera por una conexión del pool y cuántas están en uso
+
+    El checkout ocurre de forma síncrona en el hilo de Motor que ejecuta la
+    operación, así que el inicio se guarda por hilo.
+    """
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.in_use = 0
+    
+    def _wait(self) -> Optional[float]:
+        start = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        return time.perf_counter() - start if start is not None else None
+    
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+    
+    def connection_checked_out(self, event):
+        wait = self._wait()
+        if wait is not None:
+            mongo_pool_checkout_wait.observe(("ok",), wait)
+            trace = current_trace.get()
+            if trace is not None:
+                trace.add("mongo:pool_wait", wait)
+        with self._lock:
+            self.in_use += 1
+    
+    def connection_check_out_failed(self, event):
+        wait = self._wait()
+        if wait is not None:
+            mongo_pool_checkout_wait.observe((str(event.reason),), wait)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+    
+    # Eventos del ciclo de vida del pool que no se miden
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_created(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        pass
+
+mongo_command_metrics = MongoCommandMetrics()
+mongo_pool_metrics = MongoPoolMetrics()
+metrics.register(Gauge(
+    "inei_mongo_pool_connections_in_use", "Conexiones de MongoDB prestadas en este momento",
+    lambda: mongo_pool_metrics.in_use))
+
 # Inicialización
 app = FastAPI(
     title="INEI Inventory Management System - Enhanced",
@@ -98,14 +479,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Search-Plan"],
 )
 
 # Seguridad
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+optional_security = HTTPBearer(auto_error=False)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS)
+
+# Pool dedicado a bcrypt: el hash es intencionalmente lento y no debe
+# ejecutarse en el event loop. El semáforo limita cuántos se calculan a la vez.
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
 
 # Base de datos
-client = AsyncIOMotorClient(MONGO_URL)
+client = AsyncIOMotorClient(MONGO_URL, event_listeners=[mongo_command_metrics, mongo_pool_metrics])
 db = client[DB_NAME]
 
 # Scheduler para tareas automáticas
@@ -164,7 +553,7 @@ class InventoryItemEnhanced(BaseModel):
     telefono: str = Field(..., min_length=9, max_length=15)
     correo_personal: EmailStr
     fecha_entrega: datetime = Field(default_factory=datetime.now)
-    estado: str = Field(..., regex="^(bien|mal estado|en reparacion)$")
+    estado: str = Field(..., pattern="^(bien|mal estado|en reparacion)$")
     robado: bool = Field(default=False)
     motivo_reparacion: Optional[str] = Field(default="")
     
@@ -195,6 +584,45 @@ class InventoryItemEnhanced(BaseModel):
             raise ValueError('Teléfono debe tener al menos 9 dígitos')
         return v
 
+class RepairCreate(BaseModel):
+    persona: str = Field(..., min_length=2, max_length=100)
+    dni: str = Field(..., min_length=8, max_length=8)
+    dispositivo: str = Field(..., min_length=2, max_length=100)
+    modelo: Optional[str] = Field(None, max_length=100)
+    numero_serie: Optional[str] = Field(None, max_length=100)
+    motivo_reparacion: str = Field(..., min_length=2, max_length=500)
+    observaciones: Optional[str] = None
+    fecha_ingreso: datetime = Field(default_factory=datetime.now)
+
+    @validator('dni')
+    def validate_dni(cls, v):
+        if not v.isdigit() or len(v) != 8:
+            raise ValueError('DNI debe tener exactamente 8 dígitos numéricos')
+        return v
+
+class RepairClose(BaseModel):
+    solucion: str = Field(..., min_length=2, max_length=500)
+    observaciones: Optional[str] = None
+
+class InventoryBulkCreate(BaseModel):
+    items: List[Dict[str, Any]]
+
+class InventorySearch(BaseModel):
+    persona: Optional[str] = None
+    dni: Optional[str] = None
+    dispositivo: Optional[str] = None
+    control_patrimonial: Optional[str] = None
+    modelo: Optional[str] = None
+    numero_serie: Optional[str] = None
+    imei: Optional[str] = None
+    telefono: Optional[str] = None
+    correo_personal: Optional[str] = None
+    estado: Optional[str] = None
+    robado: Optional[bool] = None
+    sort_by: str = "persona"
+    sort_order: str = Field(default="asc", pattern="^(asc|desc)$")
+    limit: Optional[int] = Field(None, ge=1)
+
 class AuditLog(BaseModel):
     id: Optional[str] = None
     user_id: str
@@ -218,9 +646,31 @@ class SystemStats(BaseModel):
     items_robados: int = 0
     total_repairs: int = 0
     devices_by_type: Dict[str, int] = Field(default_factory=dict)
+    items_by_sede: Dict[str, int] = Field(default_factory=dict)
     recent_activities: List[Dict[str, Any]] = Field(default_factory=list)
     system_health: Dict[str, Any] = Field(default_factory=dict)
 
+# ----------------------------------------
+# Cursores de paginación por keyset
+# ----------------------------------------
+# Los listados ordenados por (fecha, _id) descendente (logs de auditoría,
+# reparaciones) devuelven un cursor opaco con la clave del último documento;
+# la página siguiente empieza justo después, sin skip.
+
+def encode_keyset_cursor(timestamp: datetime, doc_id: ObjectId) -> str:
+    """Codificar (fecha, _id) del último documento de la página como cursor opaco"""
+    raw = json.dumps({"t": timestamp.isoformat(), "i": str(doc_id)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_keyset_cursor(cursor: str) -> tuple:
+    """Decodificar un cursor opaco a (fecha, _id); ValueError si es inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(raw["t"]), ObjectId(raw["i"])
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
 # ========================================
 # UTILIDADES DE AUTENTICACION
 # ========================================
@@ -242,13 +692,104 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_password_task(func, *args):
+    with trace_span("bcrypt"):
+        async with password_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(password_executor, func, *args)
+
+async def hash_password(password: str) -> str:
+    """Calcular el hash bcrypt fuera del event loop"""
+    return await _run_password_task(pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple:
+    """Verificar la contraseña fuera del event loop
+
+    Devuelve (válida, nuevo_hash). `nuevo_hash` no es None cuando el hash
+    almacenado usa un costo menor que BCRYPT_ROUNDS y debe reemplazarse.
+    """
+    return await _run_password_task(pwd_context.verify_and_update, plain_password, hashed_password)
+
+class PrincipalCache:
+    """Caché LRU/TTL de usuarios autenticados, indexada por (username, token)
+
+    Evita consultar `users` en cada petición autenticada. El TTL acota cuánto
+    tarda en aplicarse un cambio hecho fuera de `update_user` (por ejemplo,
+    directamente en la base de datos); `update_user` invalida explícitamente.
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _key(username: str, token: str) -> tuple:
+        return username, hashlib.sha256(token.encode("utf-8")).hexdigest()
+    
+    def get(self, username: str, token: str) -> Optional[dict]:
+        key = self._key(username, token)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[0])
+    
+    def put(self, username: str, token: str, user: dict):
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        key = self._key(username, token)
+        self._entries[key] = (dict(user), time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, username: str):
+        stale = [key for key in self._entries if key[0] == username]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+async def authenticate_token(token: str) -> dict:
+    """Resolver el usuario de un token JWT (lanza HTTPException 401 si no es válido)"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        # Los tickets de propósito único (p. ej. el del dashboard en vivo) no son tokens de sesión
+        if username is None or payload.get("purpose"):
             raise HTTPException(status_code=401, detail="Token inválido")
         
+        user = principal_cache.get(username, token)
+        if user is not None:
+            return user
+        
         user = await db.users.find_one({"username": username})
         if user is None:
             raise HTTPException(status_code=401, detail="Usuario no encontrado")
@@ -256,19 +797,145 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if not user.get("is_active", True):
             raise HTTPException(status_code=401, detail="Usuario inactivo")
         
+        principal_cache.put(username, token, user)
         return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
 
-async def require_role(required_roles: List[str]):
+def require_role(required_roles: List[str]):
     def role_checker(current_user: dict = Depends(get_current_user)):
         if current_user["role"] not in required_roles:
             raise HTTPException(status_code=403, detail="Permisos insuficientes")
         return current_user
     return role_checker
 
+class AuditLogWriter:
+    """Escritor en segundo plano de logs de auditoría
+
+    `log_activity` encola los documentos y esta tarea los inserta con
+    `insert_many` cuando se juntan AUDIT_BATCH_SIZE logs o pasan
+    AUDIT_FLUSH_INTERVAL_SECONDS. Si la cola (AUDIT_QUEUE_MAX_SIZE) está
+    llena, quien registra espera hasta AUDIT_ENQUEUE_TIMEOUT_SECONDS y, si
+    aún no hay espacio, inserta el log directamente (contrapresión, nunca
+    descarte). En el cierre ordenado se vacía la cola por completo.
+
+    Pérdida máxima ante una caída abrupta del proceso: los logs encolados
+    más el lote en vuelo, es decir, como mucho AUDIT_QUEUE_MAX_SIZE +
+    AUDIT_BATCH_SIZE registros o los últimos AUDIT_FLUSH_INTERVAL_SECONDS
+    de actividad con carga normal.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, batch_size: int, flush_interval: float, max_queue_size: int, enqueue_timeout: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed = 0
+        self.direct_writes = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Escritor de auditoría iniciado (lote={self.batch_size}, intervalo={self.flush_interval}s)")
+    
+    async def submit(self, document: Dict[str, Any]):
+        if not self.running:
+            await self._insert_direct(document)
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(document), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cola de auditoría llena; insertando log directamente")
+            await self._insert_direct(document)
+    
+    async def _insert_direct(self, document: Dict[str, Any]):
+        await db.audit_logs.insert_one(document)
+        self.direct_writes += 1
+    
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            await db.audit_logs.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error insertando lote de {len(batch)} logs de auditoría: {e}")
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            document = await self._queue.get()
+            if document is self._STOP:
+                return
+            batch = [document]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    document = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if document is self._STOP:
+                    stopping = True
+                    break
+                batch.append(document)
+            await self._flush(batch)
+            if stopping:
+                return
+    
+    async def stop(self):
+        """Detener la tarea y escribir todo lo pendiente en la cola
+
+        Se encola una marca de fin en lugar de cancelar la tarea, de modo que
+        todo lo encolado antes se escribe en orden antes de terminar.
+        """
+        if self._task is None:
+            return
+        await self._queue.put(self._STOP)
+        await self._task
+        self._task = None
+        
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+            if len(pending) >= self.batch_size:
+                await self._flush(pending)
+                pending = []
+        await self._flush(pending)
+        logger.info(f"Escritor de auditoría detenido: {self.written} logs escritos, {self.failed} fallidos")
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "failed": self.failed,
+            "direct_writes": self.direct_writes
+        }
+
+audit_writer = AuditLogWriter(
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL_SECONDS,
+    max_queue_size=AUDIT_QUEUE_MAX_SIZE,
+    enqueue_timeout=AUDIT_ENQUEUE_TIMEOUT_SECONDS
+)
+
 async def log_activity(user: dict, action: str, resource_type: str, 
                       resource_id: str = None, details: dict = None):
     """Registrar actividad del usuario para auditoría"""
@@ -283,7 +950,12 @@ async def log_activity(user: dict, action: str, resource_type: str,
             sede=user.get("sede", "Arequipa 06 - Socabaya")
         )
         
-        await db.audit_logs.insert_one(audit_log.dict())
+        document = audit_log.dict()
+        # El _id se asigna aquí para que el dashboard en vivo y la base
+        # identifiquen la misma entrada
+        document["_id"] = ObjectId()
+        await audit_writer.submit(document)
+        dashboard_feed.publish_activity(serialize_activity(document))
         logger.info(f"Actividad registrada: {user['username']} - {action} {resource_type}")
     except Exception as e:
         logger.error(f"Error registrando actividad: {e}")
@@ -308,13 +980,14 @@ async def register_user(user_data: UserCreate, current_user: dict = Depends(requ
             raise HTTPException(status_code=400, detail="Usuario o email ya existe")
         
         # Crear nuevo usuario
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await hash_password(user_data.password)
         user_dict = user_data.dict()
         user_dict.pop("password")
         user_dict["hashed_password"] = hashed_password
-        user_dict["created_at"] = datetime.now()
+        user_dict["created_at"] = user_dict["updated_at"] = datetime.now()
         
         result = await db.users.insert_one(user_dict)
+        user_name_index.add(str(result.inserted_id), user_dict["full_name"])
         
         # Log de actividad
         await log_activity(current_user, "CREATE", "user", str(result.inserted_id), 
@@ -335,7 +1008,13 @@ async def login(user_credentials: UserLogin):
         # Buscar usuario
         user = await db.users.find_one({"username": user_credentials.username})
         
-        if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+        password_valid, upgraded_hash = (False, None)
+        if user and user.get("hashed_password"):
+            password_valid, upgraded_hash = await verify_and_update_password(
+                user_credentials.password, user["hashed_password"]
+            )
+        
+        if not password_valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Credenciales incorrectas",
@@ -345,10 +1024,16 @@ async def login(user_credentials: UserLogin):
         if not user.get("is_active", True):
             raise HTTPException(status_code=401, detail="Usuario inactivo")
         
-        # Actualizar último login
+        # Actualizar último login (y el hash si cambió el costo de bcrypt)
+        now = datetime.now()
+        login_update = {"last_login": now, "updated_at": now}
+        if upgraded_hash:
+            login_update["hashed_password"] = upgraded_hash
+            logger.info(f"Hash de contraseña actualizado a {BCRYPT_ROUNDS} rondas: {user['username']}")
+        
         await db.users.update_one(
             {"_id": user["_id"]},
-            {"$set": {"last_login": datetime.now()}}
+            {"$set": login_update}
         )
         
         # Crear token
@@ -413,70 +1098,324 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 # ENDPOINTS DE INVENTARIO MEJORADOS
 # ========================================
 
-@app.get("/api/stats", response_model=SystemStats)
-async def get_enhanced_stats(current_user: dict = Depends(get_current_user)):
-    """Obtener estadísticas mejoradas del sistema"""
+# Caché de estadísticas: el dashboard las consulta periódicamente y todos los
+# usuarios ven los mismos valores, así que se comparte una sola copia.
+_stats_cache: Dict[str, Any] = {"stats": None, "expires_at": 0.0}
+_stats_lock = asyncio.Lock()
+
+# ----------------------------------------
+# Contadores materializados del inventario
+# ----------------------------------------
+# El documento `inventory_stats` (_id="inventory") guarda los totales por
+# estado, dispositivo y sede (ubicacion_actual). Cada escritura de inventario
+# lo actualiza con un único $inc atómico, así que leer las estadísticas cuesta
+# lo mismo con 1k que con 1M items. La conciliación programada lo reconstruye
+# a partir de la colección si detecta diferencias. El mismo documento lleva
+# `data_version`, que aumenta con cada escritura, y `epoch`, un id aleatorio
+# fijado al crearlo: juntos son la clave de caché de los reportes generados.
+# Si el documento se borra, la versión vuelve a empezar pero con otra época.
+
+INVENTORY_STATS_ID = "inventory"
+SIN_UBICACION = "Sin ubicación"
+
+def _new_data_epoch() -> str:
+    return str(ObjectId())
+
+def _stats_key(value: Any) -> str:
+    """Escapar un valor para usarlo como clave de subdocumento en MongoDB"""
+    return str(value).replace(".", "\uff0e").replace("$", "\uff04")
+
+def _stats_label(key: str) -> str:
+    """Revertir `_stats_key`"""
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def inventory_stats_delta(item: Dict[str, Any], sign: int = 1) -> Dict[str, int]:
+    """Incrementos que aporta (sign=1) o retira (sign=-1) un item a los contadores"""
+    delta = {
+        "total_items": sign,
+        f"por_estado.{_stats_key(item.get('estado'))}": sign,
+        f"por_dispositivo.{_stats_key(item.get('dispositivo'))}": sign,
+        f"por_sede.{_stats_key(item.get('ubicacion_actual') or SIN_UBICACION)}": sign
+    }
+    if item.get("robado"):
+        delta["robados"] = sign
+    return delta
+
+async def apply_inventory_stats_change(old_items: Optional[List[Dict[str, Any]]] = None,
+                                       new_items: Optional[List[Dict[str, Any]]] = None):
+    """Aplicar a `inventory_stats` el efecto de una escritura de inventario
+
+    `old_items` son los documentos tal como estaban antes (borrados o
+    actualizados) y `new_items` los documentos resultantes (insertados o
+    actualizados). Los incrementos, junto con el aumento de `data_version`,
+    se combinan en un solo update atómico.
+    """
+    increments: Dict[str, int] = {}
+    for item in old_items or []:
+        for key, value in inventory_stats_delta(item, -1).items():
+            increments[key] = increments.get(key, 0) + value
+    for item in new_items or []:
+        for key, value in inventory_stats_delta(item, 1).items():
+            increments[key] = increments.get(key, 0) + value
+    
+    increments = {key: value for key, value in increments.items() if value}
+    increments["data_version"] = 1
+    
     try:
-        # Estadísticas de usuarios
-        total_users = await db.users.count_documents({})
-        active_users = await db.users.count_documents({"is_active": True})
-        
-        # Estadísticas de inventario
-        total_items = await db.inventory.count_documents({})
-        items_bien = await db.inventory.count_documents({"estado": "bien"})
-        items_mal_estado = await db.inventory.count_documents({"estado": "mal estado"})
-        items_en_reparacion = await db.inventory.count_documents({"estado": "en reparacion"})
-        items_robados = await db.inventory.count_documents({"robado": True})
-        
-        # Estadísticas de reparaciones
-        total_repairs = await db.repairs.count_documents({})
-        
-        # Dispositivos por tipo
-        devices_pipeline = [
-            {"$group": {"_id": "$dispositivo", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
-        devices_cursor = db.inventory.aggregate(devices_pipeline)
-        devices_by_type = {doc["_id"]: doc["count"] async for doc in devices_cursor}
-        
-        # Actividades recientes
-        recent_activities_cursor = db.audit_logs.find().sort("timestamp", -1).limit(10)
-        recent_activities = []
-        async for log in recent_activities_cursor:
-            activity = {
-                "id": str(log["_id"]),
-                "username": log["username"],
-                "action": log["action"],
-                "resource_type": log["resource_type"],
-                "timestamp": log["timestamp"].isoformat(),
-                "details": log.get("details", {})
+        await db.inventory_stats.update_one(
+            {"_id": INVENTORY_STATS_ID},
+            {"$inc": increments, "$set": {"updated_at": datetime.now()},
+             "$setOnInsert": {"epoch": _new_data_epoch()}},
+            upsert=True
+        )
+    except Exception as e:
+        # La conciliación periódica corregirá la desviación
+        logger.error(f"Error actualizando contadores de inventario: {e}")
+    finally:
+        invalidate_stats_cache()
+
+async def compute_inventory_facets() -> Dict[str, Any]:
+    """Recorrer la colección y calcular los contadores en una sola agregación $facet"""
+    pipeline = [
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "por_estado": [{"$group": {"_id": "$estado", "count": {"$sum": 1}}}],
+            "robados": [{"$match": {"robado": True}}, {"$count": "count"}],
+            "por_dispositivo": [{"$group": {"_id": "$dispositivo", "count": {"$sum": 1}}}],
+            "por_sede": [{"$group": {"_id": "$ubicacion_actual", "count": {"$sum": 1}}}]
+        }}
+    ]
+    result = await db.inventory.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+    facets = result[0] if result else {}
+    
+    def grouped(name: str, default: Optional[str] = None) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for doc in facets.get(name, []):
+            value = doc["_id"]
+            if not value and default is not None:
+                value = default
+            key = _stats_key(value)
+            counts[key] = counts.get(key, 0) + doc["count"]
+        return counts
+    
+    total = facets.get("total") or [{"count": 0}]
+    robados = facets.get("robados") or [{"count": 0}]
+    
+    return {
+        "total_items": total[0]["count"],
+        "robados": robados[0]["count"],
+        "por_estado": grouped("por_estado"),
+        "por_dispositivo": grouped("por_dispositivo"),
+        "por_sede": grouped("por_sede", SIN_UBICACION)
+    }
+
+def _counters_equal(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Comparar dos juegos de contadores ignorando claves en cero"""
+    def normalized(counters):
+        return {
+            "total_items": counters.get("total_items", 0),
+            "robados": counters.get("robados", 0),
+            **{
+                f"{group}.{key}": value
+                for group in ("por_estado", "por_dispositivo", "por_sede")
+                for key, value in (counters.get(group) or {}).items() if value
             }
-            recent_activities.append(activity)
-        
-        # Salud del sistema
-        system_health = {
-            "database_connected": True,
-            "last_backup": "2024-07-29T10:00:00",  # Se actualizará con backup real
-            "disk_usage": "65%",
-            "memory_usage": "78%",
-            "uptime": "7 days, 14 hours"
         }
+    return normalized(a) == normalized(b)
+
+async def reconcile_inventory_stats() -> bool:
+    """Reconstruir `inventory_stats` desde la colección si se ha desviado
+
+    El recorrido puede tardar segundos y las escrituras siguen aplicando su
+    $inc mientras tanto. Solo se escribe el resultado si `data_version` no
+    cambió desde antes del recorrido (update condicionado a esa versión);
+    si cambió, el recorrido puede haber contado a medias esas escrituras y
+    se repite, hasta INVENTORY_STATS_RECONCILE_ATTEMPTS veces.
+
+    Devuelve True si hubo que corregir los contadores.
+    """
+    try:
+        for attempt in range(1, INVENTORY_STATS_RECONCILE_ATTEMPTS + 1):
+            start = time.perf_counter()
+            current = await db.inventory_stats.find_one({"_id": INVENTORY_STATS_ID}) or {}
+            version = current.get("data_version")
+            fresh = await compute_inventory_facets()
+            
+            if current and _counters_equal(current, fresh):
+                after = await get_inventory_data_version()
+                if after == (version or 0):
+                    logger.info(f"Contadores de inventario conciliados sin cambios "
+                                f"({time.perf_counter() - start:.2f}s)")
+                    return False
+                continue
+            
+            # Si hubo desviación, hubo escrituras no contabilizadas: nueva versión
+            try:
+                result = await db.inventory_stats.update_one(
+                    {"_id": INVENTORY_STATS_ID,
+                     "data_version": version if version is not None else {"$exists": False}},
+                    {"$set": {**fresh, "updated_at": datetime.now(), "reconciled_at": datetime.now()},
+                     "$inc": {"data_version": 1}, "$setOnInsert": {"epoch": _new_data_epoch()}},
+                    upsert=not current
+                )
+            except DuplicateKeyError:
+                # Otra escritura creó el documento durante el recorrido
+                continue
+            if not result.matched_count and not result.upserted_id:
+                continue
+            invalidate_stats_cache()
+            
+            if current:
+                logger.warning(f"Contadores de inventario desviados: total {current.get('total_items', 0)} "
+                               f"-> {fresh['total_items']}; reconstruidos")
+            else:
+                logger.info(f"Contadores de inventario inicializados: {fresh['total_items']} items")
+            return True
         
-        stats = SystemStats(
-            total_users=total_users,
-            active_users=active_users,
-            total_items=total_items,
-            items_bien=items_bien,
-            items_mal_estado=items_mal_estado,
-            items_en_reparacion=items_en_reparacion,
-            items_robados=items_robados,
-            total_repairs=total_repairs,
-            devices_by_type=devices_by_type,
-            recent_activities=recent_activities,
-            system_health=system_health
-        )
+        logger.warning(f"Contadores de inventario sin conciliar: hubo escrituras durante cada uno de los "
+                       f"{INVENTORY_STATS_RECONCILE_ATTEMPTS} recorridos; se reintentará en la próxima ejecución")
+        return False
+    
+    except Exception as e:
+        logger.error(f"Error conciliando contadores de inventario: {e}")
+        raise
+
+async def get_inventory_data_version() -> int:
+    """Versión de los datos del inventario (aumenta con cada escritura)"""
+    counters = await db.inventory_stats.find_one({"_id": INVENTORY_STATS_ID}, {"data_version": 1})
+    return (counters or {}).get("data_version", 0)
+
+async def get_inventory_data_snapshot() -> Dict[str, Any]:
+    """Época, versión y hora de la última escritura del inventario
+
+    Un documento anterior a `epoch` (o inexistente) recibe una época aquí.
+    """
+    projection = {"epoch": 1, "data_version": 1, "updated_at": 1}
+    counters = await db.inventory_stats.find_one({"_id": INVENTORY_STATS_ID}, projection)
+    if not counters or not counters.get("epoch"):
+        try:
+            await db.inventory_stats.update_one(
+                {"_id": INVENTORY_STATS_ID, "epoch": {"$exists": False}},
+                {"$set": {"epoch": _new_data_epoch()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Otra petición creó el documento a la vez
+            pass
+        counters = await db.inventory_stats.find_one({"_id": INVENTORY_STATS_ID}, projection)
+    return {
+        "epoch": counters["epoch"],
+        "data_version": counters.get("data_version", 0),
+        "updated_at": counters.get("updated_at")
+    }
+
+async def bump_inventory_data_version():
+    """Marcar el inventario como modificado sin tocar los contadores"""
+    await db.inventory_stats.update_one(
+        {"_id": INVENTORY_STATS_ID},
+        {"$inc": {"data_version": 1}, "$set": {"updated_at": datetime.now()},
+         "$setOnInsert": {"epoch": _new_data_epoch()}},
+        upsert=True
+    )
+
+async def read_inventory_stats() -> Dict[str, Any]:
+    """Leer los contadores materializados en el formato de SystemStats"""
+    counters = await db.inventory_stats.find_one({"_id": INVENTORY_STATS_ID})
+    if counters is None or "total_items" not in counters:
+        await reconcile_inventory_stats()
+        counters = await db.inventory_stats.find_one({"_id": INVENTORY_STATS_ID}) or {}
+    
+    def labeled(group: str) -> Dict[str, int]:
+        items = [(_stats_label(key), value) for key, value in (counters.get(group) or {}).items() if value > 0]
+        return dict(sorted(items, key=lambda kv: kv[1], reverse=True))
+    
+    por_estado = counters.get("por_estado") or {}
+    
+    return {
+        "total_items": counters.get("total_items", 0),
+        "items_bien": por_estado.get("bien", 0),
+        "items_mal_estado": por_estado.get("mal estado", 0),
+        "items_en_reparacion": por_estado.get("en reparacion", 0),
+        "items_robados": counters.get("robados", 0),
+        "devices_by_type": labeled("por_dispositivo"),
+        "items_by_sede": labeled("por_sede")
+    }
+
+def serialize_activity(log: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada de auditoría en el formato de `recent_activities`"""
+    return {
+        "id": str(log["_id"]),
+        "username": log["username"],
+        "action": log["action"],
+        "resource_type": log["resource_type"],
+        "timestamp": log["timestamp"].isoformat(),
+        "details": log.get("details", {})
+    }
+
+async def fetch_recent_activities(limit: int = 10) -> List[Dict[str, Any]]:
+    """Obtener las últimas actividades registradas en auditoría"""
+    recent_activities_cursor = db.audit_logs.find().sort("timestamp", -1).limit(limit)
+    return [serialize_activity(log) async for log in recent_activities_cursor]
+
+async def compute_system_stats() -> SystemStats:
+    """Calcular estadísticas lanzando en paralelo las consultas independientes"""
+    total_users, active_users, total_repairs, inventory, recent_activities = await asyncio.gather(
+        db.users.count_documents({}),
+        db.users.count_documents({"is_active": True}),
+        db.repairs.count_documents({}),
+        read_inventory_stats(),
+        fetch_recent_activities()
+    )
+    
+    # Salud del sistema
+    system_health = {
+        "database_connected": True,
+        "last_backup": "2024-07-29T10:00:00",  # Se actualizará con backup real
+        "disk_usage": "65%",
+        "memory_usage": "78%",
+        "uptime": "7 days, 14 hours",
+        "principal_cache": principal_cache.metrics(),
+        "audit_writer": audit_writer.metrics(),
+        "name_indexes": {source: index.metrics() for source, index in NAME_INDEXES.items()},
+        "dashboard_feed": dashboard_feed.metrics()
+    }
+    
+    return SystemStats(
+        total_users=total_users,
+        active_users=active_users,
+        total_repairs=total_repairs,
+        recent_activities=recent_activities,
+        system_health=system_health,
+        **inventory
+    )
+
+async def get_cached_system_stats() -> SystemStats:
+    """Devolver estadísticas desde caché (TTL corto) o recalcularlas una sola vez"""
+    now = time.monotonic()
+    if _stats_cache["stats"] is not None and now < _stats_cache["expires_at"]:
+        return _stats_cache["stats"]
+    
+    async with _stats_lock:
+        # Otra petición pudo haberlas recalculado mientras esperábamos el lock
+        now = time.monotonic()
+        if _stats_cache["stats"] is not None and now < _stats_cache["expires_at"]:
+            return _stats_cache["stats"]
         
+        stats = await compute_system_stats()
+        _stats_cache["stats"] = stats
+        _stats_cache["expires_at"] = time.monotonic() + STATS_CACHE_TTL_SECONDS
         return stats
+
+def invalidate_stats_cache():
+    """Forzar el recálculo de estadísticas en la siguiente consulta"""
+    _stats_cache["expires_at"] = 0.0
+    dashboard_feed.notify("stats")
+
+@app.get("/api/stats", response_model=SystemStats)
+async def get_enhanced_stats(current_user: dict = Depends(get_current_user)):
+    """Obtener estadísticas mejoradas del sistema"""
+    try:
+        return await get_cached_system_stats()
     
     except Exception as e:
         logger.error(f"Error obteniendo estadísticas: {e}")
@@ -489,20 +1428,22 @@ async def create_inventory_item_enhanced(
 ):
     """Crear item de inventario mejorado"""
     try:
-        # Verificar DNI único
-        existing_item = await db.inventory.find_one({"dni": item.dni})
-        if existing_item:
-            raise HTTPException(status_code=400, detail="DNI ya existe en el inventario")
-        
         # Preparar datos del item
         item_dict = item.dict()
         item_dict["created_by"] = current_user["username"]
         item_dict["updated_by"] = current_user["username"]
         item_dict["responsable_entrega"] = current_user["full_name"]
+        # Las fechas de auditoría las pone el servidor (los backups dependen de ellas)
+        item_dict["created_at"] = item_dict["updated_at"] = datetime.now()
         
-        # Insertar en base de datos
-        result = await db.inventory.insert_one(item_dict)
+        # Insertar en base de datos (el índice único de dni detecta duplicados)
+        try:
+            result = await db.inventory.insert_one(item_dict)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="DNI ya existe en el inventario")
         item_dict["id"] = str(result.inserted_id)
+        await apply_inventory_stats_change(new_items=[item_dict])
+        inventory_name_index.apply(new_items=[item_dict])
         
         # Log de actividad
         await log_activity(current_user, "CREATE", "inventory", str(result.inserted_id), 
@@ -519,420 +1460,3326 @@ async def create_inventory_item_enhanced(
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 # ========================================
-# SISTEMA DE BACKUP AUTOMATICO
+# REPARACIONES
 # ========================================
 
-async def create_backup():
-    """Crear backup automático de la base de datos"""
+# Cada reparación nace "abierta" y pasa a "cerrada" una sola vez (el cierre
+# es un find_one_and_update condicionado al estado). Los indicadores no se
+# calculan recorriendo `repairs` al leerlos: cada apertura y cada cierre
+# aplican un $inc a `repair_stats` (_id="repairs": totales, pendientes por
+# tipo de dispositivo y segundos acumulados de reparación para el tiempo
+# medio) y a `repair_devices` (_id=dni: reparaciones por equipo, para
+# detectar fallas repetidas). La conciliación programada los reconstruye
+# desde la colección, igual que con los contadores de inventario.
+
+REPAIR_STATS_ID = "repairs"
+
+class RepairStatus(str):
+    ABIERTA = "abierta"
+    CERRADA = "cerrada"
+
+async def record_repair_opened(repair: Dict[str, Any]):
+    """Sumar una reparación abierta a los indicadores"""
+    device = _stats_key(repair["dispositivo"])
     try:
-        logger.info("Iniciando backup automático...")
-        
-        # Crear directorio de backup si no existe
-        backup_dir = "backups"
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        # Nombre del archivo de backup
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"inei_backup_{timestamp}.json"
-        backup_path = os.path.join(backup_dir, backup_filename)
-        
-        # Recopilar datos
-        backup_data = {
-            "timestamp": datetime.now().isoformat(),
-            "version": "2.0.0",
-            "collections": {}
-        }
+        await asyncio.gather(
+            db.repair_stats.update_one(
+                {"_id": REPAIR_STATS_ID},
+                {"$inc": {"total": 1, "abiertas": 1, f"pendientes_por_dispositivo.{device}": 1},
+                 "$set": {"updated_at": datetime.now()}},
+                upsert=True
+            ),
+            db.repair_devices.update_one(
+                {"_id": repair["dni"]},
+                {"$inc": {"reparaciones": 1, "abiertas": 1},
+                 "$set": {"persona": repair["persona"], "dispositivo": repair["dispositivo"],
+                          "ultima_reparacion": repair["fecha_ingreso"]}},
+                upsert=True
+            )
+        )
+    except Exception as e:
+        # La conciliación periódica corregirá la desviación
+        logger.error(f"Error actualizando indicadores de reparaciones: {e}")
+    finally:
+        invalidate_stats_cache()
+
+async def record_repair_closed(repair: Dict[str, Any]):
+    """Pasar una reparación de abierta a cerrada en los indicadores"""
+    device = _stats_key(repair["dispositivo"])
+    seconds = max((repair["fecha_cierre"] - repair["fecha_ingreso"]).total_seconds(), 0.0)
+    try:
+        await asyncio.gather(
+            db.repair_stats.update_one(
+                {"_id": REPAIR_STATS_ID},
+                {"$inc": {
+                    "abiertas": -1,
+                    "cerradas": 1,
+                    "segundos_reparacion": seconds,
+                    f"pendientes_por_dispositivo.{device}": -1,
+                    f"tiempos_por_dispositivo.{device}.cerradas": 1,
+                    f"tiempos_por_dispositivo.{device}.segundos": seconds
+                 },
+                 "$set": {"updated_at": datetime.now()}},
+                upsert=True
+            ),
+            db.repair_devices.update_one({"_id": repair["dni"]}, {"$inc": {"abiertas": -1}})
+        )
+    except Exception as e:
+        logger.error(f"Error actualizando indicadores de reparaciones: {e}")
+    finally:
+        invalidate_stats_cache()
+
+async def reconcile_repair_stats():
+    """Reconstruir `repair_stats` y `repair_devices` desde `repairs`"""
+    try:
+        start = time.perf_counter()
         
-        # Backup de inventario
-        inventory_cursor = db.inventory.find()
-        inventory_data = []
-        async for item in inventory_cursor:
-            item["_id"] = str(item["_id"])
-            inventory_data.append(item)
-        backup_data["collections"]["inventory"] = inventory_data
-        
-        # Backup de reparaciones
-        repairs_cursor = db.repairs.find()
-        repairs_data = []
-        async for repair in repairs_cursor:
-            repair["_id"] = str(repair["_id"])
-            repairs_data.append(repair)
-        backup_data["collections"]["repairs"] = repairs_data
-        
-        # Backup de usuarios (sin contraseñas)
-        users_cursor = db.users.find()
-        users_data = []
-        async for user in users_cursor:
-            user["_id"] = str(user["_id"])
-            user.pop("hashed_password", None)  # Remover contraseña
-            users_data.append(user)
-        backup_data["collections"]["users"] = users_data
-        
-        # Backup de logs de auditoría (últimos 1000)
-        logs_cursor = db.audit_logs.find().sort("timestamp", -1).limit(1000)
-        logs_data = []
-        async for log in logs_cursor:
-            log["_id"] = str(log["_id"])
-            logs_data.append(log)
-        backup_data["collections"]["audit_logs"] = logs_data
+        # repair_devices se reemplaza de una vez con $out
+        await db.repairs.aggregate([
+            {"$sort": {"fecha_ingreso": 1}},
+            {"$group": {
+                "_id": "$dni",
+                "persona": {"$last": "$persona"},
+                "dispositivo": {"$last": "$dispositivo"},
+                "reparaciones": {"$sum": 1},
+                "abiertas": {"$sum": {"$cond": [{"$eq": ["$status", RepairStatus.ABIERTA]}, 1, 0]}},
+                "ultima_reparacion": {"$max": "$fecha_ingreso"}
+            }},
+            {"$out": "repair_devices"}
+        ], allowDiskUse=True).to_list(length=None)
         
-        # Guardar backup
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, indent=2, ensure_ascii=False, default=str)
+        result = await db.repairs.aggregate([
+            {"$facet": {
+                "por_estado": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                "pendientes": [
+                    {"$match": {"status": RepairStatus.ABIERTA}},
+                    {"$group": {"_id": "$dispositivo", "count": {"$sum": 1}}}
+                ],
+                "tiempos": [
+                    {"$match": {"status": RepairStatus.CERRADA}},
+                    {"$group": {
+                        "_id": "$dispositivo",
+                        "cerradas": {"$sum": 1},
+                        "segundos": {"$sum": {"$divide": [{"$subtract": ["$fecha_cierre", "$fecha_ingreso"]}, 1000]}}
+                    }}
+                ]
+            }}
+        ], allowDiskUse=True).to_list(length=1)
+        facets = result[0] if result else {}
         
-        # Comprimir backup
-        zip_path = backup_path.replace('.json', '.zip')
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(backup_path, backup_filename)
+        por_estado = {doc["_id"]: doc["count"] for doc in facets.get("por_estado", [])}
+        tiempos = {
+            _stats_key(doc["_id"]): {"cerradas": doc["cerradas"], "segundos": max(doc["segundos"], 0.0)}
+            for doc in facets.get("tiempos", [])
+        }
+        fresh = {
+            "total": sum(por_estado.values()),
+            "abiertas": por_estado.get(RepairStatus.ABIERTA, 0),
+            "cerradas": por_estado.get(RepairStatus.CERRADA, 0),
+            "segundos_reparacion": sum(t["segundos"] for t in tiempos.values()),
+            "pendientes_por_dispositivo": {
+                _stats_key(doc["_id"]): doc["count"] for doc in facets.get("pendientes", [])
+            },
+            "tiempos_por_dispositivo": tiempos
+        }
         
-        # Eliminar archivo JSON temporal
-        os.remove(backup_path)
+        await db.repair_stats.replace_one(
+            {"_id": REPAIR_STATS_ID},
+            {**fresh, "updated_at": datetime.now(), "reconciled_at": datetime.now()},
+            upsert=True
+        )
+        invalidate_stats_cache()
+        logger.info(f"Indicadores de reparaciones conciliados: {fresh['total']} reparaciones "
+                    f"({time.perf_counter() - start:.2f}s)")
+    
+    except Exception as e:
+        logger.error(f"Error conciliando indicadores de reparaciones: {e}")
+
+async def set_inventory_repair_state(dni: str, estado: str, motivo: str, current_user: dict,
+                                     only_if: Optional[str] = None):
+    """Reflejar en el item de inventario el estado de sus reparaciones
+
+    Con `only_if` solo se cambia si el item está en ese estado (al cerrar, un
+    item marcado a mano como "mal estado" no vuelve a "bien").
+    """
+    query: Dict[str, Any] = {"dni": dni, "estado": only_if if only_if else {"$ne": estado}}
+    changes = {"estado": estado, "motivo_reparacion": motivo,
+               "updated_at": datetime.now(), "updated_by": current_user["username"]}
+    old_item = await db.inventory.find_one_and_update(
+        query, {"$set": changes}, return_document=ReturnDocument.BEFORE
+    )
+    if old_item:
+        await apply_inventory_stats_change(old_items=[old_item], new_items=[{**old_item, **changes}])
+
+def serialize_repair(repair: Dict[str, Any]) -> Dict[str, Any]:
+    repair = dict(repair)
+    repair["id"] = str(repair.pop("_id"))
+    if repair.get("fecha_cierre"):
+        repair["horas_reparacion"] = round(
+            (repair["fecha_cierre"] - repair["fecha_ingreso"]).total_seconds() / 3600, 2
+        )
+    return repair
+
+@app.post("/api/repairs", response_model=dict, status_code=201)
+async def create_repair(
+    repair: RepairCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Registrar el ingreso de un equipo a reparación"""
+    try:
+        repair_dict = repair.dict()
+        repair_dict["status"] = RepairStatus.ABIERTA
+        repair_dict["fecha_cierre"] = None
+        repair_dict["created_by"] = current_user["username"]
+        repair_dict["updated_by"] = current_user["username"]
+        repair_dict["created_at"] = repair_dict["updated_at"] = datetime.now()
         
-        # Limpiar backups antiguos (mantener últimos 30)
-        backup_files = [f for f in os.listdir(backup_dir) if f.startswith("inei_backup_") and f.endswith(".zip")]
-        backup_files.sort()
+        result = await db.repairs.insert_one(repair_dict)
+        await asyncio.gather(
+            record_repair_opened(repair_dict),
+            set_inventory_repair_state(repair.dni, "en reparacion", repair.motivo_reparacion, current_user)
+        )
         
-        if len(backup_files) > 30:
-            for old_backup in backup_files[:-30]:
-                old_backup_path = os.path.join(backup_dir, old_backup)
-                os.remove(old_backup_path)
-                logger.info(f"Backup antiguo eliminado: {old_backup}")
+        await log_activity(current_user, "CREATE", "repair", str(result.inserted_id),
+                          {"dni": repair.dni, "dispositivo": repair.dispositivo})
         
-        file_size = os.path.getsize(zip_path) / (1024 * 1024)  # MB
-        logger.info(f"Backup completado: {backup_filename} ({file_size:.2f} MB)")
+        logger.info(f"Reparación abierta: {repair.dni} - {repair.dispositivo} por {current_user['username']}")
         
-        return zip_path
+        return {"message": "Reparación registrada exitosamente", "id": str(result.inserted_id)}
     
     except Exception as e:
-        logger.error(f"Error creando backup: {e}")
-        raise
+        logger.error(f"Error registrando reparación: {e}")
+        raise HTTPException(status_code=500, detail="Error registrando reparación")
 
-@app.post("/api/admin/backup")
-async def manual_backup(current_user: dict = Depends(require_role([UserRole.ADMIN]))):
-    """Crear backup manual"""
+@app.get("/api/repairs")
+async def list_repairs(
+    dni: Optional[str] = None,
+    dispositivo: Optional[str] = None,
+    status: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Listar reparaciones, de la más reciente a la más antigua
+
+    Los filtros usan los índices de la colección; la siguiente página llega
+    en la cabecera X-Next-Cursor, como en el listado de inventario.
+    """
     try:
-        backup_path = await create_backup()
+        query: Dict[str, Any] = {}
+        if dni is not None:
+            query["dni"] = dni
+        if dispositivo is not None:
+            query["dispositivo"] = dispositivo
+        if status is not None:
+            if status not in (RepairStatus.ABIERTA, RepairStatus.CERRADA):
+                raise HTTPException(status_code=400, detail=f"Estado no válido: {status}")
+            query["status"] = status
+        if desde is not None or hasta is not None:
+            query["fecha_ingreso"] = {}
+            if desde is not None:
+                query["fecha_ingreso"]["$gte"] = desde
+            if hasta is not None:
+                query["fecha_ingreso"]["$lte"] = hasta
         
-        await log_activity(current_user, "BACKUP", "system", details={"type": "manual"})
+        if cursor:
+            try:
+                last_fecha, last_id = decode_keyset_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+            query["$or"] = [
+                {"fecha_ingreso": {"$lt": last_fecha}},
+                {"fecha_ingreso": last_fecha, "_id": {"$lt": last_id}}
+            ]
         
-        return {"message": "Backup creado exitosamente", "file": os.path.basename(backup_path)}
+        limit = max(1, min(limit, INVENTORY_MAX_PAGE_SIZE))
+        repairs_cursor = db.repairs.find(query).sort([("fecha_ingreso", -1), ("_id", -1)]).limit(limit)
+        repairs = [repair async for repair in repairs_cursor]
+        
+        headers = {}
+        if len(repairs) == limit:
+            headers["X-Next-Cursor"] = encode_keyset_cursor(repairs[-1]["fecha_ingreso"], repairs[-1]["_id"])
+        
+        body = [serialize_repair(repair) for repair in repairs]
+        return JSONResponse(content=jsonable_encoder(body), headers=headers)
+    
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error en backup manual: {e}")
-        raise HTTPException(status_code=500, detail="Error creando backup")
+        logger.error(f"Error listando reparaciones: {e}")
+        raise HTTPException(status_code=500, detail="Error obteniendo reparaciones")
 
-# ========================================
-# REPORTES AVANZADOS
-# ========================================
+@app.get("/api/repairs/analytics")
+async def get_repair_analytics(
+    repeat_threshold: int = 2,
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user)
+):
+    """Tiempo medio de reparación, pendientes por dispositivo y fallas repetidas
 
-@app.get("/api/reports/inventory/pdf")
-async def generate_inventory_pdf_report(current_user: dict = Depends(get_current_user)):
-    """Generar reporte PDF del inventario"""
+    Se leen los indicadores mantenidos en cada escritura; las fallas
+    repetidas salen del índice de `repair_devices` por cantidad de
+    reparaciones.
+    """
     try:
-        # Crear directorio de reportes
-        reports_dir = "reports"
-        os.makedirs(reports_dir, exist_ok=True)
+        stats = await db.repair_stats.find_one({"_id": REPAIR_STATS_ID})
+        if stats is None:
+            await reconcile_repair_stats()
+            stats = await db.repair_stats.find_one({"_id": REPAIR_STATS_ID}) or {}
         
-        # Nombre del archivo
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        def hours(seconds: float, count: int) -> Optional[float]:
+            return round(seconds / count / 3600, 2) if count else None
+        
+        pendientes = {
+            _stats_label(key): value
+            for key, value in (stats.get("pendientes_por_dispositivo") or {}).items() if value > 0
+        }
+        tiempos = {
+            _stats_label(key): hours(value.get("segundos", 0.0), value.get("cerradas", 0))
+            for key, value in (stats.get("tiempos_por_dispositivo") or {}).items()
+        }
+        
+        repeat_cursor = db.repair_devices.find(
+            {"reparaciones": {"$gte": max(repeat_threshold, 2)}}
+        ).sort("reparaciones", -1).limit(max(1, min(limit, 500)))
+        repetidas = [
+            {
+                "dni": device["_id"],
+                "persona": device.get("persona"),
+                "dispositivo": device.get("dispositivo"),
+                "reparaciones": device["reparaciones"],
+                "abiertas": device.get("abiertas", 0),
+                "ultima_reparacion": device.get("ultima_reparacion")
+            }
+            async for device in repeat_cursor
+        ]
+        
+        return jsonable_encoder({
+            "total": stats.get("total", 0),
+            "abiertas": stats.get("abiertas", 0),
+            "cerradas": stats.get("cerradas", 0),
+            "mttr_horas": hours(stats.get("segundos_reparacion", 0.0), stats.get("cerradas", 0)),
+            "mttr_horas_por_dispositivo": tiempos,
+            "pendientes_por_dispositivo": dict(sorted(pendientes.items(), key=lambda kv: kv[1], reverse=True)),
+            "fallas_repetidas": repetidas,
+            "updated_at": stats.get("updated_at")
+        })
+    
+    except Exception as e:
+        logger.error(f"Error obteniendo indicadores de reparaciones: {e}")
+        raise HTTPException(status_code=500, detail="Error obteniendo indicadores de reparaciones")
+
+@app.get("/api/repairs/{repair_id}")
+async def get_repair(repair_id: str, current_user: dict = Depends(get_current_user)):
+    """Obtener una reparación"""
+    try:
+        if not ObjectId.is_valid(repair_id):
+            raise HTTPException(status_code=404, detail="Reparación no encontrada")
+        repair = await db.repairs.find_one({"_id": ObjectId(repair_id)})
+        if not repair:
+            raise HTTPException(status_code=404, detail="Reparación no encontrada")
+        return jsonable_encoder(serialize_repair(repair))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error obteniendo reparación: {e}")
+        raise HTTPException(status_code=500, detail="Error obteniendo reparación")
+
+@app.put("/api/repairs/{repair_id}/close")
+async def close_repair(
+    repair_id: str,
+    closing: RepairClose,
+    current_user: dict = Depends(get_current_user)
+):
+    """Cerrar una reparación abierta"""
+    try:
+        if not ObjectId.is_valid(repair_id):
+            raise HTTPException(status_code=404, detail="Reparación no encontrada")
+        
+        now = datetime.now()
+        repair = await db.repairs.find_one_and_update(
+            {"_id": ObjectId(repair_id), "status": RepairStatus.ABIERTA},
+            {"$set": {
+                "status": RepairStatus.CERRADA,
+                "fecha_cierre": now,
+                "solucion": closing.solucion,
+                "observaciones": closing.observaciones,
+                "closed_by": current_user["username"],
+                "updated_by": current_user["username"],
+                "updated_at": now
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if repair is None:
+            if await db.repairs.count_documents({"_id": ObjectId(repair_id)}, limit=1):
+                raise HTTPException(status_code=400, detail="La reparación ya está cerrada")
+            raise HTTPException(status_code=404, detail="Reparación no encontrada")
+        
+        await record_repair_closed(repair)
+        
+        # El item vuelve a "bien" cuando no le quedan reparaciones abiertas
+        pending = await db.repairs.count_documents(
+            {"dni": repair["dni"], "status": RepairStatus.ABIERTA}, limit=1
+        )
+        if not pending:
+            await set_inventory_repair_state(repair["dni"], "bien", "", current_user, only_if="en reparacion")
+        
+        await log_activity(current_user, "UPDATE", "repair", repair_id,
+                          {"dni": repair["dni"], "status": RepairStatus.CERRADA})
+        
+        return {"message": "Reparación cerrada exitosamente", **jsonable_encoder(serialize_repair(repair))}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cerrando reparación: {e}")
+        raise HTTPException(status_code=500, detail="Error cerrando reparación")
+
+# ========================================
+# SISTEMA DE BACKUP AUTOMATICO
+# ========================================
+
+BACKUP_DIR = "backups"
+BACKUP_FORMAT_VERSION = "3.0"
+
+def _backup_json_default(value: Any):
+    """Serializar tipos BSON a JSON: ObjectId como str y fechas en ISO 8601"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+def _write_ndjson_chunk(stream, documents: List[Dict[str, Any]]) -> int:
+    """Serializar y escribir un bloque de documentos (se ejecuta en un hilo)"""
+    data = "".join(
+        json.dumps(doc, ensure_ascii=False, default=_backup_json_default) + "\n"
+        for doc in documents
+    ).encode("utf-8")
+    stream.write(data)
+    return len(data)
+
+async def stream_collection_to_zip(zipf: zipfile.ZipFile, name: str, cursor, transform=None) -> Dict[str, int]:
+    """Volcar un cursor como `<name>.ndjson` comprimido dentro del zip
+
+    Los documentos se leen por bloques de BACKUP_CHUNK_DOCS y cada bloque se
+    serializa y comprime en un hilo, así que la memoria no depende del tamaño
+    de la colección y el event loop queda libre.
+    """
+    stream = await asyncio.to_thread(zipf.open, f"{name}.ndjson", "w", force_zip64=True)
+    count = 0
+    raw_bytes = 0
+    try:
+        chunk = []
+        async for document in cursor.batch_size(BACKUP_CHUNK_DOCS):
+            if transform:
+                transform(document)
+            chunk.append(document)
+            if len(chunk) >= BACKUP_CHUNK_DOCS:
+                raw_bytes += await asyncio.to_thread(_write_ndjson_chunk, stream, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            raw_bytes += await asyncio.to_thread(_write_ndjson_chunk, stream, chunk)
+            count += len(chunk)
+    finally:
+        await asyncio.to_thread(stream.close)
+    return {"count": count, "bytes": raw_bytes}
+
+def _strip_password(user: Dict[str, Any]):
+    user.pop("hashed_password", None)
+
+# ----------------------------------------
+# Cadenas de backup: completo + incrementales
+# ----------------------------------------
+# Un backup completo abre una cadena; los incrementales siguientes solo
+# contienen los documentos creados o modificados desde la marca de agua
+# (watermark) del backup anterior. No se registran bajas: la API no elimina
+# items, reparaciones ni usuarios (los usuarios se desactivan con is_active).
+# Todas las escrituras fijan `updated_at` con la hora del servidor, pero una
+# escritura que tomó su hora justo antes de la marca puede confirmarse después
+# de que el backup leyó esa colección; por eso cada incremental arranca
+# BACKUP_WATERMARK_OVERLAP_SECONDS antes de la marca anterior. Los documentos
+# repetidos se reemplazan al restaurar, así que el solapamiento es inocuo.
+# `backups/backup_chain.json` describe las cadenas y la retención conserva
+# las últimas BACKUP_RETENTION_CHAINS cadenas completas. Una restauración
+# cambia la base sin tocar `updated_at` (y en modo replace vacía colecciones),
+# así que sella la cadena abierta: el siguiente backup siempre es completo.
+
+BACKUP_CHAIN_INDEX = os.path.join(BACKUP_DIR, "backup_chain.json")
+_backup_lock = asyncio.Lock()
+
+def _watermark_query(fields: List[str], since: datetime) -> Dict[str, Any]:
+    clauses = [{field: {"$gte": since}} for field in fields]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+def backup_sources(since: Optional[datetime] = None) -> list:
+    """Cursores a volcar: todo (since=None) o solo lo cambiado desde `since`"""
+    if since is None:
+        return [
+            ("inventory", db.inventory.find(), None),
+            ("repairs", db.repairs.find(), None),
+            # Usuarios sin contraseñas
+            ("users", db.users.find(), _strip_password),
+            # Logs de auditoría (últimos 1000)
+            ("audit_logs", db.audit_logs.find().sort("timestamp", -1).limit(1000), None),
+        ]
+    return [
+        ("inventory", db.inventory.find(_watermark_query(["updated_at"], since)), None),
+        ("repairs", db.repairs.find(_watermark_query(["updated_at", "created_at"], since)), None),
+        ("users", db.users.find(_watermark_query(["updated_at", "created_at"], since)), _strip_password),
+        ("audit_logs", db.audit_logs.find(_watermark_query(["timestamp"], since)), None),
+    ]
+
+def load_backup_chains() -> Dict[str, Any]:
+    if not os.path.exists(BACKUP_CHAIN_INDEX):
+        return {"chains": []}
+    with open(BACKUP_CHAIN_INDEX, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_backup_chains(index: Dict[str, Any]):
+    temp_path = BACKUP_CHAIN_INDEX + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, BACKUP_CHAIN_INDEX)
+
+def open_backup_chain(index: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Cadena a la que puede añadirse un incremental (None si hay que hacer un completo)"""
+    chain = index["chains"][-1] if index["chains"] else None
+    return None if chain is None or chain.get("sealed") else chain
+
+async def seal_backup_chain(reason: str):
+    """Cerrar la cadena actual para que el siguiente backup sea completo"""
+    async with _backup_lock:
+        index = await asyncio.to_thread(load_backup_chains)
+        chain = open_backup_chain(index)
+        if chain is None:
+            return
+        chain["sealed"] = {"at": datetime.now().isoformat(), "reason": reason}
+        await asyncio.to_thread(save_backup_chains, index)
+        logger.info(f"Cadena de backup {chain['base']} sellada ({reason})")
+
+def apply_backup_retention(index: Dict[str, Any]) -> Dict[str, Any]:
+    """Conservar las últimas BACKUP_RETENTION_CHAINS cadenas completas
+
+    Se eliminan las cadenas más antiguas enteras (completo e incrementales),
+    junto con cualquier zip anterior a la cadena más antigua conservada.
+    """
+    chains = index["chains"]
+    if len(chains) <= BACKUP_RETENTION_CHAINS:
+        return index
+    
+    kept = chains[-BACKUP_RETENTION_CHAINS:]
+    oldest_kept = kept[0]["base"]
+    
+    for filename in sorted(os.listdir(BACKUP_DIR)):
+        if filename.startswith("inei_backup_") and filename.endswith(".zip") and filename < oldest_kept:
+            os.remove(os.path.join(BACKUP_DIR, filename))
+            logger.info(f"Backup antiguo eliminado: {filename}")
+    
+    index["chains"] = kept
+    return index
+
+async def create_backup(kind: str = "full", progress=None):
+    """Crear backup de la base de datos
+
+    `kind="full"` vuelca todas las colecciones y abre una cadena nueva;
+    `kind="incremental"` solo vuelca lo cambiado desde el último backup de la
+    cadena actual (si no hay cadena se hace uno completo). Cada colección se
+    escribe como NDJSON comprimido dentro del zip, documento a documento,
+    junto con un `manifest.json` que describe el contenido. `progress`, si se
+    indica, recibe (colecciones volcadas, total de colecciones).
+    """
+    async with _backup_lock:
+        partial_path = None
+        try:
+            logger.info(f"Iniciando backup ({kind})...")
+            start = time.perf_counter()
+            
+            # Crear directorio de backup si no existe
+            backup_dir = BACKUP_DIR
+            os.makedirs(backup_dir, exist_ok=True)
+            
+            index = await asyncio.to_thread(load_backup_chains)
+            chain = open_backup_chain(index)
+            if kind == "incremental" and chain is None:
+                logger.info("No hay una cadena abierta (sin completo previo o sellada); se crea un backup completo")
+                kind = "full"
+            
+            since = None
+            if kind == "incremental":
+                since = (datetime.fromisoformat(chain["backups"][-1]["watermark"])
+                         - timedelta(seconds=BACKUP_WATERMARK_OVERLAP_SECONDS))
+            
+            # La marca de agua se toma antes de leer: lo que cambie durante el
+            # backup entrará también en el siguiente incremental
+            watermark = datetime.now()
+            
+            # Nombre del archivo de backup
+            timestamp = watermark.strftime("%Y%m%d_%H%M%S")
+            suffix = "_inc" if kind == "incremental" else ""
+            backup_filename = f"inei_backup_{timestamp}{suffix}.zip"
+            zip_path = os.path.join(backup_dir, backup_filename)
+            partial_path = zip_path + ".part"
+            
+            manifest = {
+                "timestamp": watermark.isoformat(),
+                "version": "2.0.0",
+                "format": BACKUP_FORMAT_VERSION,
+                "kind": kind,
+                "since": since.isoformat() if since else None,
+                "watermark": watermark.isoformat(),
+                "base": chain["base"] if kind == "incremental" else backup_filename,
+                "parent": chain["backups"][-1]["file"] if kind == "incremental" else None,
+                "collections": {}
+            }
+            
+            zipf = await asyncio.to_thread(zipfile.ZipFile, partial_path, "w", zipfile.ZIP_DEFLATED)
+            try:
+                sources = backup_sources(since)
+                for position, (name, cursor, transform) in enumerate(sources, start=1):
+                    manifest["collections"][name] = await stream_collection_to_zip(zipf, name, cursor, transform)
+                    if progress:
+                        await progress(position, len(sources))
+                await asyncio.to_thread(
+                    zipf.writestr, "manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2)
+                )
+            finally:
+                await asyncio.to_thread(zipf.close)
+            
+            os.replace(partial_path, zip_path)
+            
+            # Actualizar el índice de cadenas y aplicar la retención
+            total_docs = sum(c["count"] for c in manifest["collections"].values())
+            entry = {
+                "file": backup_filename,
+                "kind": kind,
+                "since": manifest["since"],
+                "watermark": manifest["watermark"],
+                "documents": total_docs
+            }
+            if kind == "full":
+                index["chains"].append({"base": backup_filename, "backups": [entry]})
+            else:
+                chain["backups"].append(entry)
+            index = await asyncio.to_thread(apply_backup_retention, index)
+            await asyncio.to_thread(save_backup_chains, index)
+            
+            elapsed = max(time.perf_counter() - start, 1e-6)
+            raw_mb = sum(c["bytes"] for c in manifest["collections"].values()) / (1024 * 1024)
+            file_size = os.path.getsize(zip_path) / (1024 * 1024)  # MB
+            logger.info(f"Backup completado: {backup_filename} ({file_size:.2f} MB) - "
+                        f"{total_docs} docs en {elapsed:.2f}s "
+                        f"({total_docs / elapsed:.0f} docs/s, {raw_mb / elapsed:.2f} MB/s sin comprimir)")
+            backup_duration.observe((kind, "ok"), elapsed)
+            
+            return zip_path
+        
+        except Exception as e:
+            logger.error(f"Error creando backup: {e}")
+            backup_duration.observe((kind, "error"), time.perf_counter() - start)
+            if partial_path and os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+async def run_scheduled_backup():
+    """Backup programado: incremental, o completo si la cadena ya es larga"""
+    index = await asyncio.to_thread(load_backup_chains)
+    chain = open_backup_chain(index)
+    if chain is None or len(chain["backups"]) > BACKUP_INCREMENTALS_PER_CHAIN:
+        return await create_backup("full")
+    return await create_backup("incremental")
+
+@app.post("/api/admin/backup")
+async def manual_backup(
+    incremental: bool = False,
+    current_user: dict = Depends(require_role([UserRole.ADMIN]))
+):
+    """Crear backup manual (completo por defecto, o incremental)"""
+    try:
+        kind = "incremental" if incremental else "full"
+        backup_path = await create_backup(kind)
+        
+        await log_activity(current_user, "BACKUP", "system", details={"type": "manual", "kind": kind})
+        
+        return {"message": "Backup creado exitosamente", "file": os.path.basename(backup_path)}
+    except Exception as e:
+        logger.error(f"Error en backup manual: {e}")
+        raise HTTPException(status_code=500, detail="Error creando backup")
+
+# ========================================
+# RESTAURACION DE BACKUPS
+# ========================================
+
+RESTORE_COLLECTIONS = ["inventory", "repairs", "users", "audit_logs"]
+# Colecciones que nunca se vacían en modo replace: los backups no incluyen
+# contraseñas y un backup completo solo guarda los últimos 1000 logs
+RESTORE_MERGE_ONLY = {"users", "audit_logs"}
+# Campos que la restauración nunca pisa. Los usuarios se actualizan con $set
+# (rol, sede, is_active...) sin tocar la contraseña, que el backup no lleva
+RESTORE_PRESERVED_FIELDS = {"users": {"hashed_password"}}
+# Campos de fecha de primer nivel que se serializan como texto ISO
+RESTORE_DATE_FIELDS = {"timestamp", "garantia_vence", "last_login"}
+ISO_DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?([+-]\d{2}:\d{2})?$")
+
+def _is_restore_date_field(key: str) -> bool:
+    return key.startswith("fecha_") or key.endswith("_at") or key in RESTORE_DATE_FIELDS
+
+def _restore_object_hook(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Revertir la serialización del `_id` (texto a ObjectId)"""
+    value = document.get("_id")
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        document["_id"] = ObjectId(value)
+    return document
+
+def _restore_dates(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Convertir a datetime los campos de fecha conocidos del documento
+
+    Solo los de primer nivel con nombre de fecha (fecha_*, *_at, timestamp...):
+    un texto libre o un valor dentro de `details` que parezca una fecha ISO
+    sigue siendo texto, como lo era antes del backup.
+    """
+    for key, value in document.items():
+        if isinstance(value, str) and _is_restore_date_field(key) and ISO_DATETIME_RE.match(value):
+            try:
+                document[key] = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    return document
+
+def _restore_upsert(name: str, position: int, mode: str) -> bool:
+    """Si los documentos de `name` reemplazan a los existentes o solo se insertan
+
+    Los incrementales reemplazan versiones anteriores de cada documento. Los
+    logs de auditoría solo se insertan; los usuarios se actualizan también al
+    restaurar un completo en modo replace, porque su colección no se vacía.
+    """
+    if name == "audit_logs":
+        return False
+    return position > 0 or (mode == "replace" and name in RESTORE_MERGE_ONLY)
+
+def _read_ndjson_batch(stream, size: int) -> List[Dict[str, Any]]:
+    """Leer hasta `size` documentos del NDJSON (se ejecuta en un hilo)"""
+    batch = []
+    while len(batch) < size:
+        line = stream.readline()
+        if not line:
+            break
+        line = line.strip()
+        if line:
+            batch.append(_restore_dates(json.loads(line, object_hook=_restore_object_hook)))
+    return batch
+
+def _read_backup_manifest(zipf: zipfile.ZipFile) -> Dict[str, Any]:
+    if "manifest.json" in zipf.namelist():
+        return json.loads(zipf.read("manifest.json"))
+    # Formato anterior: un único JSON con todas las colecciones
+    return {"format": "legacy", "kind": "full", "collections": {}}
+
+async def _restore_collection(zipf: zipfile.ZipFile, name: str, upsert: bool, report: Dict[str, Any]):
+    """Cargar `<name>.ndjson` por lotes, con varios lotes en vuelo a la vez"""
+    collection = db[name]
+    counters = report["collections"].setdefault(name, {"inserted": 0, "upserted": 0, "duplicates": 0})
+    semaphore = asyncio.Semaphore(RESTORE_PARALLEL_BATCHES)
+    
+    async def load(batch):
+        try:
+            if upsert and name in RESTORE_PRESERVED_FIELDS:
+                preserved = RESTORE_PRESERVED_FIELDS[name] | {"_id"}
+                result = await collection.bulk_write([
+                    UpdateOne({"_id": doc["_id"]},
+                              {"$set": {key: value for key, value in doc.items() if key not in preserved}},
+                              upsert=True)
+                    for doc in batch
+                ], ordered=False)
+                counters["upserted"] += result.upserted_count + result.modified_count
+            elif upsert:
+                result = await collection.bulk_write(
+                    [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch], ordered=False
+                )
+                counters["upserted"] += result.upserted_count + result.modified_count
+            else:
+                result = await collection.insert_many(batch, ordered=False)
+                counters["inserted"] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            details = e.details
+            duplicates = sum(1 for err in details.get("writeErrors", []) if err.get("code") == 11000)
+            counters["inserted"] += details.get("nInserted", 0)
+            counters["upserted"] += details.get("nUpserted", 0) + details.get("nModified", 0)
+            counters["duplicates"] += duplicates
+            if duplicates < len(details.get("writeErrors", [])):
+                logger.error(f"Errores restaurando {name}: {details.get('writeErrors', [])[:3]}")
+        finally:
+            semaphore.release()
+    
+    stream = await asyncio.to_thread(zipf.open, f"{name}.ndjson")
+    tasks = []
+    try:
+        while True:
+            batch = await asyncio.to_thread(_read_ndjson_batch, stream, RESTORE_BATCH_SIZE)
+            if not batch:
+                break
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(load(batch)))
+        await asyncio.gather(*tasks)
+    finally:
+        await asyncio.to_thread(stream.close)
+
+async def _restore_legacy_archive(zipf: zipfile.ZipFile, report: Dict[str, Any]):
+    """Restaurar un backup en el formato anterior (un JSON con todo)"""
+    json_name = next(n for n in zipf.namelist() if n.endswith(".json"))
+    data = await asyncio.to_thread(lambda: json.loads(zipf.read(json_name), object_hook=_restore_object_hook))
+    for name, documents in data.get("collections", {}).items():
+        counters = report["collections"].setdefault(name, {"inserted": 0, "upserted": 0, "duplicates": 0})
+        documents = [_restore_dates(document) for document in documents]
+        for i in range(0, len(documents), RESTORE_BATCH_SIZE):
+            try:
+                result = await db[name].insert_many(documents[i:i + RESTORE_BATCH_SIZE], ordered=False)
+                counters["inserted"] += len(result.inserted_ids)
+            except BulkWriteError as e:
+                counters["inserted"] += e.details.get("nInserted", 0)
+                counters["duplicates"] += len(e.details.get("writeErrors", []))
+
+def resolve_backup_chain(backup_path: str) -> List[str]:
+    """Rutas a aplicar, en orden, para restaurar `backup_path`
+
+    Un backup completo se restaura solo; uno incremental necesita el completo
+    de su cadena y los incrementales anteriores (según backup_chain.json).
+    """
+    with zipfile.ZipFile(backup_path) as zipf:
+        manifest = _read_backup_manifest(zipf)
+    if manifest.get("kind") != "incremental":
+        return [backup_path]
+    
+    backup_dir = os.path.dirname(backup_path)
+    filename = os.path.basename(backup_path)
+    for chain in load_backup_chains()["chains"]:
+        files = [entry["file"] for entry in chain["backups"]]
+        if filename in files:
+            return [os.path.join(backup_dir, f) for f in files[:files.index(filename) + 1]]
+    raise ValueError(f"No se encontró la cadena del backup incremental {filename}")
+
+async def restore_backup(backup_path: str, mode: str = "merge") -> Dict[str, Any]:
+    """Restaurar un backup (o su cadena completa) en la base de datos
+
+    `mode="merge"` inserta los documentos que falten y conserva los existentes;
+    `mode="replace"` borra antes las colecciones (y sus índices), carga los
+    datos y reconstruye los índices al final, que es mucho más rápido que
+    mantenerlos durante la carga. `users` y `audit_logs` nunca se vacían
+    (RESTORE_MERGE_ONLY): los backups no incluyen contraseñas, y los logs del
+    backup son solo los más recientes, así que vaciar la colección perdería el
+    resto del historial. Los usuarios se actualizan con $set sin tocar la
+    contraseña en los incrementales y en modo replace (ver `_restore_upsert`);
+    los logs solo se insertan.
+    Las colecciones se cargan en paralelo con lotes `insert_many` no ordenados.
+    Al terminar se sella la cadena de backups abierta (ver `seal_backup_chain`).
+    """
+    if mode not in ("merge", "replace"):
+        raise ValueError("mode debe ser 'merge' o 'replace'")
+    
+    start = time.perf_counter()
+    report: Dict[str, Any] = {"files": [], "mode": mode, "collections": {}}
+    chain_paths = await asyncio.to_thread(resolve_backup_chain, backup_path)
+    
+    if mode == "replace":
+        for name in RESTORE_COLLECTIONS:
+            if name not in RESTORE_MERGE_ONLY:
+                await db[name].drop()
+    
+    for position, path in enumerate(chain_paths):
+        zipf = await asyncio.to_thread(zipfile.ZipFile, path)
+        try:
+            manifest = await asyncio.to_thread(_read_backup_manifest, zipf)
+            report["files"].append(os.path.basename(path))
+            if manifest["format"] == "legacy":
+                await _restore_legacy_archive(zipf, report)
+                continue
+            
+            names = [n for n in RESTORE_COLLECTIONS if f"{n}.ndjson" in zipf.namelist()]
+            await asyncio.gather(*[
+                _restore_collection(zipf, name, _restore_upsert(name, position, mode), report) for name in names
+            ])
+        finally:
+            await asyncio.to_thread(zipf.close)
+    
+    # Índices después de la carga; luego contadores y cachés derivados
+    await ensure_indexes()
+    await reconcile_inventory_stats()
+    await reconcile_repair_stats()
+    await bump_inventory_data_version()
+    await NotificationService.refresh_equipment_alerts()
+    await rebuild_name_indexes()
+    principal_cache.clear()
+    invalidate_stats_cache()
+    await seal_backup_chain(f"restauración ({mode}) de {os.path.basename(backup_path)}")
+    
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    total_docs = sum(c["inserted"] + c["upserted"] for c in report["collections"].values())
+    report["documents"] = total_docs
+    report["seconds"] = round(elapsed, 2)
+    report["docs_per_second"] = round(total_docs / elapsed, 1)
+    logger.info(f"Restauración completada desde {', '.join(report['files'])}: "
+                f"{total_docs} docs en {elapsed:.2f}s ({report['docs_per_second']:.0f} docs/s)")
+    return report
+
+@app.post("/api/admin/restore")
+async def restore_backup_endpoint(
+    filename: str,
+    mode: str = "merge",
+    current_user: dict = Depends(require_role([UserRole.ADMIN]))
+):
+    """Restaurar un backup de la carpeta de backups (solo admins)"""
+    try:
+        if os.path.basename(filename) != filename or not filename.endswith(".zip"):
+            raise HTTPException(status_code=400, detail="Nombre de backup inválido")
+        backup_path = os.path.join(BACKUP_DIR, filename)
+        if not os.path.exists(backup_path):
+            raise HTTPException(status_code=404, detail="Backup no encontrado")
+        
+        report = await restore_backup(backup_path, mode)
+        
+        await log_activity(current_user, "RESTORE", "system", details={
+            "file": filename, "mode": mode, "documents": report["documents"]
+        })
+        
+        return {"message": "Backup restaurado exitosamente", "report": report}
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error restaurando backup: {e}")
+        raise HTTPException(status_code=500, detail="Error restaurando backup")
+
+# ========================================
+# REPORTES AVANZADOS
+# ========================================
+
+# Caché de reportes: la clave combina el tipo de reporte, la época y la versión
+# de datos del inventario y los campos del usuario que aparecen en el archivo.
+# Mientras no cambie nada, se sirve el archivo ya generado (o un 304 si el
+# cliente envía el ETag). Los archivos viven en reports/ y caducan con su
+# retención. Como pueden servirse mucho después de generarse, los reportes
+# muestran la hora de la última escritura de los datos, no la de generación.
+
+def report_cache_key(report_type: str, snapshot: Dict[str, Any], **fields) -> str:
+    raw = json.dumps({"type": report_type, "epoch": snapshot["epoch"],
+                      "data_version": snapshot["data_version"], **fields},
+                     sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def format_data_as_of(snapshot: Dict[str, Any]) -> str:
+    """Hora de la última escritura del inventario, para mostrar en los reportes"""
+    return (snapshot.get("updated_at") or datetime.now()).strftime("%d/%m/%Y %H:%M:%S")
+
+def report_cache_path(key: str, extension: str) -> str:
+    return os.path.join(REPORTS_DIR, f"cache_{key}.{extension}")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def write_report_cache(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial_path = path + ".part"
+    with open(partial_path, "wb") as f:
+        f.write(content)
+    os.replace(partial_path, path)
+
+def cached_report_response(path: str, media_type: str, filename: str, etag: str) -> FileResponse:
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}", "ETag": etag}
+    )
+
+# El renderizado con reportlab es CPU puro y puede tardar decenas de segundos
+# con inventarios grandes, así que se hace en un pool de procesos y los bytes
+# se devuelven directamente, sin dejar archivos en reports/.
+_report_executor: Optional[ProcessPoolExecutor] = None
+report_semaphore = asyncio.Semaphore(REPORT_MAX_CONCURRENT)
+
+def get_report_executor() -> ProcessPoolExecutor:
+    global _report_executor
+    if _report_executor is None:
+        _report_executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS)
+    return _report_executor
+
+def render_inventory_pdf(inventory_data: List[list], info_data: List[list]) -> bytes:
+    """Construir el PDF del inventario (se ejecuta en un proceso del pool)"""
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    story = []
+    
+    # Estilos
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        alignment=1  # Centrado
+    )
+    
+    # Título
+    title = Paragraph("REPORTE DE INVENTARIO - INEI<br/>Censos Nacionales 2025", title_style)
+    story.append(title)
+    story.append(Spacer(1, 20))
+    
+    # Información del reporte
+    info_table = Table(info_data, colWidths=[2*inch, 3*inch])
+    info_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('BACKGROUND', (1, 0), (1, -1), colors.white),
+    ]))
+    
+    story.append(info_table)
+    story.append(Spacer(1, 30))
+    
+    # Tabla de inventario
+    headers = ["Persona", "DNI", "Dispositivo", "Modelo", "Estado", "Robado", "Fecha Entrega"]
+    table_data = [headers] + inventory_data
+    
+    # Crear tabla
+    inventory_table = Table(table_data, repeatRows=1)
+    inventory_table.setStyle(TableStyle([
+        # Estilo del header
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        
+        # Estilo del contenido
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    
+    story.append(inventory_table)
+    
+    # Construir PDF
+    doc.build(story)
+    return output.getvalue()
+
+async def build_inventory_pdf(current_user: dict, snapshot: Optional[Dict[str, Any]] = None) -> tuple:
+    """Leer el inventario y renderizar el PDF en el pool; devuelve (bytes, nº de items)
+
+    `snapshot` es el de la clave de caché del reporte (si no se indica, se lee).
+    """
+    if snapshot is None:
+        snapshot = await get_inventory_data_snapshot()
+    # Obtener datos del inventario (solo los campos del reporte)
+    projection = {"persona": 1, "dni": 1, "dispositivo": 1, "modelo": 1,
+                  "estado": 1, "robado": 1, "fecha_entrega": 1}
+    inventory_cursor = db.inventory.find({}, projection).sort("persona", 1)
+    inventory_data = []
+    async for item in inventory_cursor:
+        inventory_data.append([
+            item["persona"],
+            item["dni"],
+            item["dispositivo"],
+            item["modelo"],
+            item["estado"],
+            "Sí" if item["robado"] else "No",
+            item["fecha_entrega"].strftime("%d/%m/%Y")
+        ])
+    
+    info_data = [
+        ["Datos al:", format_data_as_of(snapshot)],
+        ["Generado por:", current_user["full_name"]],
+        ["Sede:", current_user.get("sede", "Arequipa 06 - Socabaya")],
+        ["Total de items:", str(len(inventory_data))]
+    ]
+    
+    async with report_semaphore:
+        loop = asyncio.get_running_loop()
+        with trace_span("reportlab"):
+            pdf_bytes = await loop.run_in_executor(
+                get_report_executor(), render_inventory_pdf, inventory_data, info_data
+            )
+    return pdf_bytes, len(inventory_data)
+
+def cleanup_reports_dir():
+    """Eliminar de reports/ los archivos con más de REPORTS_RETENTION_HOURS"""
+    reports_dir = REPORTS_DIR
+    if not os.path.isdir(reports_dir):
+        return
+    cutoff = time.time() - REPORTS_RETENTION_HOURS * 3600
+    removed = 0
+    for filename in os.listdir(reports_dir):
+        path = os.path.join(reports_dir, filename)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    if removed:
+        logger.info(f"Reportes antiguos eliminados: {removed}")
+
+@app.get("/api/reports/inventory/pdf")
+async def generate_inventory_pdf_report(
+    current_user: dict = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Generar reporte PDF del inventario"""
+    try:
+        # Nombre del archivo
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         pdf_filename = f"inventario_inei_{timestamp}.pdf"
-        pdf_path = os.path.join(reports_dir, pdf_filename)
-        
-        # Obtener datos del inventario
-        inventory_cursor = db.inventory.find().sort("persona", 1)
-        inventory_data = []
-        async for item in inventory_cursor:
-            inventory_data.append([
-                item["persona"],
-                item["dni"],
-                item["dispositivo"],
-                item["modelo"],
-                item["estado"],
-                "Sí" if item["robado"] else "No",
-                item["fecha_entrega"].strftime("%d/%m/%Y")
+        
+        # Reutilizar el reporte si los datos no cambiaron
+        snapshot = await get_inventory_data_snapshot()
+        cache_key = report_cache_key("inventory_pdf", snapshot,
+                                     full_name=current_user["full_name"],
+                                     sede=current_user.get("sede", "Arequipa 06 - Socabaya"))
+        etag = f'"{cache_key}"'
+        cache_path = report_cache_path(cache_key, "pdf")
+        
+        if REPORT_CACHE_ENABLED and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        if REPORT_CACHE_ENABLED and os.path.exists(cache_path):
+            await log_activity(current_user, "EXPORT", "report",
+                               details={"type": "pdf", "format": "inventory", "cached": True})
+            return cached_report_response(cache_path, 'application/pdf', pdf_filename, etag)
+        
+        pdf_bytes, items_count = await build_inventory_pdf(current_user, snapshot)
+        if REPORT_CACHE_ENABLED:
+            await asyncio.to_thread(write_report_cache, cache_path, pdf_bytes)
+        
+        # Log de actividad
+        await log_activity(current_user, "EXPORT", "report", details={"type": "pdf", "format": "inventory"})
+        
+        logger.info(f"Reporte PDF generado: {pdf_filename} ({items_count} items) por {current_user['username']}")
+        
+        # Retornar archivo
+        return StreamingResponse(
+            io.BytesIO(pdf_bytes),
+            media_type='application/pdf',
+            headers={"Content-Disposition": f"attachment; filename={pdf_filename}", "ETag": etag}
+        )
+    
+    except Exception as e:
+        logger.error(f"Error generando reporte PDF: {e}")
+        raise HTTPException(status_code=500, detail="Error generando reporte PDF")
+
+# ========================================
+# NOTIFICACIONES Y ALERTAS
+# ========================================
+
+# Las alertas no se cuentan en cada petición: un trabajo del scheduler las
+# evalúa cada ALERTS_REFRESH_MINUTES, guarda la instantánea en
+# `alert_snapshots` (para que un reinicio arranque con la última) y la deja en
+# memoria, de donde la sirve el endpoint. Cada alerta lleva los _id de los
+# items afectados, así que el detalle se resuelve con una búsqueda por _id.
+
+class NotificationService:
+    SNAPSHOT_ID = "equipment"
+    _snapshot: Optional[Dict[str, Any]] = None
+    _lock = asyncio.Lock()
+    
+    @staticmethod
+    def equipment_alert_rules(now: datetime) -> List[tuple]:
+        """(acción, tipo, mensaje, consulta) de cada alerta de equipos"""
+        return [
+            # Equipos robados sin resolver
+            ("revisar_robados", "warning", "{count} equipos reportados como robados",
+             {"robado": True}),
+            # Equipos en mal estado por mucho tiempo
+            ("revisar_mal_estado", "info", "{count} equipos en mal estado por más de 30 días",
+             {"estado": "mal estado", "updated_at": {"$lt": now - timedelta(days=30)}}),
+            # Equipos con garantía próxima a vencer
+            ("revisar_garantias", "warning", "{count} equipos con garantía por vencer",
+             {"garantia_vence": {"$lte": now + timedelta(days=30), "$gte": now}}),
+        ]
+    
+    @classmethod
+    async def refresh_equipment_alerts(cls) -> Dict[str, Any]:
+        """Evaluar las alertas, guardar la instantánea y publicarla en memoria"""
+        async with cls._lock:
+            start = time.perf_counter()
+            now = datetime.now()
+            
+            async def evaluate(action: str, kind: str, message: str, query: Dict[str, Any]):
+                cursor = db.inventory.find(query, {"_id": 1}).limit(ALERT_MAX_IDS)
+                ids = [str(doc["_id"]) async for doc in cursor]
+                count = len(ids)
+                if count == ALERT_MAX_IDS:
+                    count = await db.inventory.count_documents(query)
+                return {"type": kind, "message": message.format(count=count), "action": action,
+                        "count": count, "item_ids": ids, "truncated": count > len(ids)}
+            
+            results = await asyncio.gather(*[
+                evaluate(*rule) for rule in cls.equipment_alert_rules(now)
             ])
+            snapshot = {
+                "_id": cls.SNAPSHOT_ID,
+                "alerts": [alert for alert in results if alert["count"] > 0],
+                "generated_at": now,
+                "seconds": round(time.perf_counter() - start, 3)
+            }
+            await db.alert_snapshots.replace_one({"_id": cls.SNAPSHOT_ID}, snapshot, upsert=True)
+            cls._snapshot = snapshot
+            dashboard_feed.notify("alerts")
+            return snapshot
+    
+    @classmethod
+    async def load_snapshot(cls):
+        """Cargar la última instantánea guardada (al iniciar)"""
+        if cls._snapshot is None:
+            cls._snapshot = await db.alert_snapshots.find_one({"_id": cls.SNAPSHOT_ID})
+    
+    @classmethod
+    async def get_snapshot(cls) -> Dict[str, Any]:
+        if cls._snapshot is None:
+            return await cls.refresh_equipment_alerts()
+        return cls._snapshot
+    
+    @classmethod
+    async def check_equipment_alerts(cls):
+        """Verificar alertas de equipos (desde la instantánea en memoria)"""
+        try:
+            snapshot = await cls.get_snapshot()
+            return [
+                {key: alert[key] for key in ("type", "message", "action", "count")}
+                for alert in snapshot["alerts"]
+            ]
+        except Exception as e:
+            logger.error(f"Error verificando alertas: {e}")
+            return []
+
+@app.get("/api/notifications/alerts")
+async def get_system_alerts(current_user: dict = Depends(get_current_user)):
+    """Obtener alertas del sistema
+
+    Cada alerta incluye hasta ALERT_IDS_IN_SUMMARY ids de items afectados; la
+    lista completa está en /api/notifications/alerts/{action}/items.
+    """
+    try:
+        snapshot = await NotificationService.get_snapshot()
+        alerts = [
+            {**{key: value for key, value in alert.items() if key != "item_ids"},
+             "item_ids": alert["item_ids"][:ALERT_IDS_IN_SUMMARY]}
+            for alert in snapshot["alerts"]
+        ]
+        return jsonable_encoder({"alerts": alerts, "generated_at": snapshot["generated_at"]})
+    
+    except Exception as e:
+        logger.error(f"Error obteniendo alertas: {e}")
+        return {"alerts": []}
+
+@app.get("/api/notifications/alerts/{action}/items")
+async def get_alert_items(
+    action: str,
+    offset: int = 0,
+    limit: int = 100,
+    current_user: dict = Depends(get_current_user)
+):
+    """Items afectados por una alerta, resueltos por _id desde la instantánea"""
+    try:
+        snapshot = await NotificationService.get_snapshot()
+        alert = next((a for a in snapshot["alerts"] if a["action"] == action), None)
+        if alert is None:
+            return {"action": action, "count": 0, "items": []}
+        
+        offset = max(offset, 0)
+        limit = max(1, min(limit, INVENTORY_MAX_PAGE_SIZE))
+        page_ids = [ObjectId(item_id) for item_id in alert["item_ids"][offset:offset + limit]]
+        projection = {field: 1 for field in INVENTORY_LIST_DEFAULT_FIELDS + ["updated_at", "garantia_vence"]}
+        found = {item["_id"]: item async for item in db.inventory.find({"_id": {"$in": page_ids}}, projection)}
+        items = [serialize_inventory_item(found[item_id]) for item_id in page_ids if item_id in found]
+        
+        return jsonable_encoder({
+            "action": action,
+            "count": alert["count"],
+            "truncated": alert.get("truncated", False),
+            "offset": offset,
+            "generated_at": snapshot["generated_at"],
+            "items": items
+        })
+    
+    except Exception as e:
+        logger.error(f"Error obteniendo items de alerta: {e}")
+        raise HTTPException(status_code=500, detail="Error obteniendo items de la alerta")
+
+# ========================================
+# DASHBOARD EN VIVO (SERVER-SENT EVENTS)
+# ========================================
+
+# Un único productor por proceso alimenta a todos los dashboards abiertos:
+# las escrituras lo despiertan (invalidate_stats_cache, log_activity, la
+# instantánea de alertas) y, tras agrupar las ráfagas durante
+# DASHBOARD_FEED_DEBOUNCE_SECONDS, calcula una sola vez lo que cambió y lo
+# reparte ya serializado. Cada DASHBOARD_FEED_TICK_SECONDS revisa además la
+# base (estadísticas en caché y auditoría reciente) para recoger los cambios
+# hechos por otros procesos. Sin suscriptores el productor se detiene, así que
+# la carga depende del ritmo de cambios y no de cuántos dashboards hay.
+#
+# Eventos: `snapshot` (estado completo al conectarse), `stats` (solo los
+# campos que cambiaron), `alerts` (lista completa) y `activity` (nuevas
+# entradas de auditoría). Un cliente que no consume a tiempo se desconecta;
+# el dashboard vuelve a conectarse y recibe un `snapshot` nuevo.
+#
+# EventSource no permite cabeceras propias y la URL queda en los logs de los
+# proxies y en el historial, así que el token de sesión nunca va en ella: el
+# cliente pide con POST un ticket de DASHBOARD_STREAM_TICKET_SECONDS que solo
+# sirve para abrir el stream. La conexión revalida al usuario (activo y con la
+# sesión del ticket vigente) en cada latido y se cierra si ya no lo es.
+
+DASHBOARD_STATS_EXCLUDED = {"system_health", "recent_activities"}
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, default=_backup_json_default)
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+class DashboardFeed:
+    """Productor único de eventos del dashboard y sus suscriptores"""
+    
+    def __init__(self, tick_seconds: float, debounce_seconds: float, queue_size: int):
+        self.tick_seconds = tick_seconds
+        self.debounce_seconds = debounce_seconds
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._wakeup = asyncio.Event()
+        self._pending: Set[str] = set()
+        self._activities: List[Dict[str, Any]] = []
+        self._sent_activity_ids: OrderedDict = OrderedDict()
+        self._last_activity_at: Optional[datetime] = None
+        self._stats: Optional[Dict[str, Any]] = None
+        self._alerts: Optional[Dict[str, Any]] = None
+        self._recent_activities: List[Dict[str, Any]] = []
+        self._sequence = 0
+        self._task: Optional[asyncio.Task] = None
+        self.events_sent = 0
+        self.disconnected_slow = 0
+    
+    # --- Señales desde el resto de la aplicación ---
+    
+    def notify(self, topic: str):
+        """Marcar `stats` o `alerts` como posiblemente cambiados"""
+        if self._task is None:
+            return
+        self._pending.add(topic)
+        self._wakeup.set()
+    
+    def publish_activity(self, activity: Dict[str, Any]):
+        """Encolar una actividad recién registrada en este proceso"""
+        if self._task is None:
+            return
+        self._activities.append(activity)
+        self._wakeup.set()
+    
+    # --- Suscriptores ---
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+    
+    async def snapshot(self) -> Dict[str, Any]:
+        """Estado completo para un suscriptor nuevo (del último cálculo si lo hay)"""
+        if self._stats is None:
+            await self._refresh_stats()
+        if self._alerts is None:
+            await self._refresh_alerts()
+        return {"stats": self._stats, "alerts": self._alerts, "recent_activities": self._recent_activities}
+    
+    def _broadcast(self, event: str, data: Any):
+        self._sequence += 1
+        message = format_sse(event, data, self._sequence)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Cliente lento: se le cierra el stream para que reconecte
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                self.disconnected_slow += 1
+        self.events_sent += 1
+    
+    # --- Productor ---
+    
+    async def _refresh_stats(self) -> Dict[str, Any]:
+        """Recalcular estadísticas y devolver los campos que cambiaron"""
+        stats = await get_cached_system_stats()
+        self._recent_activities = stats.recent_activities
+        self._remember_activities(self._recent_activities)
+        if not self._last_activity_at and self._recent_activities:
+            self._last_activity_at = datetime.fromisoformat(self._recent_activities[0]["timestamp"])
+        
+        fresh = jsonable_encoder(stats.dict(exclude=DASHBOARD_STATS_EXCLUDED))
+        previous, self._stats = self._stats or {}, fresh
+        return {key: value for key, value in fresh.items() if previous.get(key) != value}
+    
+    async def _refresh_alerts(self) -> bool:
+        """Leer la instantánea de alertas; True si es distinta de la enviada"""
+        snapshot = await NotificationService.get_snapshot()
+        alerts = [
+            {**{key: value for key, value in alert.items() if key != "item_ids"},
+             "item_ids": alert["item_ids"][:ALERT_IDS_IN_SUMMARY]}
+            for alert in snapshot["alerts"]
+        ]
+        changed = self._alerts is None or self._alerts["alerts"] != alerts
+        self._alerts = {"generated_at": snapshot["generated_at"].isoformat(), "alerts": alerts}
+        return changed
+    
+    def _remember_activities(self, activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Registrar actividades como enviadas; devuelve las que no lo estaban"""
+        fresh = []
+        for activity in activities:
+            if activity["id"] not in self._sent_activity_ids:
+                self._sent_activity_ids[activity["id"]] = True
+                fresh.append(activity)
+        while len(self._sent_activity_ids) > 1000:
+            self._sent_activity_ids.popitem(last=False)
+        return fresh
+    
+    async def _new_activities(self, poll: bool) -> List[Dict[str, Any]]:
+        """Actividades locales pendientes más, si `poll`, las de otros procesos"""
+        activities, self._activities = self._activities, []
+        if poll and self._last_activity_at is not None:
+            cursor = db.audit_logs.find({"timestamp": {"$gt": self._last_activity_at}}).sort("timestamp", 1).limit(50)
+            activities.extend([serialize_activity(log) async for log in cursor])
+        
+        fresh = self._remember_activities(activities)
+        if fresh:
+            latest = max(datetime.fromisoformat(a["timestamp"]) for a in fresh)
+            self._last_activity_at = max(latest, self._last_activity_at or latest)
+            self._recent_activities = (list(reversed(fresh)) + self._recent_activities)[:10]
+        return fresh
+    
+    async def _run(self):
+        try:
+            while self._subscribers:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.tick_seconds)
+                    poll = False
+                except asyncio.TimeoutError:
+                    self._pending.update({"stats", "alerts"})
+                    poll = True
+                self._wakeup.clear()
+                # Agrupar ráfagas de escrituras en un solo cálculo
+                await asyncio.sleep(self.debounce_seconds)
+                pending, self._pending = self._pending, set()
+                
+                try:
+                    for activity in await self._new_activities(poll):
+                        self._broadcast("activity", activity)
+                    if "stats" in pending:
+                        delta = await self._refresh_stats()
+                        if delta:
+                            self._broadcast("stats", delta)
+                    if "alerts" in pending and await self._refresh_alerts():
+                        self._broadcast("alerts", self._alerts)
+                except Exception as e:
+                    logger.error(f"Error en el canal del dashboard: {e}")
+        finally:
+            self._task = None
+            self._stats = self._alerts = None
+    
+    async def stop(self):
+        for queue in list(self._subscribers):
+            self.unsubscribe(queue)
+            if not queue.full():
+                queue.put_nowait(None)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "running": self._task is not None,
+            "events_sent": self.events_sent,
+            "disconnected_slow": self.disconnected_slow
+        }
+
+dashboard_feed = DashboardFeed(DASHBOARD_FEED_TICK_SECONDS, DASHBOARD_FEED_DEBOUNCE_SECONDS,
+                               DASHBOARD_FEED_QUEUE_SIZE)
+
+DASHBOARD_STREAM_PURPOSE = "dashboard_stream"
+
+async def stream_principal_valid(username: str, session_expires_at: float) -> bool:
+    """Si el dueño de un stream sigue activo y su sesión no ha expirado"""
+    if time.time() >= session_expires_at:
+        return False
+    user = await db.users.find_one({"username": username}, {"is_active": 1})
+    return user is not None and user.get("is_active", True)
+
+@app.post("/api/dashboard/stream-ticket")
+async def create_dashboard_stream_ticket(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Emitir un ticket de corta duración para abrir /api/dashboard/stream"""
+    user = await authenticate_token(credentials.credentials)
+    session = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+    ticket = create_access_token(
+        {"sub": user["username"], "purpose": DASHBOARD_STREAM_PURPOSE, "session_exp": session["exp"]},
+        timedelta(seconds=DASHBOARD_STREAM_TICKET_SECONDS)
+    )
+    return {"ticket": ticket, "expires_in": DASHBOARD_STREAM_TICKET_SECONDS}
+
+@app.get("/api/dashboard/stream")
+async def dashboard_stream(request: Request, ticket: str):
+    """Stream SSE del dashboard (requiere un ticket de /api/dashboard/stream-ticket)"""
+    try:
+        payload = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Ticket expirado")
+    except jwt.JWTError:
+        raise HTTPException(status_code=401, detail="Ticket inválido")
+    username = payload.get("sub")
+    session_expires_at = payload.get("session_exp")
+    if payload.get("purpose") != DASHBOARD_STREAM_PURPOSE or not username or not session_expires_at:
+        raise HTTPException(status_code=401, detail="Ticket inválido")
+    if not await stream_principal_valid(username, session_expires_at):
+        raise HTTPException(status_code=401, detail="Sesión inválida")
+    
+    queue = dashboard_feed.subscribe()
+    try:
+        snapshot = await dashboard_feed.snapshot()
+    except Exception as e:
+        dashboard_feed.unsubscribe(queue)
+        logger.error(f"Error preparando el dashboard en vivo: {e}")
+        raise HTTPException(status_code=500, detail="Error iniciando el dashboard en vivo")
+    
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            yield format_sse("snapshot", snapshot)
+            next_heartbeat = time.monotonic() + DASHBOARD_HEARTBEAT_SECONDS
+            while not await request.is_disconnected():
+                try:
+                    # El latido se cuenta aparte de los eventos: con tráfico
+                    # constante también se revalida al usuario
+                    message = await asyncio.wait_for(queue.get(),
+                                                     timeout=max(0.0, next_heartbeat - time.monotonic()))
+                except asyncio.TimeoutError:
+                    if not await stream_principal_valid(username, session_expires_at):
+                        logger.info(f"Dashboard en vivo cerrado para {username}: sesión expirada o usuario inactivo")
+                        break
+                    next_heartbeat = time.monotonic() + DASHBOARD_HEARTBEAT_SECONDS
+                    yield b": ping\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            dashboard_feed.unsubscribe(queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ========================================
+# ENDPOINT DE MÉTRICAS
+# ========================================
+
+_route_templates: Dict[Any, str] = {}
+
+def request_route_template(scope) -> str:
+    """Plantilla de la ruta atendida (/api/inventory/{item_id}), no la URL concreta
+
+    Usar la plantilla mantiene acotado el número de series; lo que no
+    corresponde a ninguna ruta se agrupa como "unmatched".
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if not _route_templates:
+        for route in app.routes:
+            if hasattr(route, "endpoint"):
+                _route_templates.setdefault(route.endpoint, route.path)
+    return _route_templates.get(endpoint, "unmatched")
+
+class RequestMetricsMiddleware:
+    """Middleware ASGI que cuenta las peticiones y mide su latencia por ruta
+
+    La latencia llega hasta el último fragmento del cuerpo, así que las
+    exportaciones en streaming se miden completas. Los flujos SSE se cuentan
+    pero no entran al histograma: su duración es la de la conexión. Cada
+    petición lleva una RequestTrace para el registro de peticiones lentas.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        response = {"status": 500, "stream": False}
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for key, value in message.get("headers", ()):
+                    if key == b"content-type" and value.startswith(b"text/event-stream"):
+                        response["stream"] = True
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_trace.reset(token)
+            elapsed = time.perf_counter() - start
+            route = request_route_template(scope)
+            http_requests_total.inc((scope["method"], route, str(response["status"])))
+            if not response["stream"]:
+                http_request_duration.observe((scope["method"], route), elapsed)
+                slow_request_log.record(scope, route, response["status"], elapsed, trace)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+_event_loop_lag_task: Optional[asyncio.Task] = None
+
+async def monitor_event_loop_lag(interval: float):
+    """Duerme `interval` segundos en bucle y registra cuánto tarda de más en despertar
+
+    Ese retraso es el tiempo que el loop pasó ocupado en código síncrono
+    (serialización, pandas, bcrypt fuera del pool...).
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe((), max(0.0, loop.time() - start - interval))
+
+_job_started: Dict[str, float] = {}
+
+def record_scheduler_job(event):
+    """Listener de APScheduler: mide cada ejecución desde que se envía hasta que termina"""
+    if event.code == EVENT_JOB_SUBMITTED:
+        _job_started[event.job_id] = time.perf_counter()
+        return
+    start = _job_started.pop(event.job_id, None)
+    if start is not None:
+        outcome = "error" if event.code == EVENT_JOB_ERROR else "ok"
+        scheduler_job_duration.observe((event.job_id, outcome), time.perf_counter() - start)
+
+scheduler.add_listener(record_scheduler_job, EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+metrics.register(Gauge(
+    "inei_audit_queue_depth", "Entradas de auditoría pendientes de escribir",
+    lambda: audit_writer.metrics()["queued"]))
+metrics.register(Gauge(
+    "inei_dashboard_subscribers", "Clientes conectados al flujo del dashboard",
+    lambda: len(dashboard_feed._subscribers)))
+metrics.register(Gauge(
+    "inei_name_index_documents", "Documentos en los índices de nombres en memoria",
+    lambda: {(source,): len(index._keys) for source, index in NAME_INDEXES.items()},
+    ("source",)))
+
+@app.get("/api/metrics")
+async def get_metrics(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """Métricas del proceso en formato de texto de Prometheus
+
+    Exponen rutas, colecciones y comandos de MongoDB y contadores de trabajos y
+    usuarios, así que exigen METRICS_TOKEN como bearer (`bearer_token` en la
+    configuración de Prometheus). Sin METRICS_TOKEN configurado no se sirven.
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=503, detail="Métricas deshabilitadas: configure METRICS_TOKEN")
+    provided = credentials.credentials if credentials else ""
+    if not hmac.compare_digest(provided.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ========================================
+# PERFILADO Y PETICIONES LENTAS
+# ========================================
+
+class SlowRequestLog:
+    """Las N peticiones más lentas desde el arranque, con su desglose por tramo
+
+    Es un min-heap de tamaño fijo: una petición más rápida que la más rápida
+    guardada se descarta sin construir el registro, así que el costo para las
+    peticiones normales es una comparación.
+    """
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+    
+    def record(self, scope, route: str, status_code: int, seconds: float, trace: RequestTrace):
+        if self.size <= 0:
+            return
+        if len(self._heap) >= self.size and seconds <= self._heap[0][0]:
+            return
+        
+        spans = sorted(trace.spans.items(), key=lambda span: span[1][0], reverse=True)
+        attributed = sum(total for total, _ in trace.spans.values())
+        entry = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route,
+            "status": status_code,
+            "duration_ms": round(seconds * 1000, 2),
+            "finished_at": datetime.now().isoformat(),
+            "spans": [
+                {"name": name, "ms": round(total * 1000, 2), "count": count}
+                for name, (total, count) in spans
+            ],
+            # Los tramos pueden solaparse (gather), por eso el resto no baja de 0
+            "unattributed_ms": round(max(0.0, seconds - attributed) * 1000, 2)
+        }
+        item = (seconds, next(self._sequence), entry)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heapreplace(self._heap, item)
+    
+    def entries(self) -> List[dict]:
+        return [entry for _, _, entry in sorted(self._heap, reverse=True)]
+    
+    def reset(self):
+        self._heap.clear()
+
+slow_request_log = SlowRequestLog(SLOW_REQUEST_LOG_SIZE)
+
+# Frames "hoja" de un hilo que está esperando, no trabajando
+PROFILE_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+}
+
+class SamplingProfiler:
+    """Perfilador por muestreo del proceso en ejecución
+
+    Un hilo aparte lee `sys._current_frames()` cada `interval` segundos y
+    acumula las pilas en formato "collapsed" (raíz;...;hoja conteo), el que
+    consumen flamegraph.pl y speedscope. Se muestrean el hilo del event loop y
+    los hilos de trabajo (openpyxl, pandas y Motor corren en hilos); los hilos
+    de monitoreo de pymongo y las muestras ociosas se descartan. El PDF se
+    renderiza en otro proceso, así que reportlab no aparece aquí; su tiempo se
+    ve en el tramo "reportlab" de las peticiones lentas.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+    
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+    
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            marker = filename.rfind("site-packages" + os.sep)
+            if marker >= 0:
+                filename = filename[marker + len("site-packages") + 1:]
+            else:
+                filename = os.path.basename(filename)
+            label = self._labels[code] = f"{filename}:{code.co_name}"
+        return label
+    
+    def sample(self, seconds: float, interval: float, loop_thread: int) -> dict:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Ya hay un perfilado en curso")
+        try:
+            stacks: Dict[str, int] = {}
+            leaves: Dict[str, int] = {}
+            ticks = loop_busy = samples = idle = 0
+            own = threading.get_ident()
+            start = time.perf_counter()
+            deadline = start + seconds
+            
+            while time.perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                ticks += 1
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    name = "event-loop" if ident == loop_thread else names.get(ident, f"thread-{ident}")
+                    if name.startswith("pymongo_"):
+                        continue
+                    code = frame.f_code
+                    if (os.path.basename(code.co_filename), code.co_name) in PROFILE_IDLE_LEAVES:
+                        idle += 1
+                        continue
+                    
+                    frames = []
+                    while frame is not None:
+                        frames.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    frames.append(name)
+                    frames.reverse()
+                    stack = ";".join(frames)
+                    stacks[stack] = stacks.get(stack, 0) + 1
+                    leaves[frames[-1]] = leaves.get(frames[-1], 0) + 1
+                    samples += 1
+                    if ident == loop_thread:
+                        loop_busy += 1
+                time.sleep(interval)
+            
+            return {
+                "duration_seconds": round(time.perf_counter() - start, 3),
+                "interval_ms": round(interval * 1000, 3),
+                "ticks": ticks,
+                "samples": samples,
+                "idle_samples": idle,
+                "event_loop_busy_ratio": round(loop_busy / ticks, 4) if ticks else 0.0,
+                "top_functions": [
+                    {"function": label, "samples": count}
+                    for label, count in heapq.nlargest(30, leaves.items(), key=lambda leaf: leaf[1])
+                ],
+                "collapsed": stacks
+            }
+        finally:
+            self._lock.release()
+
+sampling_profiler = SamplingProfiler()
+
+@app.post("/api/admin/profile")
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = PROFILE_DEFAULT_INTERVAL_MS,
+    output: str = "json",
+    current_user: dict = Depends(require_role([UserRole.ADMIN]))
+):
+    """Perfilar este worker durante `seconds` segundos
+
+    `output=json` devuelve un resumen con las funciones más frecuentes y las
+    pilas; `output=collapsed` devuelve texto listo para flamegraph.pl o speedscope.
+    """
+    if output not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail=f"Formato no válido: {output}")
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"La duración debe estar entre 0 y {PROFILE_MAX_SECONDS} segundos")
+    if sampling_profiler.running:
+        raise HTTPException(status_code=409, detail="Ya hay un perfilado en curso")
+    
+    try:
+        interval = max(interval_ms, 1.0) / 1000
+        report = await asyncio.to_thread(sampling_profiler.sample, seconds, interval, threading.get_ident())
+        
+        await log_activity(current_user, "PROFILE", "system",
+                           details={"seconds": seconds, "samples": report["samples"]})
+        
+        if output == "collapsed":
+            lines = [f"{stack} {count}" for stack, count in sorted(report["collapsed"].items())]
+            return Response(content="\n".join(lines) + "\n", media_type="text/plain; charset=utf-8")
+        report["collapsed"] = [
+            {"stack": stack, "samples": count}
+            for stack, count in sorted(report["collapsed"].items(), key=lambda entry: entry[1], reverse=True)
+        ]
+        return report
+    
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error perfilando el worker: {e}")
+        raise HTTPException(status_code=500, detail="Error ejecutando el perfilado")
+
+@app.get("/api/admin/slow-requests")
+async def get_slow_requests(current_user: dict = Depends(require_role([UserRole.ADMIN]))):
+    """Peticiones más lentas de este worker con el tiempo por tramo (mongo, openpyxl...)"""
+    return {"size": slow_request_log.size, "requests": slow_request_log.entries()}
+
+@app.delete("/api/admin/slow-requests")
+async def reset_slow_requests(current_user: dict = Depends(require_role([UserRole.ADMIN]))):
+    """Vaciar el registro de peticiones lentas (p. ej. después de un despliegue)"""
+    slow_request_log.reset()
+    return {"message": "Registro de peticiones lentas vaciado"}
+
+# ========================================
+# ENDPOINTS ADICIONALES MEJORADOS
+# ========================================
+
+# ----------------------------------------
+# Exportación Excel en streaming
+# ----------------------------------------
+# El libro se arma con openpyxl en modo `write_only`: las filas se escriben a
+# medida que el cursor las entrega, sin DataFrame intermedio, y el .xlsx se
+# envía por bloques mientras se comprime. En modo write_only los anchos de
+# columna deben fijarse antes de la primera fila, así que se calculan sobre
+# las primeras EXCEL_WIDTH_SAMPLE_ROWS filas (en la misma pasada).
+#
+# La respuesta HTTP (estado y cabeceras) sale apenas se valida la petición y
+# el libro se arma dentro del propio stream. El primer byte del .xlsx no puede
+# adelantarse más: openpyxl copia la hoja al zip recién al guardar el libro.
+
+EXCEL_HEADERS = [
+    'ID', 'Persona', 'DNI', 'Dispositivo', 'Control Patrimonial', 'Modelo',
+    'Número de Serie', 'IMEI', 'Funda Tablet', 'Plan de Datos', 'Power Tech',
+    'Teléfono', 'Correo Personal', 'Fecha de Entrega', 'Estado', 'Robado',
+    'Motivo Reparación', 'Ubicación Actual', 'Responsable Entrega', 'Observaciones',
+    'Valor Estimado', 'Garantía Vence', 'Proveedor', 'Fecha Compra', 'Creado Por',
+    'Actualizado Por', 'Fecha Creación', 'Última Actualización'
+]
+EXCEL_MAX_COLUMN_WIDTH = 50
+EXCEL_STREAM_CHUNK_BYTES = 64 * 1024
+
+def _format_date(value: Optional[datetime], fmt: str) -> str:
+    return value.strftime(fmt) if value else ''
+
+def inventory_excel_row(item: Dict[str, Any]) -> list:
+    """Fila del Excel para un item, en el orden de EXCEL_HEADERS"""
+    return [
+        str(item['_id']),
+        item['persona'],
+        item['dni'],
+        item['dispositivo'],
+        item['control_patrimonial'],
+        item['modelo'],
+        item['numero_serie'],
+        item.get('imei', ''),
+        'Sí' if item['funda_tablet'] else 'No',
+        'Sí' if item['plan_datos'] else 'No',
+        'Sí' if item['power_tech'] else 'No',
+        item['telefono'],
+        item['correo_personal'],
+        item['fecha_entrega'].strftime('%d/%m/%Y %H:%M'),
+        item['estado'],
+        'Sí' if item['robado'] else 'No',
+        item.get('motivo_reparacion', ''),
+        item.get('ubicacion_actual', ''),
+        item.get('responsable_entrega', ''),
+        item.get('observaciones', ''),
+        item.get('valor_estimado', ''),
+        _format_date(item.get('garantia_vence'), '%d/%m/%Y'),
+        item.get('proveedor', ''),
+        _format_date(item.get('fecha_compra'), '%d/%m/%Y'),
+        item.get('created_by', ''),
+        item.get('updated_by', ''),
+        _format_date(item.get('created_at'), '%d/%m/%Y %H:%M'),
+        _format_date(item.get('updated_at'), '%d/%m/%Y %H:%M')
+    ]
+
+def _styled_header(worksheet, headers: List[str], center: bool = False) -> list:
+    header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+    header_font = Font(color='FFFFFF', bold=True)
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(worksheet, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        if center:
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+        cells.append(cell)
+    return cells
+
+def _append_rows(worksheet, rows: List[list]):
+    with trace_span("openpyxl"):
+        for row in rows:
+            worksheet.append(row)
+
+async def build_inventory_workbook(current_user: dict, progress=None,
+                                  snapshot: Optional[Dict[str, Any]] = None) -> tuple:
+    """Escribir el inventario en un libro write_only; devuelve (libro, nº de items)
+
+    `progress`, si se indica, es una corrutina que recibe (items escritos, total).
+    `snapshot` es el de la clave de caché del archivo (si no se indica, se lee).
+    """
+    if snapshot is None:
+        snapshot = await get_inventory_data_snapshot()
+    workbook = openpyxl.Workbook(write_only=True)
+    expected_total = (await read_inventory_stats())["total_items"] if progress else 0
+    worksheet = workbook.create_sheet('Inventario')
+    
+    inventory_cursor = db.inventory.find().sort("persona", 1).batch_size(EXCEL_ROW_CHUNK)
+    widths = [len(header) for header in EXCEL_HEADERS]
+    pending: List[list] = []
+    header_written = False
+    items_count = 0
+    
+    def write_header():
+        for index, width in enumerate(widths, start=1):
+            letter = get_column_letter(index)
+            worksheet.column_dimensions[letter].width = min(width + 2, EXCEL_MAX_COLUMN_WIDTH)
+        worksheet.append(_styled_header(worksheet, EXCEL_HEADERS, center=True))
+    
+    async for item in inventory_cursor:
+        row = inventory_excel_row(item)
+        items_count += 1
+        if not header_written:
+            for index, value in enumerate(row):
+                length = len(str(value)) if value is not None else 0
+                if length > widths[index]:
+                    widths[index] = length
+            pending.append(row)
+            if len(pending) >= EXCEL_WIDTH_SAMPLE_ROWS:
+                write_header()
+                header_written = True
+                await asyncio.to_thread(_append_rows, worksheet, pending)
+                pending = []
+            continue
+        
+        pending.append(row)
+        if len(pending) >= EXCEL_ROW_CHUNK:
+            await asyncio.to_thread(_append_rows, worksheet, pending)
+            pending = []
+            if progress:
+                await progress(items_count, max(expected_total, items_count))
+    
+    if not header_written:
+        write_header()
+    if pending:
+        await asyncio.to_thread(_append_rows, worksheet, pending)
+    
+    # Hoja de estadísticas (contadores materializados, sin recorrer la colección)
+    stats_data = await get_cached_system_stats()
+    stats_sheet = workbook.create_sheet('Estadísticas')
+    stats_sheet.append(_styled_header(stats_sheet, ['Concepto', 'Valor']))
+    for row in [
+        ['Total de Items', stats_data.total_items],
+        ['Items en Buen Estado', stats_data.items_bien],
+        ['Items en Mal Estado', stats_data.items_mal_estado],
+        ['Items en Reparación', stats_data.items_en_reparacion],
+        ['Items Robados', stats_data.items_robados],
+        ['Total de Reparaciones', stats_data.total_repairs],
+        ['Datos al', format_data_as_of(snapshot)],
+        ['Exportado Por', current_user['full_name']],
+        ['Sede', current_user.get('sede', 'Arequipa 06 - Socabaya')]
+    ]:
+        stats_sheet.append(row)
+    
+    # Hoja de dispositivos por tipo
+    devices_sheet = workbook.create_sheet('Dispositivos por Tipo')
+    devices_sheet.append(_styled_header(devices_sheet, ['Tipo de Dispositivo', 'Cantidad']))
+    for device, count in stats_data.devices_by_type.items():
+        devices_sheet.append([device, count])
+    
+    return workbook, items_count
+
+class _QueueWriter(io.RawIOBase):
+    """Archivo de solo escritura (no posicionable) que entrega bloques a una cola asyncio"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, tee=None):
+        self._loop = loop
+        self._queue = queue
+        self._tee = tee
+        self._buffer = bytearray()
+        self.cancelled = False
+    
+    def writable(self) -> bool:
+        return True
+    
+    def _put(self, chunk):
+        asyncio.run_coroutine_threadsafe(self._queue.put(chunk), self._loop).result()
+    
+    def write(self, data) -> int:
+        if self.cancelled:
+            raise IOError("Descarga cancelada por el cliente")
+        if self._tee is not None:
+            self._tee.write(data)
+        self._buffer.extend(data)
+        if len(self._buffer) >= EXCEL_STREAM_CHUNK_BYTES:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+    
+    def finish(self):
+        if self._buffer and not self.cancelled:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        self._put(None)
+
+async def stream_workbook(workbook, cache_path: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Guardar el libro en un hilo y ceder el .xlsx por bloques
+
+    Con `cache_path`, los mismos bytes se copian a ese archivo, que solo se
+    publica si el libro se escribió completo.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+    partial_path = cache_path + ".part" if cache_path else None
+    tee = None
+    if partial_path:
+        os.makedirs(os.path.dirname(partial_path), exist_ok=True)
+        tee = open(partial_path, "wb")
+    writer = _QueueWriter(loop, queue, tee)
+    
+    def produce():
+        completed = False
+        try:
+            with trace_span("openpyxl"):
+                workbook.save(writer)
+            completed = True
+        finally:
+            if tee is not None:
+                tee.close()
+                if completed:
+                    os.replace(partial_path, cache_path)
+                else:
+                    os.remove(partial_path)
+            writer.finish()
+    
+    future = loop.run_in_executor(None, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        await future
+    finally:
+        if not future.done():
+            # El cliente cortó la descarga: liberar al hilo productor
+            writer.cancelled = True
+            while not future.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.sleep(0.01)
+
+async def stream_inventory_workbook(current_user: dict, cache_path: Optional[str],
+                                    snapshot: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """Armar el libro con la respuesta ya iniciada y cederlo por bloques"""
+    try:
+        workbook, items_count = await build_inventory_workbook(current_user, snapshot=snapshot)
+    except Exception as e:
+        # Las cabeceras ya salieron: el cliente recibe una descarga cortada
+        logger.error(f"Error exportando Excel mejorado: {e}")
+        raise
+    
+    await log_activity(current_user, "EXPORT", "inventory",
+                       details={"format": "excel_enhanced", "items_count": items_count})
+    logger.info(f"Excel mejorado exportado por {current_user['username']}: {items_count} items")
+    
+    async for chunk in stream_workbook(workbook, cache_path):
+        yield chunk
+
+@app.get("/api/inventory/export/excel/enhanced")
+async def export_inventory_excel_enhanced(
+    current_user: dict = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Exportar inventario a Excel con formato mejorado"""
+    try:
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        
+        # Generar nombre de archivo
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"inventario_inei_completo_{timestamp}.xlsx"
+        
+        # Reutilizar el archivo si los datos no cambiaron (la hoja de
+        # estadísticas también incluye el total de reparaciones)
+        snapshot = await get_inventory_data_snapshot()
+        stats_data = await get_cached_system_stats()
+        cache_key = report_cache_key("inventory_excel_enhanced", snapshot,
+                                     full_name=current_user["full_name"],
+                                     sede=current_user.get("sede", "Arequipa 06 - Socabaya"),
+                                     total_repairs=stats_data.total_repairs)
+        etag = f'"{cache_key}"'
+        cache_path = report_cache_path(cache_key, "xlsx")
+        
+        if REPORT_CACHE_ENABLED and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        if REPORT_CACHE_ENABLED and os.path.exists(cache_path):
+            await log_activity(current_user, "EXPORT", "inventory",
+                               details={"format": "excel_enhanced", "cached": True})
+            return cached_report_response(cache_path, media_type, filename, etag)
+        
+        return StreamingResponse(
+            stream_inventory_workbook(current_user, cache_path if REPORT_CACHE_ENABLED else None, snapshot),
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={filename}", "ETag": etag}
+        )
+    
+    except Exception as e:
+        logger.error(f"Error exportando Excel mejorado: {e}")
+        raise HTTPException(status_code=500, detail="Error generando archivo Excel")
+
+# ----------------------------------------
+# Importación masiva desde Excel
+# ----------------------------------------
+# El archivo se lee con openpyxl en modo `read_only` por bloques de
+# IMPORT_CHUNK_ROWS filas. Cada bloque se valida columna a columna con pandas
+# (sin instanciar un modelo pydantic por fila) y las filas válidas se
+# insertan con `insert_many` no ordenado; los DNI duplicados se detectan por
+# el índice único y se reportan desde BulkWriteError.
+
+IMPORT_FIELDS = {
+    "persona": "Persona",
+    "dni": "DNI",
+    "dispositivo": "Dispositivo",
+    "control_patrimonial": "Control Patrimonial",
+    "modelo": "Modelo",
+    "numero_serie": "Número de Serie",
+    "imei": "IMEI",
+    "funda_tablet": "Funda Tablet",
+    "plan_datos": "Plan de Datos",
+    "power_tech": "Power Tech",
+    "telefono": "Teléfono",
+    "correo_personal": "Correo Personal",
+    "fecha_entrega": "Fecha de Entrega",
+    "estado": "Estado",
+    "robado": "Robado",
+    "motivo_reparacion": "Motivo Reparación",
+    "ubicacion_actual": "Ubicación Actual",
+    "observaciones": "Observaciones",
+    "valor_estimado": "Valor Estimado",
+    "garantia_vence": "Garantía Vence",
+    "proveedor": "Proveedor",
+    "fecha_compra": "Fecha Compra"
+}
+# (campo, longitud mínima, longitud máxima) según InventoryItemEnhanced
+IMPORT_TEXT_RULES = [
+    ("persona", 2, 100),
+    ("dispositivo", 2, 100),
+    ("control_patrimonial", 1, 50),
+    ("modelo", 1, 100),
+    ("numero_serie", 1, 100),
+    ("imei", 0, 20)
+]
+IMPORT_BOOLEAN_FIELDS = ["funda_tablet", "plan_datos", "power_tech", "robado"]
+IMPORT_DATE_FIELDS = ["fecha_entrega", "garantia_vence", "fecha_compra"]
+IMPORT_OPTIONAL_TEXT_FIELDS = ["motivo_reparacion", "ubicacion_actual", "observaciones", "proveedor"]
+IMPORT_BOOLEAN_VALUES = {"si": True, "sí": True, "true": True, "1": True, "x": True,
+                         "no": False, "false": False, "0": False, "": False}
+ESTADOS_VALIDOS = {"bien", "mal estado", "en reparacion"}
+EMAIL_PATTERN = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+
+def _normalize_header(value: Any) -> str:
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[\s_]+", " ", text).strip().lower()
+
+IMPORT_HEADER_MAP = {}
+for _field, _label in IMPORT_FIELDS.items():
+    IMPORT_HEADER_MAP[_normalize_header(_label)] = _field
+    IMPORT_HEADER_MAP[_normalize_header(_field)] = _field
+
+def _cell_text(value: Any) -> str:
+    """Texto de una celda; los números enteros se escriben sin decimales"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def _cell_dni(value: Any) -> str:
+    # Excel guarda los DNI numéricos sin ceros a la izquierda
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and float(value).is_integer():
+        return f"{int(value):08d}"
+    return _cell_text(value)
+
+def _read_sheet_chunk(rows, size: int) -> List[tuple]:
+    """Leer hasta `size` filas no vacías del iterador de openpyxl (en un hilo)"""
+    chunk = []
+    for row in rows:
+        if all(value is None or value == "" for value in row[1]):
+            continue
+        chunk.append(row)
+        if len(chunk) >= size:
+            break
+    return chunk
+
+def validate_import_chunk(rows: List[tuple], columns: Dict[int, str],
+                          seen_dnis: set, current_user: dict) -> tuple:
+    """Validar un bloque de filas columna a columna
+
+    `rows` son tuplas (número de fila Excel, valores). Devuelve
+    (documentos válidos, números de fila de cada documento, errores).
+    """
+    row_numbers = [number for number, _ in rows]
+    data = {field: [values[index] if index < len(values) else None for _, values in rows]
+            for index, field in columns.items()}
+    df = pd.DataFrame(data, index=row_numbers)
+    for field in IMPORT_FIELDS:
+        if field not in df:
+            df[field] = None
+    
+    row_errors: Dict[int, List[str]] = {}
+    
+    def reject(mask, message: str):
+        for number in df.index[mask.to_numpy(dtype=bool)]:
+            row_errors.setdefault(number, []).append(message)
+    
+    # Texto
+    for field, min_length, max_length in IMPORT_TEXT_RULES:
+        df[field] = df[field].map(_cell_text)
+        lengths = df[field].str.len()
+        label = IMPORT_FIELDS[field]
+        if min_length:
+            reject(lengths == 0, f"{label} es obligatorio")
+            reject((lengths > 0) & (lengths < min_length), f"{label} debe tener al menos {min_length} caracteres")
+        reject(lengths > max_length, f"{label} no puede superar {max_length} caracteres")
+    for field in IMPORT_OPTIONAL_TEXT_FIELDS:
+        df[field] = df[field].map(_cell_text)
+    
+    # DNI: formato, duplicados dentro del archivo
+    df["dni"] = df["dni"].map(_cell_dni)
+    dni_valid = df["dni"].str.fullmatch(r"\d{8}")
+    reject(~dni_valid, "DNI debe tener exactamente 8 dígitos numéricos")
+    repeated = dni_valid & (df["dni"].duplicated(keep="first") | df["dni"].isin(seen_dnis))
+    reject(repeated, "DNI repetido en el archivo")
+    seen_dnis.update(df.loc[dni_valid, "dni"])
+    
+    # Teléfono y correo
+    df["telefono"] = df["telefono"].map(_cell_text)
+    reject(~df["telefono"].str.fullmatch(r"\d{9,15}"), "Teléfono debe tener entre 9 y 15 dígitos")
+    df["correo_personal"] = df["correo_personal"].map(_cell_text)
+    reject(~df["correo_personal"].str.fullmatch(EMAIL_PATTERN), "Correo Personal no es un email válido")
+    
+    # Estado
+    df["estado"] = df["estado"].map(_cell_text).str.lower()
+    reject(~df["estado"].isin(ESTADOS_VALIDOS), "Estado debe ser 'bien', 'mal estado' o 'en reparacion'")
+    
+    # Booleanos (Sí/No)
+    for field in IMPORT_BOOLEAN_FIELDS:
+        normalized = df[field].map(_cell_text).str.lower()
+        reject(~normalized.isin(list(IMPORT_BOOLEAN_VALUES)), f"{IMPORT_FIELDS[field]} debe ser Sí o No")
+        df[field] = normalized.map(IMPORT_BOOLEAN_VALUES).fillna(False).astype(bool)
+    
+    # Valor estimado
+    raw_valor = df["valor_estimado"].map(_cell_text)
+    valor = pd.to_numeric(raw_valor.where(raw_valor != ""), errors="coerce")
+    reject((raw_valor != "") & (valor.isna() | (valor < 0)), "Valor Estimado debe ser un número mayor o igual a 0")
+    df["valor_estimado"] = valor
+    
+    # Fechas (celdas de fecha o texto dd/mm/aaaa)
+    for field in IMPORT_DATE_FIELDS:
+        raw = df[field]
+        present = raw.map(lambda value: _cell_text(value) != "")
+        parsed = pd.to_datetime(raw.where(present), errors="coerce", dayfirst=True)
+        reject(present & parsed.isna(), f"{IMPORT_FIELDS[field]} no es una fecha válida")
+        df[field] = parsed
+    
+    # Documentos para las filas válidas
+    now = datetime.now()
+    documents, document_rows = [], []
+    valid = df[~df.index.isin(list(row_errors))]
+    for number, record in zip(valid.index, valid.to_dict("records")):
+        document = {
+            "id": None,
+            **{field: record[field] for field in IMPORT_FIELDS},
+            "responsable_entrega": current_user["full_name"],
+            "created_by": current_user["username"],
+            "updated_by": current_user["username"],
+            "created_at": now,
+            "updated_at": now
+        }
+        for field in IMPORT_DATE_FIELDS:
+            value = document[field]
+            document[field] = value.to_pydatetime() if pd.notna(value) else None
+        if document["fecha_entrega"] is None:
+            document["fecha_entrega"] = now
+        if pd.isna(document["valor_estimado"]):
+            document["valor_estimado"] = None
+        document["imei"] = document["imei"] or None
+        document["ubicacion_actual"] = document["ubicacion_actual"] or "Sede Arequipa 06 - Socabaya"
+        for field in ("observaciones", "proveedor"):
+            document[field] = document[field] or None
+        documents.append(document)
+        document_rows.append(number)
+    
+    errors = [
+        {"row": number, "dni": df.at[number, "dni"], "errors": messages}
+        for number, messages in sorted(row_errors.items())
+    ]
+    return documents, document_rows, errors
+
+async def insert_inventory_batch(documents: List[Dict[str, Any]]) -> tuple:
+    """Insertar items con `insert_many` no ordenado
+
+    Devuelve (documentos insertados, [(posición, mensaje)] de los rechazados).
+    Los DNI duplicados los detecta el índice único (código 11000).
+    """
+    if not documents:
+        return [], []
+    failed: Dict[int, str] = {}
+    try:
+        await db.inventory.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            if error.get("code") == 11000:
+                failed[error["index"]] = "DNI ya existe en el inventario"
+            else:
+                failed[error["index"]] = error.get("errmsg", "Error insertando item")
+    
+    inserted = [doc for index, doc in enumerate(documents) if index not in failed]
+    if inserted:
+        await apply_inventory_stats_change(new_items=inserted)
+        inventory_name_index.apply(new_items=inserted)
+    return inserted, sorted(failed.items())
+
+async def import_inventory_file(path: str, current_user: dict, progress=None) -> Dict[str, Any]:
+    """Importar un .xlsx ya guardado en disco; devuelve el resumen de la importación
+
+    `progress`, si se indica, es una corrutina que recibe (filas procesadas,
+    filas estimadas). Lanza HTTPException(400) si el archivo no es válido.
+    """
+    start = time.perf_counter()
+    try:
+        workbook = await asyncio.to_thread(openpyxl.load_workbook, path, read_only=True, data_only=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail="No se pudo leer el archivo Excel")
+    
+    try:
+        worksheet = workbook["Inventario"] if "Inventario" in workbook.sheetnames else workbook.worksheets[0]
+        estimated_rows = max((worksheet.max_row or 1) - 1, 0)
+        rows = ((number, values) for number, values in
+                enumerate(worksheet.iter_rows(values_only=True), start=1))
+        
+        header = await asyncio.to_thread(next, rows, None)
+        columns = {}
+        for index, label in enumerate(header[1] if header else []):
+            field = IMPORT_HEADER_MAP.get(_normalize_header(label))
+            if field and field not in columns.values():
+                columns[index] = field
+        missing = [IMPORT_FIELDS[f] for f in ("persona", "dni", "dispositivo", "control_patrimonial",
+                                              "modelo", "numero_serie", "telefono", "correo_personal",
+                                              "estado") if f not in columns.values()]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Faltan columnas obligatorias: {', '.join(missing)}")
+        
+        imported_count = 0
+        total_rows = 0
+        errors: List[Dict[str, Any]] = []
+        seen_dnis: set = set()
+        
+        while True:
+            chunk = await asyncio.to_thread(_read_sheet_chunk, rows, IMPORT_CHUNK_ROWS)
+            if not chunk:
+                break
+            total_rows += len(chunk)
+            
+            with trace_span("pandas"):
+                documents, document_rows, chunk_errors = await asyncio.to_thread(
+                    validate_import_chunk, chunk, columns, seen_dnis, current_user
+                )
+            errors.extend(chunk_errors)
+            
+            for offset in range(0, len(documents), IMPORT_BATCH_SIZE):
+                batch = documents[offset:offset + IMPORT_BATCH_SIZE]
+                inserted, failed = await insert_inventory_batch(batch)
+                imported_count += len(inserted)
+                for index, message in failed:
+                    errors.append({
+                        "row": document_rows[offset + index],
+                        "dni": batch[index]["dni"],
+                        "errors": [message]
+                    })
+            
+            if progress:
+                await progress(total_rows, max(estimated_rows, total_rows))
+    finally:
+        await asyncio.to_thread(workbook.close)
+    
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "total_rows": total_rows,
+        "imported_count": imported_count,
+        "rejected_count": len(errors),
+        "errors": errors,
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+
+async def save_upload_to_temp(file: UploadFile, suffix: str = ".xlsx", directory: Optional[str] = None) -> str:
+    """Guardar una subida en un archivo temporal, respetando MAX_FILE_SIZE"""
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False, dir=directory) as temp_file:
+        temp_path = temp_file.name
+        size = 0
+        try:
+            while True:
+                chunk = await file.read(1024 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise HTTPException(status_code=400, detail="El archivo supera el tamaño máximo permitido")
+                temp_file.write(chunk)
+        except Exception:
+            temp_file.close()
+            os.remove(temp_path)
+            raise
+    return temp_path
+
+@app.post("/api/inventory/import/excel")
+async def import_inventory_excel(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Importar items de inventario desde Excel (.xlsx)"""
+    temp_path = None
+    try:
+        if not (file.filename or "").lower().endswith(".xlsx"):
+            raise HTTPException(status_code=400, detail="El archivo debe ser .xlsx")
+        
+        temp_path = await save_upload_to_temp(file)
+        summary = await import_inventory_file(temp_path, current_user)
         
-        # Crear PDF
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-        story = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=1  # Centrado
-        )
+        # Log de actividad
+        await log_activity(current_user, "IMPORT", "inventory", details={
+            "filename": file.filename,
+            "total_rows": summary["total_rows"],
+            "imported_count": summary["imported_count"],
+            "rejected_count": summary["rejected_count"]
+        })
         
-        # Título
-        title = Paragraph("REPORTE DE INVENTARIO - INEI<br/>Censos Nacionales 2025", title_style)
-        story.append(title)
-        story.append(Spacer(1, 20))
-        
-        # Información del reporte
-        info_data = [
-            ["Fecha de generación:", datetime.now().strftime("%d/%m/%Y %H:%M:%S")],
-            ["Generado por:", current_user["full_name"]],
-            ["Sede:", current_user.get("sede", "Arequipa 06 - Socabaya")],
-            ["Total de items:", str(len(inventory_data))]
-        ]
+        logger.info(f"Excel importado por {current_user['username']}: "
+                    f"{summary['imported_count']}/{summary['total_rows']} items "
+                    f"en {summary['seconds']:.2f}s ({summary['rejected_count']} rechazados)")
         
-        info_table = Table(info_data, colWidths=[2*inch, 3*inch])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BACKGROUND', (1, 0), (1, -1), colors.white),
-        ]))
-        
-        story.append(info_table)
-        story.append(Spacer(1, 30))
-        
-        # Tabla de inventario
-        headers = ["Persona", "DNI", "Dispositivo", "Modelo", "Estado", "Robado", "Fecha Entrega"]
-        table_data = [headers] + inventory_data
-        
-        # Crear tabla
-        inventory_table = Table(table_data, repeatRows=1)
-        inventory_table.setStyle(TableStyle([
-            # Estilo del header
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            
-            # Estilo del contenido
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        return {"message": "Importación completada", **summary}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importando Excel: {e}")
+        raise HTTPException(status_code=500, detail="Error importando archivo Excel")
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# ----------------------------------------
+# Alta masiva de inventario
+# ----------------------------------------
+# Cada item se valida por separado con InventoryItemEnhanced; los válidos se
+# insertan con `insert_many` no ordenado en lotes de IMPORT_BATCH_SIZE y los
+# DNI repetidos (contra la base o dentro del mismo pedido) los rechaza el
+# índice único. Se registra una sola entrada de auditoría por pedido.
+
+def _validation_messages(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+@app.post("/api/inventory/bulk")
+async def create_inventory_items_bulk(
+    bulk: InventoryBulkCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Crear muchos items de inventario en un solo pedido
+
+    Devuelve un resultado por item, en el mismo orden en que llegaron:
+    `created` con su id o `error` con los motivos del rechazo.
+    """
+    try:
+        if not bulk.items:
+            raise HTTPException(status_code=400, detail="No se enviaron items")
+        if len(bulk.items) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_ITEMS} items por pedido")
         
-        story.append(inventory_table)
+        start = time.perf_counter()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(bulk.items)
+        documents, positions = [], []
+        now = datetime.now()
         
-        # Construir PDF
-        doc.build(story)
+        for position, raw in enumerate(bulk.items):
+            try:
+                item = InventoryItemEnhanced(**raw)
+            except ValidationError as e:
+                results[position] = {"index": position, "status": "error", "dni": raw.get("dni"),
+                                     "errors": _validation_messages(e)}
+                continue
+            item_dict = item.dict()
+            item_dict["created_by"] = current_user["username"]
+            item_dict["updated_by"] = current_user["username"]
+            item_dict["responsable_entrega"] = current_user["full_name"]
+            item_dict["created_at"] = item_dict["updated_at"] = now
+            documents.append(item_dict)
+            positions.append(position)
         
-        # Log de actividad
-        await log_activity(current_user, "EXPORT", "report", details={"type": "pdf", "format": "inventory"})
+        for offset in range(0, len(documents), IMPORT_BATCH_SIZE):
+            batch = documents[offset:offset + IMPORT_BATCH_SIZE]
+            _, failed = await insert_inventory_batch(batch)
+            failed_at = dict(failed)
+            for index, document in enumerate(batch):
+                position = positions[offset + index]
+                if index in failed_at:
+                    results[position] = {"index": position, "status": "error", "dni": document["dni"],
+                                         "errors": [failed_at[index]]}
+                else:
+                    results[position] = {"index": position, "status": "created", "dni": document["dni"],
+                                         "id": str(document["_id"])}
         
-        logger.info(f"Reporte PDF generado: {pdf_filename} por {current_user['username']}")
+        created_count = sum(1 for result in results if result["status"] == "created")
+        failed_count = len(results) - created_count
+        elapsed = time.perf_counter() - start
         
-        # Retornar archivo
-        return FileResponse(
-            pdf_path,
-            media_type='application/pdf',
-            filename=pdf_filename,
-            headers={"Content-Disposition": f"attachment; filename={pdf_filename}"}
-        )
+        # Una sola entrada de auditoría para todo el pedido
+        await log_activity(current_user, "CREATE", "inventory", details={
+            "bulk": True,
+            "requested": len(results),
+            "created_count": created_count,
+            "failed_count": failed_count
+        })
+        
+        logger.info(f"Alta masiva por {current_user['username']}: {created_count}/{len(results)} items "
+                    f"en {elapsed:.2f}s ({failed_count} rechazados)")
+        
+        return {
+            "message": "Alta masiva completada",
+            "created_count": created_count,
+            "failed_count": failed_count,
+            "seconds": round(elapsed, 2),
+            "results": results
+        }
     
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generando reporte PDF: {e}")
-        raise HTTPException(status_code=500, detail="Error generando reporte PDF")
+        logger.error(f"Error en alta masiva de inventario: {e}")
+        raise HTTPException(status_code=500, detail="Error creando items")
 
-# ========================================
-# NOTIFICACIONES Y ALERTAS
-# ========================================
+# ----------------------------------------
+# Listado de inventario
+# ----------------------------------------
+# Devuelve solo los campos pedidos (?fields=persona,dni,estado), filtra por
+# campos indexados y pagina por keyset sobre (persona, _id): la siguiente
+# página llega en la cabecera X-Next-Cursor y el cuerpo sigue siendo la lista
+# de items. Con ?format=ndjson (o Accept: application/x-ndjson) se envía un
+# item por línea a medida que el cursor de Mongo los entrega.
 
-class NotificationService:
-    @staticmethod
-    async def check_equipment_alerts():
-        """Verificar alertas de equipos"""
-        try:
-            alerts = []
-            
-            # Equipos robados sin resolver
-            stolen_count = await db.inventory.count_documents({"robado": True})
-            if stolen_count > 0:
-                alerts.append({
-                    "type": "warning",
-                    "message": f"{stolen_count} equipos reportados como robados",
-                    "action": "revisar_robados"
-                })
-            
-            # Equipos en mal estado por mucho tiempo
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            old_damaged = await db.inventory.count_documents({
-                "estado": "mal estado",
-                "updated_at": {"$lt": thirty_days_ago}
-            })
-            
-            if old_damaged > 0:
-                alerts.append({
-                    "type": "info",
-                    "message": f"{old_damaged} equipos en mal estado por más de 30 días",
-                    "action": "revisar_mal_estado"
-                })
-            
-            # Equipos con garantía próxima a vencer
-            next_month = datetime.now() + timedelta(days=30)
-            warranty_expiring = await db.inventory.count_documents({
-                "garantia_vence": {"$lte": next_month, "$gte": datetime.now()}
-            })
-            
-            if warranty_expiring > 0:
-                alerts.append({
-                    "type": "warning",
-                    "message": f"{warranty_expiring} equipos con garantía por vencer",
-                    "action": "revisar_garantias"
-                })
-            
-            return alerts
-            
-        except Exception as e:
-            logger.error(f"Error verificando alertas: {e}")
-            return []
+INVENTORY_LIST_FIELDS = set(IMPORT_FIELDS) | {
+    "responsable_entrega", "created_by", "updated_by", "created_at", "updated_at"
+}
+INVENTORY_LIST_DEFAULT_FIELDS = [
+    "persona", "dni", "dispositivo", "control_patrimonial", "modelo", "numero_serie", "imei",
+    "funda_tablet", "plan_datos", "power_tech", "telefono", "correo_personal", "fecha_entrega",
+    "estado", "robado"
+]
+NDJSON_CHUNK_DOCS = 500
 
-@app.get("/api/notifications/alerts")
-async def get_system_alerts(current_user: dict = Depends(get_current_user)):
-    """Obtener alertas del sistema"""
-    alerts = await NotificationService.check_equipment_alerts()
-    return {"alerts": alerts}
+def encode_inventory_cursor(persona: str, item_id: ObjectId) -> str:
+    """Codificar (persona, _id) del último item de la página como cursor opaco"""
+    raw = json.dumps({"p": persona, "i": str(item_id)}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
 
-# ========================================
-# ENDPOINTS ADICIONALES MEJORADOS
-# ========================================
+def decode_inventory_cursor(cursor: str) -> tuple:
+    """Decodificar un cursor opaco a (persona, _id); ValueError si es inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return raw["p"], ObjectId(raw["i"])
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
 
-@app.get("/api/inventory/export/excel/enhanced")
-async def export_inventory_excel_enhanced(current_user: dict = Depends(get_current_user)):
-    """Exportar inventario a Excel con formato mejorado"""
+def serialize_inventory_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    item = dict(item)
+    item["id"] = str(item.pop("_id"))
+    return item
+
+async def stream_inventory_ndjson(cursor) -> AsyncIterator[bytes]:
+    chunk = []
+    async for item in cursor:
+        chunk.append(json.dumps(serialize_inventory_item(item), ensure_ascii=False,
+                                default=_backup_json_default))
+        if len(chunk) >= NDJSON_CHUNK_DOCS:
+            yield ("\n".join(chunk) + "\n").encode("utf-8")
+            chunk = []
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode("utf-8")
+
+@app.get("/api/inventory")
+async def list_inventory(
+    request: Request,
+    fields: Optional[str] = None,
+    estado: Optional[str] = None,
+    dispositivo: Optional[str] = None,
+    dni: Optional[str] = None,
+    robado: Optional[bool] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "json",
+    current_user: dict = Depends(get_current_user)
+):
+    """Listar items de inventario (proyectado, filtrado y paginado por keyset)"""
     try:
-        # Obtener datos del inventario
-        inventory_cursor = db.inventory.find().sort("persona", 1)
-        inventory_data = []
-        
-        async for item in inventory_cursor:
-            row_data = {
-                'ID': str(item['_id']),
-                'Persona': item['persona'],
-                'DNI': item['dni'],
-                'Dispositivo': item['dispositivo'],
-                'Control Patrimonial': item['control_patrimonial'],
-                'Modelo': item['modelo'],
-                'Número de Serie': item['numero_serie'],
-                'IMEI': item.get('imei', ''),
-                'Funda Tablet': 'Sí' if item['funda_tablet'] else 'No',
-                'Plan de Datos': 'Sí' if item['plan_datos'] else 'No',
-                'Power Tech': 'Sí' if item['power_tech'] else 'No',
-                'Teléfono': item['telefono'],
-                'Correo Personal': item['correo_personal'],
-                'Fecha de Entrega': item['fecha_entrega'].strftime('%d/%m/%Y %H:%M'),
-                'Estado': item['estado'],
-                'Robado': 'Sí' if item['robado'] else 'No',
-                'Motivo Reparación': item.get('motivo_reparacion', ''),
-                'Ubicación Actual': item.get('ubicacion_actual', ''),
-                'Responsable Entrega': item.get('responsable_entrega', ''),
-                'Observaciones': item.get('observaciones', ''),
-                'Valor Estimado': item.get('valor_estimado', ''),
-                'Garantía Vence': item.get('garantia_vence', '').strftime('%d/%m/%Y') if item.get('garantia_vence') else '',
-                'Proveedor': item.get('proveedor', ''),
-                'Fecha Compra': item.get('fecha_compra', '').strftime('%d/%m/%Y') if item.get('fecha_compra') else '',
-                'Creado Por': item.get('created_by', ''),
-                'Actualizado Por': item.get('updated_by', ''),
-                'Fecha Creación': item.get('created_at', '').strftime('%d/%m/%Y %H:%M') if item.get('created_at') else '',
-                'Última Actualización': item.get('updated_at', '').strftime('%d/%m/%Y %H:%M') if item.get('updated_at') else ''
-            }
-            inventory_data.append(row_data)
+        # Proyección
+        requested = [f.strip() for f in fields.split(",") if f.strip()] if fields else INVENTORY_LIST_DEFAULT_FIELDS
+        unknown = [f for f in requested if f not in INVENTORY_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(unknown)}")
+        projection = {field: 1 for field in requested}
+        projection["persona"] = 1  # necesario para el cursor
         
-        # Crear DataFrame
-        df = pd.DataFrame(inventory_data)
+        # Filtros (todos respaldados por índices)
+        query: Dict[str, Any] = {}
+        if estado is not None:
+            query["estado"] = estado
+        if dispositivo is not None:
+            query["dispositivo"] = dispositivo
+        if dni is not None:
+            query["dni"] = dni
+        if robado is not None:
+            query["robado"] = robado
         
-        # Crear archivo Excel en memoria
-        output = io.BytesIO()
+        if cursor:
+            try:
+                last_persona, last_id = decode_inventory_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+            query["$or"] = [
+                {"persona": {"$gt": last_persona}},
+                {"persona": last_persona, "_id": {"$gt": last_id}}
+            ]
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Hoja principal de inventario
-            df.to_excel(writer, sheet_name='Inventario', index=False)
-            
-            # Obtener el workbook y worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Inventario']
-            
-            # Estilos
-            header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-            header_font = Font(color='FFFFFF', bold=True)
-            
-            # Aplicar estilos al header
-            for cell in worksheet[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-            
-            # Ajustar ancho de columnas
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            # Hoja de estadísticas
-            stats_data = await get_enhanced_stats(current_user)
-            stats_df = pd.DataFrame([
-                ['Total de Items', stats_data.total_items],
-                ['Items en Buen Estado', stats_data.items_bien],
-                ['Items en Mal Estado', stats_data.items_mal_estado],
-                ['Items en Reparación', stats_data.items_en_reparacion],
-                ['Items Robados', stats_data.items_robados],
-                ['Total de Reparaciones', stats_data.total_repairs],
-                ['Fecha de Exportación', datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
-                ['Exportado Por', current_user['full_name']],
-                ['Sede', current_user.get('sede', 'Arequipa 06 - Socabaya')]
-            ], columns=['Concepto', 'Valor'])
-            
-            stats_df.to_excel(writer, sheet_name='Estadísticas', index=False)
-            
-            # Aplicar estilos a la hoja de estadísticas
-            stats_sheet = writer.sheets['Estadísticas']
-            for cell in stats_sheet[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-            
-            # Hoja de dispositivos por tipo
-            devices_df = pd.DataFrame(list(stats_data.devices_by_type.items()), 
-                                    columns=['Tipo de Dispositivo', 'Cantidad'])
-            devices_df.to_excel(writer, sheet_name='Dispositivos por Tipo', index=False)
-            
-            # Aplicar estilos a dispositivos
-            devices_sheet = writer.sheets['Dispositivos por Tipo']
-            for cell in devices_sheet[1]:
-                cell.fill = header_fill
-                cell.font = header_font
+        ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+        sort_spec = [("persona", 1), ("_id", 1)]
         
-        output.seek(0)
+        if ndjson:
+            # Consumidores masivos: todo lo que coincida, salvo que pidan un límite
+            inventory_cursor = db.inventory.find(query, projection).sort(sort_spec).batch_size(NDJSON_CHUNK_DOCS)
+            if limit:
+                inventory_cursor = inventory_cursor.limit(max(1, limit))
+            return StreamingResponse(stream_inventory_ndjson(inventory_cursor), media_type="application/x-ndjson")
         
-        # Log de actividad
-        await log_activity(current_user, "EXPORT", "inventory", 
-                          details={"format": "excel_enhanced", "items_count": len(inventory_data)})
+        page_size = max(1, min(limit or INVENTORY_PAGE_SIZE, INVENTORY_MAX_PAGE_SIZE))
+        inventory_cursor = db.inventory.find(query, projection).sort(sort_spec).limit(page_size)
+        items = [item async for item in inventory_cursor]
         
-        logger.info(f"Excel mejorado exportado por {current_user['username']}: {len(inventory_data)} items")
+        headers = {}
+        if len(items) == page_size:
+            headers["X-Next-Cursor"] = encode_inventory_cursor(items[-1]["persona"], items[-1]["_id"])
         
-        # Generar nombre de archivo
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"inventario_inei_completo_{timestamp}.xlsx"
+        body = []
+        for item in items:
+            if "persona" not in requested:
+                item.pop("persona", None)
+            body.append(serialize_inventory_item(item))
         
-        return StreamingResponse(
-            io.BytesIO(output.read()),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        return JSONResponse(content=jsonable_encoder(body), headers=headers)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listando inventario: {e}")
+        raise HTTPException(status_code=500, detail="Error obteniendo inventario")
+
+# Búsqueda de inventario
+# ----------------------------------------
+# Cada campo del formulario de búsqueda se traduce a un predicado que un
+# índice puede resolver: igualdad para identificadores (dni, control
+# patrimonial, correo, estado), prefijo anclado (^...) para serie, IMEI,
+# teléfono y dispositivo, y el índice de texto para persona y modelo. El
+# planificador estima cuántos documentos recorre cada predicado (con los
+# contadores materializados cuando los hay) y fuerza con hint() el índice del
+# más selectivo; los demás se evalúan solo sobre los documentos que ese índice
+# entrega. Los resultados se limitan a SEARCH_MAX_RESULTS.
+#
+# El índice de texto (en español, con stemming) solo encuentra palabras
+# completas: "Garc" no devuelve "García". Por eso $text solo guía la búsqueda
+# cuando todas las palabras son completas: para persona lo decide el índice de
+# nombres (tokens conocidos, incluidos los cortos como "Ana"); para modelo, o
+# mientras ese índice se construye, se exige que cada palabra tenga al menos
+# SEARCH_TEXT_MIN_WORD_LENGTH caracteres. Si no, se filtran solo con regex.
+
+SEARCH_EXACT_FIELDS = ("control_patrimonial", "correo_personal", "estado")
+SEARCH_PREFIX_FIELDS = ("numero_serie", "imei", "telefono", "dispositivo")
+SEARCH_TEXT_FIELDS = ("persona", "modelo")
+SEARCH_SORT_FIELDS = {"persona", "dni", "dispositivo", "estado", "fecha_entrega", "updated_at"}
+SEARCH_ESTADO_COUNTERS = {
+    "bien": "items_bien", "mal estado": "items_mal_estado", "en reparacion": "items_en_reparacion"
+}
+SEARCH_ACCENT_CLASSES = {
+    "a": "aáàäâ", "e": "eéèëê", "i": "iíìïî", "o": "oóòöô", "u": "uúùüû", "n": "nñ"
+}
+
+def _accent_insensitive_pattern(word: str) -> str:
+    """Expresión regular que acepta la palabra con o sin tildes"""
+    return "".join(
+        f"[{SEARCH_ACCENT_CLASSES[char]}]" if char in SEARCH_ACCENT_CLASSES else re.escape(char)
+        for char in _normalize_header(word)
+    )
+
+def _prefix_estimate(value: str, total: int) -> float:
+    """Documentos esperados para un prefijo: cada carácter divide el espacio"""
+    base = 10 if value.isdigit() else 36
+    return max(1.0, total / (base ** len(value)))
+
+def build_search_predicates(search: "InventorySearch", counters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Traducir el formulario a predicados con su filtro, índice y estimación
+
+    Cada predicado es un dict con `field`, `kind` (exact, prefix, text),
+    `filter` (condición Mongo), `index` (índice que lo resuelve; None si no
+    hay) y `estimate` (documentos que recorrería ese índice).
+    """
+    total = max(counters.get("total_items", 0), 1)
+    predicates = []
+    
+    dni = (search.dni or "").strip()
+    if dni:
+        if len(dni) == 8:
+            predicates.append({"field": "dni", "kind": "exact", "filter": {"dni": dni},
+                               "index": [("dni", 1)], "estimate": 1.0})
+        else:
+            predicates.append({"field": "dni", "kind": "prefix",
+                               "filter": {"dni": {"$regex": f"^{re.escape(dni)}"}},
+                               "index": [("dni", 1)], "estimate": _prefix_estimate(dni, total)})
+    
+    for field in SEARCH_EXACT_FIELDS:
+        value = (getattr(search, field) or "").strip()
+        if not value:
+            continue
+        if field == "estado":
+            estimate = float(counters.get(SEARCH_ESTADO_COUNTERS.get(value, ""), 0))
+            index = [("estado", 1), ("persona", 1), ("_id", 1)] if search.sort_by == "persona" else [("estado", 1)]
+        else:
+            estimate, index = 1.0, [(field, 1)]
+        predicates.append({"field": field, "kind": "exact", "filter": {field: value},
+                           "index": index, "estimate": estimate})
+    
+    for field in SEARCH_PREFIX_FIELDS:
+        value = (getattr(search, field) or "").strip()
+        if not value:
+            continue
+        if field == "dispositivo":
+            # El catálogo de dispositivos es pequeño: se cuenta exacto
+            estimate = float(sum(count for label, count in counters.get("devices_by_type", {}).items()
+                                 if label.startswith(value)))
+        else:
+            estimate = _prefix_estimate(value, total)
+        predicates.append({"field": field, "kind": "prefix",
+                           "filter": {field: {"$regex": f"^{re.escape(value)}"}},
+                           "index": [(field, 1)], "estimate": estimate})
+    
+    for field in SEARCH_TEXT_FIELDS:
+        words = [word for word in re.split(r"\s+", (getattr(search, field) or "").strip()) if word]
+        if not words:
+            continue
+        if field == "persona" and inventory_name_index.ready:
+            full_words = inventory_name_index.has_tokens(" ".join(words))
+        else:
+            full_words = all(len(word) >= SEARCH_TEXT_MIN_WORD_LENGTH for word in words)
+        # Todas las palabras deben aparecer en este campo (con o sin tildes);
+        # cada palabra adicional reduce los resultados esperados
+        predicates.append({
+            "field": field, "kind": "text", "words": words, "full_words": full_words,
+            "filter": {"$and": [
+                {field: {"$regex": _accent_insensitive_pattern(word), "$options": "i"}} for word in words
+            ]},
+            "index": None,
+            "estimate": max(1.0, total * SEARCH_TEXT_SELECTIVITY ** len(words))
+        })
+    
+    if search.robado is not None:
+        estimate = counters.get("items_robados", 0)
+        if not search.robado:
+            estimate = counters.get("total_items", 0) - estimate
+        predicates.append({"field": "robado", "kind": "exact", "filter": {"robado": search.robado},
+                           "index": None, "estimate": float(estimate)})
+    
+    return predicates
+
+def plan_inventory_search(search: "InventorySearch", counters: Dict[str, Any]) -> Dict[str, Any]:
+    """Elegir el predicado que guía la consulta y armar filtro e índice
+
+    El predicado con menor estimación guía la búsqueda. Si es de texto, la
+    consulta usa $text (MongoDB elige entonces el índice de texto) y los demás
+    predicados filtran sus candidatos; si no, se fuerza su índice con hint()
+    y las condiciones de texto quedan como filtros sobre pocos documentos.
+    Un predicado de texto con palabras incompletas no puede guiar.
+    """
+    predicates = build_search_predicates(search, counters)
+    candidates = [p for p in predicates
+                  if (p["kind"] == "text" and p["full_words"]) or p["index"] is not None]
+    driver = min(candidates, key=lambda p: p["estimate"]) if candidates else None
+    
+    clauses = [p["filter"] for p in predicates]
+    hint = None
+    if driver is not None and driver["kind"] == "text":
+        text_words = [word for p in predicates if p["kind"] == "text" and p["full_words"] for word in p["words"]]
+        clauses.insert(0, {"$text": {"$search": " ".join(text_words)}})
+    elif driver is not None:
+        hint = driver["index"]
+    
+    query: Dict[str, Any] = {}
+    if len(clauses) == 1:
+        query = clauses[0]
+    elif clauses:
+        query = {"$and": clauses}
+    
+    return {
+        "query": query,
+        "hint": hint,
+        "driver": f"{driver['field']}:{driver['kind']}" if driver else None,
+        "estimate": driver["estimate"] if driver else float(counters.get("total_items", 0)),
+        "predicates": [
+            {"field": p["field"], "kind": p["kind"], "estimate": p["estimate"]} for p in predicates
+        ]
+    }
+
+async def search_inventory(search: "InventorySearch") -> tuple:
+    """Ejecutar la búsqueda planificada; devuelve (items, plan)"""
+    counters = await read_inventory_stats()
+    plan = plan_inventory_search(search, counters)
+    
+    limit = max(1, min(search.limit or SEARCH_DEFAULT_RESULTS, SEARCH_MAX_RESULTS))
+    direction = -1 if search.sort_order == "desc" else 1
+    projection = {field: 1 for field in INVENTORY_LIST_DEFAULT_FIELDS}
+    
+    cursor = db.inventory.find(plan["query"], projection)
+    if plan["hint"]:
+        cursor = cursor.hint(plan["hint"])
+    cursor = cursor.sort([(search.sort_by, direction), ("_id", direction)]).limit(limit).max_time_ms(SEARCH_MAX_TIME_MS)
+    
+    items = [serialize_inventory_item(item) async for item in cursor]
+    return items, plan
+
+@app.post("/api/inventory/search")
+async def search_inventory_items(
+    search: InventorySearch,
+    current_user: dict = Depends(get_current_user)
+):
+    """Buscar items de inventario por cualquier combinación de campos
+
+    Los campos vacíos se ignoran. El cuerpo de la respuesta es la lista de
+    items (como máximo SEARCH_MAX_RESULTS); la cabecera X-Search-Plan indica
+    qué predicado guió la búsqueda.
+    """
+    try:
+        if search.sort_by not in SEARCH_SORT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"No se puede ordenar por '{search.sort_by}'")
+        
+        items, plan = await search_inventory(search)
+        
+        headers = {"X-Search-Plan": plan["driver"] or "ninguno"}
+        return JSONResponse(content=jsonable_encoder(items), headers=headers)
+    
+    except HTTPException:
+        raise
+    except ExecutionTimeout:
+        raise HTTPException(status_code=400, detail="Búsqueda demasiado amplia; agregue más criterios")
+    except Exception as e:
+        logger.error(f"Error buscando en inventario: {e}")
+        raise HTTPException(status_code=500, detail="Error buscando en inventario")
+
+# Índice de nombres en memoria
+# ----------------------------------------
+# Los nombres de empadronadores llegan con y sin tildes y con variaciones de
+# escritura ("Pérez"/"Perez"), algo que una regex en MongoDB no resuelve con
+# índices. NameIndex guarda en memoria cada nombre plegado (sin tildes, en
+# minúsculas), un índice invertido token -> nombres, el vocabulario de tokens
+# ordenado (para prefijos mientras se escribe) y los trigramas de cada token
+# (para encontrar candidatos con errores de tipeo, que luego se ordenan por
+# distancia de edición). Los nombres repetidos comparten una sola entrada y el
+# plegado se cachea por token, así que el costo de construirlo crece con los
+# nombres distintos y no con los items.
+
+NAME_SPLIT_RE = re.compile(r"[^a-z0-9]+")
+
+def fold_token(token: str) -> tuple:
+    """Plegar una palabra: sin tildes y en minúsculas ("Núñez-Pérez" -> ("nunez", "perez"))"""
+    if not token.isascii():
+        token = unicodedata.normalize("NFKD", token).encode("ascii", "ignore").decode("ascii")
+    return tuple(part for part in NAME_SPLIT_RE.split(token.lower()) if part)
+
+def fold_name(text: Any, cache: Optional[Dict[str, tuple]] = None) -> tuple:
+    """Tokens plegados de un nombre; `cache` evita repetir el plegado por palabra"""
+    tokens: List[str] = []
+    for word in str(text or "").split():
+        folded = cache.get(word) if cache is not None else None
+        if folded is None:
+            folded = fold_token(word)
+            if cache is not None:
+                cache[word] = folded
+        tokens.extend(folded)
+    return tuple(tokens)
+
+def _name_trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _max_typos(token: str) -> int:
+    """Errores tolerados según el largo del token"""
+    if len(token) <= 3:
+        return 0
+    return 1 if len(token) <= 6 else 2
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """Distancia de Levenshtein; devuelve limit + 1 en cuanto la supera
+
+    Solo se calcula la banda |i - j| <= limit de la matriz: fuera de ella la
+    distancia ya excede el límite.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        char_a = a[i - 1]
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        best = current[0]
+        for j in range(low, high + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != b[j - 1]))
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+class NameIndex:
+    """Índice de nombres tolerante a tildes y errores de tipeo
+
+    `key` identifica al documento (el _id como texto) y `raw` es el nombre tal
+    como está guardado. Cada nombre distinto recibe un id entero; las listas
+    de postings son conjuntos de esos ids. Todas las operaciones corren en el
+    event loop, así que no necesitan locks; `rebuild` carga un índice nuevo
+    por lotes y, antes de reemplazar al actual, le aplica los cambios que
+    llegaron mientras tanto.
+    """
+    
+    def __init__(self, source: str, collection: str, field: str):
+        self.source = source
+        self.collection = collection
+        self.field = field
+        self.ready = False
+        self.build_seconds: Optional[float] = None
+        self._journal: Optional[List[tuple]] = None
+        self._reset()
+    
+    def _reset(self):
+        self._keys: Dict[str, int] = {}             # key -> id de nombre
+        self._name_ids: Dict[tuple, int] = {}       # tokens plegados -> id de nombre
+        self._names: List[Optional[list]] = []      # id -> [nombre, tokens, keys]
+        self._free: List[int] = []                  # ids de nombres liberados
+        self._postings: Dict[str, Set[int]] = {}    # token -> ids de nombres
+        self._grams: Dict[str, Set[str]] = {}       # trigrama -> tokens
+        self._vocabulary: List[str] = []            # tokens ordenados
+        self._fold_cache: Dict[str, tuple] = {}
+        self._match_cache: OrderedDict = OrderedDict()  # (token, prefijo) -> coincidencias
+    
+    # --- Mantenimiento ---
+    
+    def _index_token(self, token: str):
+        self._match_cache.clear()
+        bisect.insort(self._vocabulary, token)
+        for gram in _name_trigrams(token):
+            self._grams.setdefault(gram, set()).add(token)
+    
+    def _unindex_token(self, token: str):
+        self._match_cache.clear()
+        del self._postings[token]
+        position = bisect.bisect_left(self._vocabulary, token)
+        if position < len(self._vocabulary) and self._vocabulary[position] == token:
+            del self._vocabulary[position]
+        for gram in _name_trigrams(token):
+            tokens = self._grams.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._grams[gram]
+    
+    def add(self, key: str, raw: Any):
+        """Agregar o actualizar el nombre de un documento"""
+        if self._journal is not None:
+            self._journal.append((key, raw))
+        tokens = tuple(dict.fromkeys(fold_name(raw, self._fold_cache)))
+        current = self._keys.get(key)
+        if current is not None and self._names[current][1] == tokens:
+            return
+        self._discard(key)
+        if not tokens:
+            return
+        
+        name_id = self._name_ids.get(tokens)
+        if name_id is None:
+            name_id = self._free.pop() if self._free else len(self._names)
+            entry = [str(raw).strip(), tokens, []]
+            if name_id == len(self._names):
+                self._names.append(entry)
+            else:
+                self._names[name_id] = entry
+            self._name_ids[tokens] = name_id
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = set()
+                    self._index_token(token)
+                postings.add(name_id)
+        self._names[name_id][2].append(key)
+        self._keys[key] = name_id
+    
+    def remove(self, key: str):
+        """Quitar un documento del índice"""
+        if self._journal is not None:
+            self._journal.append((key, None))
+        self._discard(key)
+    
+    def _discard(self, key: str):
+        name_id = self._keys.pop(key, None)
+        if name_id is None:
+            return
+        entry = self._names[name_id]
+        entry[2].remove(key)
+        if entry[2]:
+            return
+        del self._name_ids[entry[1]]
+        self._names[name_id] = None
+        self._free.append(name_id)
+        for token in entry[1]:
+            postings = self._postings[token]
+            postings.discard(name_id)
+            if not postings:
+                self._unindex_token(token)
+    
+    def apply(self, old_items: Optional[List[Dict[str, Any]]] = None,
+              new_items: Optional[List[Dict[str, Any]]] = None):
+        """Reflejar una escritura (mismo contrato que apply_inventory_stats_change)"""
+        new_keys = {str(item["_id"]) for item in new_items or [] if "_id" in item}
+        for item in old_items or []:
+            if "_id" in item and str(item["_id"]) not in new_keys:
+                self.remove(str(item["_id"]))
+        for item in new_items or []:
+            if "_id" in item:
+                self.add(str(item["_id"]), item.get(self.field))
+    
+    def load(self, pairs):
+        """Carga masiva de (key, nombre); el vocabulario se ordena en `finish_load`"""
+        keys, name_ids, names, postings, cache = (
+            self._keys, self._name_ids, self._names, self._postings, self._fold_cache
         )
+        for key, raw in pairs:
+            # Igual que `add`: sin tokens repetidos ("Quispe Quispe" -> ("quispe",))
+            tokens = tuple(dict.fromkeys(fold_name(raw, cache)))
+            if not tokens:
+                continue
+            name_id = name_ids.get(tokens)
+            if name_id is None:
+                name_id = name_ids[tokens] = len(names)
+                names.append([str(raw).strip(), tokens, [key]])
+                for token in tokens:
+                    token_postings = postings.get(token)
+                    if token_postings is None:
+                        token_postings = postings[token] = set()
+                    token_postings.add(name_id)
+            else:
+                names[name_id][2].append(key)
+            keys[key] = name_id
+    
+    def has_tokens(self, text: str) -> bool:
+        """Si todas las palabras de `text` son tokens completos del vocabulario"""
+        tokens = fold_name(text, self._fold_cache)
+        return bool(tokens) and all(token in self._postings for token in tokens)
+    
+    def finish_load(self):
+        self._vocabulary = sorted(self._postings)
+        self._grams = {}
+        for token in self._vocabulary:
+            for gram in _name_trigrams(token):
+                self._grams.setdefault(gram, set()).add(token)
+    
+    async def rebuild(self, batch_size: int = 10000):
+        """Reconstruir desde la colección sin bloquear el event loop"""
+        start = time.perf_counter()
+        fresh = NameIndex(self.source, self.collection, self.field)
+        self._journal = []
+        try:
+            cursor = db[self.collection].find({}, {self.field: 1}).batch_size(batch_size)
+            batch = []
+            async for doc in cursor:
+                batch.append((str(doc["_id"]), doc.get(self.field) or ""))
+                if len(batch) >= batch_size:
+                    fresh.load(batch)
+                    batch = []
+                    await asyncio.sleep(0)
+            fresh.load(batch)
+            fresh.finish_load()
+            # Escrituras ocurridas durante la carga
+            for key, raw in self._journal:
+                if raw is None:
+                    fresh.remove(key)
+                else:
+                    fresh.add(key, raw)
+        finally:
+            self._journal = None
+        
+        self.__dict__.update({name: value for name, value in fresh.__dict__.items() if name.startswith("_")
+                              and name != "_journal"})
+        self.ready = True
+        self.build_seconds = round(time.perf_counter() - start, 3)
+        logger.info(f"Índice de nombres '{self.source}': {len(self._keys)} documentos, "
+                    f"{len(self._name_ids)} nombres distintos en {self.build_seconds}s")
+    
+    # --- Consulta ---
+    
+    def _match_token(self, token: str, prefix: bool) -> Dict[str, int]:
+        """Tokens del vocabulario que coinciden con `token` y su costo
+
+        Las coincidencias dependen solo del vocabulario, así que se guardan en
+        una caché LRU que se vacía cuando aparece o desaparece un token.
+        """
+        cache_key = (token, prefix)
+        matches = self._match_cache.get(cache_key)
+        if matches is not None:
+            self._match_cache.move_to_end(cache_key)
+            return matches
+        matches = self._find_matches(token, prefix)
+        self._match_cache[cache_key] = matches
+        if len(self._match_cache) > NAME_INDEX_MATCH_CACHE_SIZE:
+            self._match_cache.popitem(last=False)
+        return matches
+    
+    def _find_matches(self, token: str, prefix: bool) -> Dict[str, int]:
+        matches: Dict[str, int] = {}
+        if token in self._postings:
+            matches[token] = 0
+        if prefix and len(token) >= NAME_INDEX_MIN_PREFIX:
+            position = bisect.bisect_left(self._vocabulary, token)
+            for candidate in self._vocabulary[position:position + NAME_INDEX_MAX_EXPANSIONS]:
+                if not candidate.startswith(token):
+                    break
+                matches.setdefault(candidate, 0)
+        
+        limit = _max_typos(token)
+        if limit:
+            grams = _name_trigrams(token)
+            shared: Dict[str, int] = {}
+            for gram in grams:
+                for candidate in self._grams.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            # Cada edición altera a lo sumo 3 trigramas: los candidatos que
+            # comparten menos no pueden estar dentro de la distancia tolerada
+            threshold = max(1, len(grams) - 3 * limit)
+            closest = heapq.nlargest(NAME_INDEX_MAX_EXPANSIONS,
+                                     (c for c, n in shared.items() if n >= threshold), key=shared.get)
+            for candidate in closest:
+                if candidate in matches or abs(len(candidate) - len(token)) > limit:
+                    continue
+                distance = bounded_edit_distance(token, candidate, limit)
+                if distance <= limit:
+                    matches[candidate] = distance
+        return matches
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Nombres que contienen todos los tokens de la consulta
+
+        El último token se trata como prefijo (búsqueda mientras se escribe).
+        El costo de un resultado es la suma de las distancias de edición; a
+        igual costo gana el nombre más corto. Se evalúan a lo sumo
+        NAME_INDEX_POOL candidatos, empezando por los de menor costo.
+        """
+        tokens = fold_name(query)
+        if not tokens:
+            return []
+        per_token = [self._match_token(token, prefix=(i == len(tokens) - 1)) for i, token in enumerate(tokens)]
+        if not all(per_token):
+            return []
+        
+        # Cada token de la consulta agrupa sus coincidencias por costo. Las
+        # combinaciones de costos se evalúan de menor a mayor suma con
+        # intersecciones de conjuntos, partiendo siempre del grupo más chico
+        groups = []
+        for matches in per_token:
+            by_cost: Dict[int, List[Set[int]]] = {}
+            for token, cost in matches.items():
+                by_cost.setdefault(cost, []).append(self._postings[token])
+            groups.append({cost: (sum(len(s) for s in sets), sets) for cost, sets in by_cost.items()})
+        combos = sorted(itertools.product(*[sorted(by_cost) for by_cost in groups]), key=sum)
+        
+        scored: Dict[int, int] = {}
+        for combo in combos:
+            total = sum(combo)
+            # Lo que falte por evaluar cuesta más que lo ya encontrado
+            if len(scored) >= limit and total > worst:
+                break
+            worst = total
+            chosen = sorted((groups[i][cost] for i, cost in enumerate(combo)), key=lambda group: group[0])
+            parts = [sets for _, sets in chosen]
+            for candidates in parts[0]:
+                for sets in parts[1:]:
+                    if len(sets) == 1:
+                        candidates = candidates & sets[0]
+                    else:
+                        candidates = set().union(*(candidates & s for s in sets))
+                    if not candidates:
+                        break
+                for name_id in candidates:
+                    if name_id not in scored:
+                        scored[name_id] = total
+                        if len(scored) >= NAME_INDEX_POOL:
+                            break
+                if len(scored) >= NAME_INDEX_POOL:
+                    break
+            if len(scored) >= NAME_INDEX_POOL:
+                break
+        
+        names = self._names
+        ranked = heapq.nsmallest(limit, scored.items(),
+                                 key=lambda kv: (kv[1], len(names[kv[0]][0]), names[kv[0]][0]))
+        results = []
+        for name_id, cost in ranked:
+            display, _, keys = names[name_id]
+            results.append({
+                "name": display,
+                "distance": cost,
+                "count": len(keys),
+                "ids": keys[:NAME_INDEX_IDS_PER_NAME]
+            })
+        return results
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "documents": len(self._keys),
+            "distinct_names": len(self._name_ids),
+            "tokens": len(self._vocabulary),
+            "build_seconds": self.build_seconds
+        }
+
+_name_index_task: Optional[asyncio.Task] = None
+inventory_name_index = NameIndex("inventory", "inventory", "persona")
+user_name_index = NameIndex("users", "users", "full_name")
+NAME_INDEXES = {index.source: index for index in (inventory_name_index, user_name_index)}
+
+async def rebuild_name_indexes():
+    """Reconstruir los índices de nombres (al iniciar y tras una restauración)"""
+    for index in NAME_INDEXES.values():
+        try:
+            await index.rebuild()
+        except Exception as e:
+            logger.error(f"Error construyendo índice de nombres '{index.source}': {e}")
+
+@app.get("/api/names/suggest")
+async def suggest_names(
+    q: str,
+    source: str = "inventory",
+    limit: int = 10,
+    current_user: dict = Depends(get_current_user)
+):
+    """Sugerir nombres (persona del inventario o nombre de usuario) mientras se escribe"""
+    index = NAME_INDEXES.get(source)
+    if index is None:
+        raise HTTPException(status_code=400, detail=f"Fuente no válida: {source}")
+    if source == "users" and current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Permisos insuficientes")
+    
+    try:
+        limit = max(1, min(limit, NAME_SUGGEST_MAX_LIMIT))
+        return {
+            "results": index.search(q, limit),
+            "index_ready": index.ready
+        }
     
     except Exception as e:
-        logger.error(f"Error exportando Excel mejorado: {e}")
-        raise HTTPException(status_code=500, detail="Error generando archivo Excel")
+        logger.error(f"Error sugiriendo nombres: {e}")
+        raise HTTPException(status_code=500, detail="Error buscando nombres")
 
 @app.get("/api/users")
 async def get_users(current_user: dict = Depends(require_role([UserRole.ADMIN]))):
@@ -996,6 +4843,12 @@ async def update_user(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
+        # Los cambios de rol o is_active deben aplicarse en la siguiente petición
+        principal_cache.invalidate(user["username"])
+        if "full_name" in update_data:
+            user_name_index.add(user_id, update_data["full_name"])
+        invalidate_stats_cache()
+        
         # Log de actividad
         await log_activity(current_user, "UPDATE", "user", user_id, 
                           {"updated_fields": list(update_data.keys()), "target_user": user["username"]})
@@ -1014,15 +4867,41 @@ async def update_user(
 async def get_audit_logs(
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    approximate_total: bool = False,
     current_user: dict = Depends(require_role([UserRole.ADMIN]))
 ):
-    """Obtener logs de auditoría (solo admins)"""
+    """Obtener logs de auditoría (solo admins)
+
+    Sin `cursor` se pagina por número de página (skip/limit). Con `cursor`
+    (el `next_cursor` de la respuesta anterior) se busca directamente por el
+    índice (timestamp, _id), de modo que cualquier página cuesta lo mismo que
+    la primera. En modo cursor, o con `approximate_total=true`, el total se
+    toma de `estimated_document_count` en lugar de contar la colección.
+    """
     try:
-        skip = (page - 1) * limit
+        page = max(page, 1)
+        limit = max(1, min(limit, AUDIT_LOGS_MAX_LIMIT))
+        sort_spec = [("timestamp", -1), ("_id", -1)]
+        
+        if cursor:
+            try:
+                last_timestamp, last_id = decode_keyset_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+            
+            # Keyset: documentos estrictamente posteriores al último entregado
+            query = {"$or": [
+                {"timestamp": {"$lt": last_timestamp}},
+                {"timestamp": last_timestamp, "_id": {"$lt": last_id}}
+            ]}
+            logs_cursor = db.audit_logs.find(query).sort(sort_spec).limit(limit)
+        else:
+            skip = (page - 1) * limit
+            logs_cursor = db.audit_logs.find().sort(sort_spec).skip(skip).limit(limit)
         
-        # Obtener logs paginados
-        logs_cursor = db.audit_logs.find().sort("timestamp", -1).skip(skip).limit(limit)
         logs = []
+        last_log = None
         
         async for log in logs_cursor:
             log_data = {
@@ -1036,29 +4915,462 @@ async def get_audit_logs(
                 "sede": log.get("sede", "")
             }
             logs.append(log_data)
+            last_log = log
+        
+        next_cursor = None
+        if last_log is not None and len(logs) == limit:
+            next_cursor = encode_keyset_cursor(last_log["timestamp"], last_log["_id"])
         
-        # Contar total
-        total_logs = await db.audit_logs.count_documents({})
+        # Contar total (estimado en modo cursor para no recorrer la colección)
+        total_is_approximate = bool(cursor) or approximate_total
+        if total_is_approximate:
+            total_logs = await db.audit_logs.estimated_document_count()
+        else:
+            total_logs = await db.audit_logs.count_documents({})
         total_pages = (total_logs + limit - 1) // limit
         
         return {
             "logs": logs,
             "pagination": {
-                "current_page": page,
+                "current_page": None if cursor else page,
                 "total_pages": total_pages,
                 "total_logs": total_logs,
-                "per_page": limit
+                "total_is_approximate": total_is_approximate,
+                "per_page": limit,
+                "next_cursor": next_cursor
             }
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error obteniendo logs de auditoría: {e}")
         raise HTTPException(status_code=500, detail="Error obteniendo logs")
 
+# ========================================
+# TRABAJOS EN SEGUNDO PLANO
+# ========================================
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class JobSubmit(BaseModel):
+    type: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class JobManager:
+    """Cola de trabajos largos (exportaciones, reportes, importaciones, backups)
+
+    Los trabajos se guardan en la colección `jobs` y los ejecuta un grupo fijo
+    de JOB_WORKERS tareas asyncio que corre junto al scheduler. Cada trabajo
+    informa su avance (porcentaje y ETA) y deja su artefacto en JOBS_DIR.
+    
+    Puede haber varios procesos atendiendo la misma colección. Quien reclama
+    un trabajo guarda su `owner` y un `lease_expires_at` que renueva cada
+    JOB_LEASE_SECONDS / 3 mientras lo ejecuta. Solo los trabajos en ejecución
+    cuyo lease venció (su proceso murió o quedó colgado) se recuperan: se
+    vuelven a encolar si su tipo es reanudable (se rehacen desde el principio)
+    y, si no, se marcan como fallidos. Los trabajos en cola se toman al
+    arrancar; el reclamo atómico evita que dos procesos ejecuten el mismo.
+    """
+    
+    def __init__(self, workers: int, max_attempts: int, lease_seconds: float):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{ObjectId()}"
+        self.handlers: Dict[str, Dict[str, Any]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[ObjectId] = set()
+    
+    def register(self, job_type: str, handler, roles: Optional[List[str]] = None, resumable: bool = True,
+                 params: tuple = ()):
+        """`params` es la lista de parámetros que un cliente puede enviar para este tipo"""
+        self.handlers[job_type] = {"handler": handler, "roles": roles, "resumable": resumable,
+                                   "params": params}
+    
+    def client_params(self, job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Quedarse solo con los parámetros permitidos para el tipo; el resto se descarta"""
+        allowed = self.handlers[job_type]["params"]
+        return {key: value for key, value in params.items() if key in allowed}
+    
+    async def submit(self, job_type: str, params: Dict[str, Any], user: dict) -> Dict[str, Any]:
+        job = {
+            "type": job_type,
+            "status": JobStatus.QUEUED,
+            "params": params,
+            "created_by": user["username"],
+            "created_at": datetime.now(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {"done": 0, "total": None},
+            "percent": 0.0,
+            "eta_seconds": None,
+            "attempts": 0,
+            "result": None,
+            "artifact": None,
+            "error": None
+        }
+        result = await db.jobs.insert_one(job)
+        job["_id"] = result.inserted_id
+        if self._queue is not None:
+            await self._queue.put(result.inserted_id)
+        return job
+    
+    async def start(self):
+        self._queue = asyncio.Queue()
+        await self._recover(include_queued=True)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        logger.info(f"Gestor de trabajos iniciado con {self.workers} workers ({self.owner})")
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def _lease(self) -> datetime:
+        return datetime.now() + timedelta(seconds=self.lease_seconds)
+    
+    async def _heartbeat(self):
+        """Renovar el lease de los trabajos propios y recuperar los de procesos caídos"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if self._running:
+                    await db.jobs.update_many(
+                        {"_id": {"$in": list(self._running)}, "status": JobStatus.RUNNING, "owner": self.owner},
+                        {"$set": {"lease_expires_at": self._lease()}}
+                    )
+                await self._recover(include_queued=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error renovando leases de trabajos: {e}")
+    
+    async def _recover(self, include_queued: bool):
+        """Reencolar o dar por fallidos los trabajos cuyo lease venció
+
+        Con `include_queued` (al arrancar) también se toman los trabajos en
+        cola, que pudieron quedar en la cola en memoria de un proceso caído.
+        """
+        expired = {"status": JobStatus.RUNNING,
+                   "$or": [{"lease_expires_at": {"$lt": datetime.now()}}, {"lease_expires_at": None}]}
+        query = {"$or": [{"status": JobStatus.QUEUED}, expired]} if include_queued else expired
+        async for job in db.jobs.find(query):
+            if job["status"] == JobStatus.QUEUED:
+                await self._queue.put(job["_id"])
+                continue
+            # Solo un proceso recupera cada trabajo: la condición repite el lease leído
+            claim = {"_id": job["_id"], "status": JobStatus.RUNNING, "lease_expires_at": job.get("lease_expires_at")}
+            spec = self.handlers.get(job["type"])
+            if spec and spec["resumable"] and job.get("attempts", 0) < self.max_attempts:
+                result = await db.jobs.update_one(claim, {"$set": {
+                    "status": JobStatus.QUEUED, "percent": 0.0, "eta_seconds": None,
+                    "owner": None, "lease_expires_at": None
+                }})
+                if result.modified_count:
+                    await self._queue.put(job["_id"])
+                    logger.info(f"Trabajo reencolado (lease vencido de {job.get('owner')}): "
+                                f"{job['_id']} ({job['type']})")
+            else:
+                result = await db.jobs.update_one(claim, {"$set": {
+                    "status": JobStatus.FAILED, "finished_at": datetime.now(), "eta_seconds": None,
+                    "owner": None, "lease_expires_at": None,
+                    "error": "Interrumpido por caída o reinicio del servidor"
+                }})
+                if result.modified_count:
+                    self._discard_input(job)
+    
+    @staticmethod
+    def _discard_input(job: Dict[str, Any]):
+        """Borrar el archivo subido de una importación, solo si está dentro de UPLOAD_FOLDER"""
+        if job.get("type") != "import_excel":
+            return
+        upload = (job.get("params") or {}).get("upload_path")
+        if not upload:
+            return
+        upload = os.path.realpath(upload)
+        folder = os.path.realpath(UPLOAD_FOLDER)
+        if os.path.commonpath([upload, folder]) != folder:
+            logger.warning(f"Ruta de subida fuera de {UPLOAD_FOLDER} ignorada en trabajo {job.get('_id')}")
+            return
+        if os.path.isfile(upload):
+            os.remove(upload)
+    
+    async def _finish(self, job_id, status: str, **fields):
+        update = {"status": status, "finished_at": datetime.now(), "eta_seconds": None,
+                  "owner": None, "lease_expires_at": None, **fields}
+        if status == JobStatus.COMPLETED:
+            update["percent"] = 100.0
+        # Si el lease venció y otro proceso recuperó el trabajo, este ya no lo cierra
+        await db.jobs.update_one({"_id": job_id, "owner": self.owner}, {"$set": update})
+    
+    async def _worker(self, number: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error inesperado en worker de trabajos {number}: {e}")
+    
+    async def _run(self, job_id):
+        # Reclamar el trabajo de forma atómica (puede haber varios procesos)
+        job = await db.jobs.find_one_and_update(
+            {"_id": job_id, "status": JobStatus.QUEUED},
+            {"$set": {"status": JobStatus.RUNNING, "started_at": datetime.now(),
+                      "owner": self.owner, "lease_expires_at": self._lease()},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return
+        
+        self._running.add(job_id)
+        try:
+            await self._execute(job)
+        finally:
+            self._running.discard(job_id)
+    
+    async def _execute(self, job: Dict[str, Any]):
+        job_id = job["_id"]
+        spec = self.handlers.get(job["type"])
+        user = await db.users.find_one({"username": job["created_by"]})
+        if spec is None or user is None:
+            await self._finish(job_id, JobStatus.FAILED, error="Tipo de trabajo o usuario no válido")
+            return
+        
+        started = time.monotonic()
+        last_update = [0.0]
+        
+        async def progress(done: int, total: Optional[int] = None):
+            now = time.monotonic()
+            if now - last_update[0] < JOB_PROGRESS_INTERVAL_SECONDS and (total is None or done < total):
+                return
+            last_update[0] = now
+            percent = round(min(done / total, 1.0) * 100, 1) if total else 0.0
+            eta = None
+            if total and 0 < done < total:
+                eta = round((now - started) * (total - done) / done, 1)
+            await db.jobs.update_one({"_id": job_id}, {"$set": {
+                "progress": {"done": done, "total": total}, "percent": percent, "eta_seconds": eta
+            }})
+        
+        try:
+            outcome = await spec["handler"](job, user, progress)
+            await self._finish(job_id, JobStatus.COMPLETED,
+                               result=outcome.get("result"), artifact=outcome.get("artifact"))
+            logger.info(f"Trabajo completado: {job_id} ({job['type']}) en {time.monotonic() - started:.1f}s")
+        except asyncio.CancelledError:
+            # Cierre ordenado: reanudar en el próximo arranque si se puede
+            status = JobStatus.QUEUED if spec["resumable"] else JobStatus.FAILED
+            await db.jobs.update_one({"_id": job_id, "owner": self.owner}, {"$set": {
+                "status": status,
+                "owner": None,
+                "lease_expires_at": None,
+                "error": None if spec["resumable"] else "Interrumpido por cierre del servidor"
+            }})
+            raise
+        except HTTPException as e:
+            await self._finish(job_id, JobStatus.FAILED, error=str(e.detail))
+        except Exception as e:
+            logger.error(f"Error en trabajo {job_id} ({job['type']}): {e}")
+            await self._finish(job_id, JobStatus.FAILED, error=str(e))
+        finally:
+            self._discard_input(job)
+
+job_manager = JobManager(JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_LEASE_SECONDS)
+
+def job_artifact_path(job: Dict[str, Any], extension: str) -> str:
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    return os.path.join(JOBS_DIR, f"{job['_id']}.{extension}")
+
+async def excel_export_job(job: Dict[str, Any], user: dict, progress) -> Dict[str, Any]:
+    workbook, items_count = await build_inventory_workbook(user, progress)
+    path = job_artifact_path(job, "xlsx")
+    await asyncio.to_thread(workbook.save, path)
+    await log_activity(user, "EXPORT", "inventory",
+                       details={"format": "excel_enhanced", "items_count": items_count, "job_id": str(job["_id"])})
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return {
+        "result": {"items_count": items_count},
+        "artifact": {
+            "path": path,
+            "filename": f"inventario_inei_completo_{timestamp}.xlsx",
+            "media_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        }
+    }
+
+async def pdf_report_job(job: Dict[str, Any], user: dict, progress) -> Dict[str, Any]:
+    await progress(0, 2)
+    pdf_bytes, items_count = await build_inventory_pdf(user)
+    path = job_artifact_path(job, "pdf")
+    await asyncio.to_thread(write_report_cache, path, pdf_bytes)
+    await progress(2, 2)
+    await log_activity(user, "EXPORT", "report",
+                       details={"type": "pdf", "format": "inventory", "job_id": str(job["_id"])})
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return {
+        "result": {"items_count": items_count},
+        "artifact": {"path": path, "filename": f"inventario_inei_{timestamp}.pdf", "media_type": "application/pdf"}
+    }
+
+async def backup_job(job: Dict[str, Any], user: dict, progress) -> Dict[str, Any]:
+    kind = "incremental" if job["params"].get("incremental") is True else "full"
+    backup_path = await create_backup(kind, progress)
+    await log_activity(user, "BACKUP", "system", details={"type": "job", "kind": kind, "job_id": str(job["_id"])})
+    return {
+        "result": {"file": os.path.basename(backup_path), "kind": kind},
+        "artifact": {"path": backup_path, "filename": os.path.basename(backup_path), "media_type": "application/zip"}
+    }
+
+async def import_excel_job(job: Dict[str, Any], user: dict, progress) -> Dict[str, Any]:
+    summary = await import_inventory_file(job["params"]["upload_path"], user, progress)
+    await log_activity(user, "IMPORT", "inventory", details={
+        "filename": job["params"].get("filename"),
+        "total_rows": summary["total_rows"],
+        "imported_count": summary["imported_count"],
+        "rejected_count": summary["rejected_count"],
+        "job_id": str(job["_id"])
+    })
+    return {"result": summary}
+
+job_manager.register("excel_export", excel_export_job)
+job_manager.register("pdf_report", pdf_report_job)
+job_manager.register("backup", backup_job, roles=[UserRole.ADMIN], params=("incremental",))
+# Una importación a medias no se repite: se informa como fallida. Sus parámetros
+# (upload_path) los fija solo el endpoint de importación, nunca el cliente
+job_manager.register("import_excel", import_excel_job, resumable=False)
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(job["_id"]),
+        "type": job["type"],
+        "status": job["status"],
+        "created_by": job["created_by"],
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "progress": job.get("progress"),
+        "percent": job.get("percent", 0.0),
+        "eta_seconds": job.get("eta_seconds"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "download_url": f"/api/jobs/{job['_id']}/download" if job.get("artifact") else None
+    }
+
+async def get_job_for_user(job_id: str, current_user: dict) -> Dict[str, Any]:
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    job = await db.jobs.find_one({"_id": ObjectId(job_id)})
+    if job is None or (job["created_by"] != current_user["username"] and current_user["role"] != UserRole.ADMIN):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+def cleanup_job_artifacts():
+    """Eliminar artefactos de trabajos con más de JOB_RETENTION_HOURS"""
+    if not os.path.isdir(JOBS_DIR):
+        return
+    cutoff = time.time() - JOB_RETENTION_HOURS * 3600
+    for filename in os.listdir(JOBS_DIR):
+        path = os.path.join(JOBS_DIR, filename)
+        if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(job_request: JobSubmit, current_user: dict = Depends(get_current_user)):
+    """Encolar un trabajo: excel_export, pdf_report o backup"""
+    spec = job_manager.handlers.get(job_request.type)
+    if spec is None or job_request.type == "import_excel":
+        raise HTTPException(status_code=400, detail="Tipo de trabajo no válido")
+    if spec["roles"] and current_user["role"] not in spec["roles"]:
+        raise HTTPException(status_code=403, detail="Permisos insuficientes")
+    
+    params = job_manager.client_params(job_request.type, job_request.params)
+    job = await job_manager.submit(job_request.type, params, current_user)
+    logger.info(f"Trabajo encolado: {job['_id']} ({job_request.type}) por {current_user['username']}")
+    return serialize_job(job)
+
+@app.post("/api/jobs/import/excel", status_code=202)
+async def submit_import_job(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Encolar la importación de un Excel (.xlsx)"""
+    if not (file.filename or "").lower().endswith(".xlsx"):
+        raise HTTPException(status_code=400, detail="El archivo debe ser .xlsx")
+    upload_path = await save_upload_to_temp(file, directory=UPLOAD_FOLDER)
+    job = await job_manager.submit("import_excel", {"upload_path": upload_path, "filename": file.filename},
+                                   current_user)
+    return serialize_job(job)
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 20, current_user: dict = Depends(get_current_user)):
+    """Listar los trabajos recientes del usuario (todos, para admins)"""
+    query = {} if current_user["role"] == UserRole.ADMIN else {"created_by": current_user["username"]}
+    cursor = db.jobs.find(query).sort("created_at", -1).limit(max(1, min(limit, 100)))
+    return [serialize_job(job) async for job in cursor]
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Estado, avance y ETA de un trabajo"""
+    return serialize_job(await get_job_for_user(job_id, current_user))
+
+@app.get("/api/jobs/{job_id}/download")
+async def download_job_artifact(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Descargar el archivo generado por un trabajo terminado"""
+    job = await get_job_for_user(job_id, current_user)
+    artifact = job.get("artifact")
+    if job["status"] != JobStatus.COMPLETED or not artifact:
+        raise HTTPException(status_code=409, detail="El trabajo no tiene archivo disponible")
+    if not os.path.exists(artifact["path"]):
+        raise HTTPException(status_code=410, detail="El archivo del trabajo ya no está disponible")
+    return FileResponse(
+        artifact["path"],
+        media_type=artifact["media_type"],
+        filename=artifact["filename"],
+        headers={"Content-Disposition": f"attachment; filename={artifact['filename']}"}
+    )
+
 # ========================================
 # CONFIGURACION DE SCHEDULER
 # ========================================
 
+async def ensure_indexes():
+    """Crear los índices de base de datos (idempotente)"""
+    await db.inventory.create_index("dni", unique=True)
+    await db.inventory.create_index("dispositivo")
+    await db.inventory.create_index("estado")
+    await db.users.create_index("username", unique=True)
+    await db.users.create_index("email", unique=True)
+    await db.audit_logs.create_index([("timestamp", -1), ("_id", -1)])
+    await db.inventory.create_index("updated_at")
+    await db.inventory.create_index([("persona", 1), ("_id", 1)])
+    await db.inventory.create_index([("estado", 1), ("persona", 1), ("_id", 1)])
+    await db.inventory.create_index([("dispositivo", 1), ("persona", 1), ("_id", 1)])
+    for field in ("control_patrimonial", "correo_personal", "numero_serie", "imei", "telefono"):
+        await db.inventory.create_index(field)
+    await db.inventory.create_index([("persona", "text"), ("modelo", "text")],
+                                    name="inventory_text", default_language="spanish")
+    await db.jobs.create_index([("status", 1), ("created_at", 1)])
+    await db.jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+    await db.jobs.create_index([("created_by", 1), ("created_at", -1)])
+    await db.repairs.create_index([("fecha_ingreso", -1), ("_id", -1)])
+    await db.repairs.create_index([("dni", 1), ("fecha_ingreso", -1)])
+    await db.repairs.create_index([("dispositivo", 1), ("fecha_ingreso", -1)])
+    await db.repairs.create_index([("status", 1), ("fecha_ingreso", -1)])
+    await db.repair_devices.create_index([("reparaciones", -1)])
+    await db.inventory.create_index("robado", partialFilterExpression={"robado": True})
+    await db.inventory.create_index([("estado", 1), ("updated_at", 1)])
+    await db.inventory.create_index("garantia_vence", sparse=True)
+
 @app.on_event("startup")
 async def startup_event():
     """Evento de inicio - configurar scheduler y crear usuario admin por defecto"""
@@ -1067,7 +5379,7 @@ async def startup_event():
         if config("BACKUP_ENABLED", default=True, cast=bool):
             backup_interval = config("BACKUP_INTERVAL_HOURS", default=24, cast=int)
             scheduler.add_job(
-                create_backup,
+                run_scheduled_backup,
                 "interval",
                 hours=backup_interval,
                 id="auto_backup",
@@ -1075,9 +5387,60 @@ async def startup_event():
             )
             logger.info(f"Scheduler configurado: backup cada {backup_interval} horas")
         
+        # Conciliación periódica de contadores materializados de inventario
+        stats_reconcile_minutes = config("INVENTORY_STATS_RECONCILE_MINUTES", default=60, cast=int)
+        scheduler.add_job(
+            reconcile_inventory_stats,
+            "interval",
+            minutes=stats_reconcile_minutes,
+            id="inventory_stats_reconcile",
+            replace_existing=True
+        )
+        scheduler.add_job(
+            reconcile_repair_stats,
+            "interval",
+            minutes=stats_reconcile_minutes,
+            id="repair_stats_reconcile",
+            replace_existing=True
+        )
+        
+        # Instantánea de alertas (la primera evaluación, apenas arranca)
+        scheduler.add_job(
+            NotificationService.refresh_equipment_alerts,
+            "interval",
+            minutes=ALERTS_REFRESH_MINUTES,
+            id="equipment_alerts",
+            next_run_time=datetime.now(),
+            replace_existing=True
+        )
+        logger.info(f"Scheduler configurado: conciliación de contadores cada {stats_reconcile_minutes} minutos")
+        
+        # Limpieza de archivos temporales de reportes y de trabajos
+        scheduler.add_job(
+            cleanup_reports_dir,
+            "interval",
+            hours=1,
+            id="reports_cleanup",
+            replace_existing=True
+        )
+        scheduler.add_job(
+            cleanup_job_artifacts,
+            "interval",
+            hours=1,
+            id="jobs_cleanup",
+            replace_existing=True
+        )
+        
         # Iniciar scheduler
         scheduler.start()
         
+        # Escritor de auditoría en segundo plano
+        audit_writer.start()
+        
+        # Medición del retraso del event loop para /api/metrics
+        global _event_loop_lag_task
+        _event_loop_lag_task = asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL_SECONDS))
+        
         # Crear usuario admin por defecto si no existe
         admin_exists = await db.users.find_one({"role": "admin"})
         if not admin_exists:
@@ -1088,20 +5451,31 @@ async def startup_event():
                 "role": "admin",
                 "is_active": True,
                 "sede": "Arequipa 06 - Socabaya",
-                "hashed_password": get_password_hash("admin123"),
-                "created_at": datetime.now()
+                "hashed_password": await hash_password("admin123"),
+                "created_at": datetime.now(),
+                "updated_at": datetime.now()
             }
             
             await db.users.insert_one(admin_user)
             logger.info("Usuario admin por defecto creado - username: admin, password: admin123")
         
         # Crear índices de base de datos
-        await db.inventory.create_index("dni", unique=True)
-        await db.inventory.create_index("dispositivo")
-        await db.inventory.create_index("estado")
-        await db.users.create_index("username", unique=True)
-        await db.users.create_index("email", unique=True)
-        await db.audit_logs.create_index("timestamp")
+        await ensure_indexes()
+        
+        # Contadores materializados (se crean si aún no existen)
+        if not await db.inventory_stats.find_one({"_id": INVENTORY_STATS_ID}):
+            await reconcile_inventory_stats()
+        if not await db.repair_stats.find_one({"_id": REPAIR_STATS_ID}):
+            await reconcile_repair_stats()
+        await NotificationService.load_snapshot()
+        
+        # Índices de nombres: se construyen en segundo plano; mientras tanto
+        # las sugerencias responden con index_ready=false
+        global _name_index_task
+        _name_index_task = asyncio.create_task(rebuild_name_indexes())
+        
+        # Trabajos en segundo plano (reencola los interrumpidos)
+        await job_manager.start()
         
         logger.info("Sistema iniciado correctamente - INEI Inventory v2.0")
         
@@ -1113,6 +5487,14 @@ async def shutdown_event():
     """Evento de cierre"""
     try:
         scheduler.shutdown()
+        if _event_loop_lag_task is not None:
+            _event_loop_lag_task.cancel()
+        await dashboard_feed.stop()
+        await job_manager.stop()
+        await audit_writer.stop()
+        password_executor.shutdown(wait=False)
+        if _report_executor is not None:
+            _report_executor.shutdown(wait=False, cancel_futures=True)
         logger.info("Sistema cerrado correctamente")
     except Exception as e:
         logger.error(f"Error en shutdown: {e}")
@@ -69,9 +69,68 @@ const Dashboard = () => {
 
     loadData();
     
-    // Actualizar cada 30 segundos
-    const interval = setInterval(loadData, 30000);
-    return () => clearInterval(interval);
+    // Actualizaciones en vivo (Server-Sent Events). El token de sesión no va en
+    // la URL: se pide un ticket de corta duración para cada conexión, así que
+    // al cortarse el stream se reconecta con un ticket nuevo
+    const baseURL = axios.defaults.baseURL || '';
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const connect = async () => {
+      let ticket;
+      try {
+        const response = await axios.post('/api/dashboard/stream-ticket');
+        ticket = response.data.ticket;
+      } catch (error) {
+        // 401: el interceptor de axios ya cerró la sesión
+        if (error.response?.status !== 401 && !closed) {
+          retryTimer = setTimeout(connect, 5000);
+        }
+        return;
+      }
+      if (closed) return;
+
+      source = new EventSource(`${baseURL}/api/dashboard/stream?ticket=${encodeURIComponent(ticket)}`);
+
+      source.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        setStats(prev => ({ ...prev, ...data.stats, recent_activities: data.recent_activities }));
+        setAlerts(data.alerts.alerts);
+      });
+
+      source.addEventListener('stats', (event) => {
+        const delta = JSON.parse(event.data);
+        setStats(prev => ({ ...prev, ...delta }));
+      });
+
+      source.addEventListener('alerts', (event) => {
+        setAlerts(JSON.parse(event.data).alerts);
+      });
+
+      source.addEventListener('activity', (event) => {
+        const activity = JSON.parse(event.data);
+        setStats(prev => prev && ({
+          ...prev,
+          recent_activities: [activity, ...(prev.recent_activities || [])].slice(0, 10)
+        }));
+      });
+
+      source.onerror = () => {
+        source.close();
+        if (!closed) {
+          retryTimer = setTimeout(connect, 5000);
+        }
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
   }, []);
 
   const handleRefresh = async () => {
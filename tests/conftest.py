@@ -0,0 +1,11 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+# Las pruebas no necesitan un MongoDB real (las que usan la base van sobre
+# mongomock-motor, si está instalado), pero el módulo crea el cliente al importarse
+os.environ.setdefault("DB_NAME", "inei_inventory_test")
+sys.path.insert(0, BACKEND_DIR)
+# server.py escribe sus logs en rutas relativas a backend/
+os.chdir(BACKEND_DIR)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class Clock(datetime):
+    """datetime.now() que avanza un minuto por llamada (nombres de backup únicos)"""
+    current = datetime(2025, 3, 14, 9, 0, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.current += timedelta(minutes=1)
+        return datetime.fromisoformat(cls.current.isoformat())
+
+
+@pytest.fixture
+def backups(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["inei_inventory_test"])
+    monkeypatch.setattr(server, "BACKUP_DIR", str(tmp_path))
+    monkeypatch.setattr(server, "BACKUP_CHAIN_INDEX", str(tmp_path / "backup_chain.json"))
+    monkeypatch.setattr(server, "datetime", Clock)
+    # restore_backup reconstruye los índices de nombres globales; no tocarlos
+    monkeypatch.setattr(server, "NAME_INDEXES", {})
+    return tmp_path
+
+
+async def add_item(dni: str):
+    now = Clock.now()
+    await server.db.inventory.insert_one({
+        "persona": f"Persona {dni}", "dni": dni, "dispositivo": "Tablet", "modelo": "Galaxy Tab A",
+        "estado": "bien", "robado": False, "created_at": now, "updated_at": now
+    })
+
+
+async def inventory_dnis():
+    return sorted(doc["dni"] for doc in await server.db.inventory.find({}, {"dni": 1}).to_list(length=None))
+
+
+def test_restore_seals_the_open_chain(backups):
+    async def scenario():
+        await add_item("00000001")
+        await add_item("00000002")
+        full = await server.create_backup("full")
+        await add_item("00000003")
+        incremental = await server.create_backup("incremental")
+        assert incremental.endswith("_inc.zip")
+
+        # Volver al estado del completo: el item 3 desaparece sin dejar rastro en updated_at
+        await server.restore_backup(full, mode="replace")
+        assert await inventory_dnis() == ["00000001", "00000002"]
+        assert server.load_backup_chains()["chains"][-1]["sealed"]
+
+        # El siguiente backup (programado o incremental) abre una cadena nueva
+        after_restore = await server.create_backup("incremental")
+        assert not after_restore.endswith("_inc.zip")
+        chains = server.load_backup_chains()["chains"]
+        assert [chain["base"] for chain in chains] == [os.path.basename(full), os.path.basename(after_restore)]
+        assert server.resolve_backup_chain(after_restore) == [after_restore]
+
+        # Restaurar esa cadena reproduce la base tal como quedó tras la restauración
+        await add_item("00000004")
+        await server.restore_backup(after_restore, mode="replace")
+        assert await inventory_dnis() == ["00000001", "00000002"]
+
+    asyncio.run(scenario())
+
+
+def test_incremental_restore_updates_users_but_keeps_passwords(backups):
+    async def scenario():
+        now = Clock.now()
+        user_id = (await server.db.users.insert_one({
+            "username": "ana", "full_name": "Ana", "role": "operator", "sede": "Socabaya", "is_active": True,
+            "hashed_password": "hash-original", "created_at": now, "updated_at": now
+        })).inserted_id
+        await server.create_backup("full")
+        await server.db.users.update_one({"_id": user_id}, {"$set": {
+            "role": "admin", "is_active": False, "updated_at": Clock.now()
+        }})
+        incremental = await server.create_backup("incremental")
+
+        # Estado actual distinto al del backup, con otra contraseña
+        await server.db.users.update_one({"_id": user_id}, {"$set": {
+            "role": "viewer", "hashed_password": "hash-nuevo"
+        }})
+        await server.restore_backup(incremental, mode="merge")
+        user = await server.db.users.find_one({"_id": user_id})
+        assert (user["role"], user["is_active"]) == ("admin", False)
+        assert user["hashed_password"] == "hash-nuevo"
+        assert isinstance(user["updated_at"], datetime)
+
+    asyncio.run(scenario())
+
+
+def test_restore_converts_only_known_date_fields():
+    document = server._restore_dates({
+        "fecha_entrega": "2025-03-14T09:00:00",
+        "updated_at": "2025-03-14T09:00:00.123456",
+        "observaciones": "2025-03-14T09:00:00",
+        "details": {"login_time": "2025-03-14T09:00:00"}
+    })
+    assert document["fecha_entrega"] == datetime(2025, 3, 14, 9, 0, 0)
+    assert isinstance(document["updated_at"], datetime)
+    assert document["observaciones"] == "2025-03-14T09:00:00"
+    assert document["details"] == {"login_time": "2025-03-14T09:00:00"}
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import server
+
+
+def test_inventory_cursor_round_trip():
+    item_id = ObjectId()
+    cursor = server.encode_inventory_cursor("Núñez Pérez, José", item_id)
+    assert "=" not in cursor
+    assert server.decode_inventory_cursor(cursor) == ("Núñez Pérez, José", item_id)
+
+
+def test_keyset_cursor_round_trip():
+    log_id = ObjectId()
+    timestamp = datetime(2025, 3, 14, 9, 26, 53, 589793)
+    cursor = server.encode_keyset_cursor(timestamp, log_id)
+    assert server.decode_keyset_cursor(cursor) == (timestamp, log_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "no-es-un-cursor", "e30", "eyJwIjogIngiLCAiaSI6ICIxMjMifQ"])
+def test_invalid_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        server.decode_inventory_cursor(cursor)
+    with pytest.raises(ValueError):
+        server.decode_keyset_cursor(cursor)
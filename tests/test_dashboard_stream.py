@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import server
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["inei_inventory_test"])
+    monkeypatch.setattr(server, "DASHBOARD_HEARTBEAT_SECONDS", 0.05)
+    server.principal_cache.clear()
+    return server.dashboard_feed
+
+
+async def issue_ticket(username: str) -> tuple:
+    await server.db.users.insert_one({"username": username, "full_name": username, "role": "viewer",
+                                      "is_active": True})
+    token = server.create_access_token({"sub": username})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return token, (await server.create_dashboard_stream_ticket(credentials))["ticket"]
+
+
+def test_ticket_is_not_a_session_token(feed):
+    async def scenario():
+        token, ticket = await issue_ticket("ana")
+        with pytest.raises(HTTPException) as error:
+            await server.authenticate_token(ticket)
+        assert error.value.status_code == 401
+        with pytest.raises(HTTPException) as error:
+            await server.dashboard_stream(ConnectedRequest(), token)
+        assert error.value.status_code == 401
+
+    asyncio.run(scenario())
+
+
+def test_stream_closes_when_user_is_deactivated(feed):
+    async def scenario():
+        _, ticket = await issue_ticket("ana")
+        response = await server.dashboard_stream(ConnectedRequest(), ticket)
+        events = response.body_iterator
+        try:
+            assert (await events.__anext__()).startswith(b"event: snapshot")
+            assert await events.__anext__() == b": ping\n\n"
+
+            await server.db.users.update_one({"username": "ana"}, {"$set": {"is_active": False}})
+            with pytest.raises(StopAsyncIteration):
+                while True:
+                    await asyncio.wait_for(events.__anext__(), timeout=2)
+        finally:
+            await events.aclose()
+            await feed.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import server
+
+USER = {"username": "admin", "full_name": "Administrador"}
+COLUMNS = dict(enumerate(server.IMPORT_FIELDS))
+
+
+def make_row(**overrides):
+    values = {
+        "persona": "María Quispe", "dni": "01234567", "dispositivo": "Tablet", "control_patrimonial": "CP-1",
+        "modelo": "Galaxy Tab A", "numero_serie": "SN1", "imei": "", "funda_tablet": "Sí", "plan_datos": "No",
+        "power_tech": "", "telefono": "987654321", "correo_personal": "maria@example.com",
+        "fecha_entrega": "15/03/2025", "estado": "Bien", "robado": "No", "motivo_reparacion": None,
+        "ubicacion_actual": None, "observaciones": None, "valor_estimado": "350.5", "garantia_vence": None,
+        "proveedor": None, "fecha_compra": None
+    }
+    values.update(overrides)
+    return tuple(values[field] for field in server.IMPORT_FIELDS)
+
+
+def test_valid_row_builds_document():
+    documents, rows, errors = server.validate_import_chunk([(2, make_row())], COLUMNS, set(), USER)
+    assert errors == [] and rows == [2]
+    document = documents[0]
+    assert document["estado"] == "bien"
+    assert document["funda_tablet"] is True and document["power_tech"] is False
+    assert document["valor_estimado"] == 350.5
+    assert document["fecha_entrega"] == datetime(2025, 3, 15)
+    assert document["imei"] is None
+    assert document["created_by"] == "admin" and document["responsable_entrega"] == "Administrador"
+
+
+def test_numeric_dni_keeps_leading_zeros():
+    documents, _, errors = server.validate_import_chunk([(2, make_row(dni=1234567))], COLUMNS, set(), USER)
+    assert errors == []
+    assert documents[0]["dni"] == "01234567"
+
+
+def test_invalid_rows_are_reported_per_row():
+    rows = [
+        (2, make_row()),
+        (3, make_row(dni="123", estado="roto")),
+        (4, make_row(dni="01234567", telefono="12", valor_estimado="-1")),
+    ]
+    documents, document_rows, errors = server.validate_import_chunk(rows, COLUMNS, set(), USER)
+    assert document_rows == [2] and len(documents) == 1
+    by_row = {error["row"]: error["errors"] for error in errors}
+    assert set(by_row) == {3, 4}
+    assert any("DNI" in message for message in by_row[3])
+    assert any("Estado" in message for message in by_row[3])
+    assert "DNI repetido en el archivo" in by_row[4]
+    assert any("Teléfono" in message for message in by_row[4])
+    assert any("Valor Estimado" in message for message in by_row[4])
+
+
+def test_dnis_seen_in_previous_chunks_are_rejected():
+    seen = set()
+    server.validate_import_chunk([(2, make_row())], COLUMNS, seen, USER)
+    _, _, errors = server.validate_import_chunk([(5002, make_row())], COLUMNS, seen, USER)
+    assert errors[0]["row"] == 5002
+    assert "DNI repetido en el archivo" in errors[0]["errors"]
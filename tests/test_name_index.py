@@ -0,0 +1,67 @@
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("a, b, limit, expected", [
+    ("perez", "perez", 2, 0),
+    ("perez", "peres", 2, 1),
+    ("quispe", "qispe", 1, 1),
+    ("gonzales", "gonzalez", 2, 1),
+    ("mamani", "mamanu", 0, 1),
+    ("huaman", "guzman", 1, 2),
+    ("ana", "anabel", 2, 3),
+])
+def test_bounded_edit_distance(a, b, limit, expected):
+    assert server.bounded_edit_distance(a, b, limit) == expected
+
+
+def test_fold_name_strips_accents_and_punctuation():
+    assert server.fold_name("  Núñez-Pérez, José ") == ("nunez", "perez", "jose")
+    assert server.fold_name(None) == ()
+
+
+def build(pairs, incremental):
+    index = server.NameIndex("test", "test", "persona")
+    if incremental:
+        for key, raw in pairs:
+            index.add(key, raw)
+    else:
+        index.load(pairs)
+        index.finish_load()
+    return index
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_search_prefix_accents_and_typos(incremental):
+    index = build([("1", "José Pérez Quispe"), ("2", "Jose Perez Quispe"), ("3", "Rosa Mamani")], incremental)
+    
+    results = index.search("perez qui")
+    assert results[0]["count"] == 2 and results[0]["distance"] == 0
+    assert sorted(results[0]["ids"]) == ["1", "2"]
+    assert index.search("mamany")[0]["name"] == "Rosa Mamani"
+    assert index.search("xyz") == []
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_update_and_remove(incremental):
+    index = build([("1", "Rosa Mamani"), ("2", "Luis Condori")], incremental)
+    index.add("1", "Rosa Huaman")
+    assert index.search("mamani") == []
+    assert index.search("huaman")[0]["ids"] == ["1"]
+    
+    index.remove("2")
+    assert index.search("condori") == []
+    assert index.metrics()["documents"] == 1
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_repeated_token_name(incremental):
+    index = build([("1", "Quispe Quispe"), ("2", "Maria Maria")], incremental)
+    index.add("3", "María María")
+    assert index.metrics()["distinct_names"] == 2
+    assert sorted(index.search("maria")[0]["ids"]) == ["2", "3"]
+    
+    index.remove("1")
+    assert index.search("quispe") == []
+    assert index.metrics()["tokens"] == 1
@@ -0,0 +1,52 @@
+import pytest
+
+import server
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_returns_copy_until_ttl(clock):
+    cache = server.PrincipalCache(max_size=10, ttl_seconds=30)
+    cache.put("ana", "token-1", {"username": "ana", "role": "admin"})
+    
+    user = cache.get("ana", "token-1")
+    assert user == {"username": "ana", "role": "admin"}
+    user["role"] = "viewer"
+    assert cache.get("ana", "token-1")["role"] == "admin"
+    assert cache.get("ana", "otro-token") is None
+    
+    clock[0] += 31
+    assert cache.get("ana", "token-1") is None
+    assert cache.metrics()["size"] == 0
+
+
+def test_invalidate_drops_every_token_of_user(clock):
+    cache = server.PrincipalCache(max_size=10, ttl_seconds=30)
+    cache.put("ana", "token-1", {"username": "ana"})
+    cache.put("ana", "token-2", {"username": "ana"})
+    cache.put("luis", "token-3", {"username": "luis"})
+    
+    cache.invalidate("ana")
+    assert cache.get("ana", "token-1") is None
+    assert cache.get("ana", "token-2") is None
+    assert cache.get("luis", "token-3") == {"username": "luis"}
+    assert cache.invalidations == 2
+
+
+def test_lru_eviction_and_disabled_cache(clock):
+    cache = server.PrincipalCache(max_size=2, ttl_seconds=30)
+    cache.put("a", "t", {"username": "a"})
+    cache.put("b", "t", {"username": "b"})
+    cache.get("a", "t")
+    cache.put("c", "t", {"username": "c"})
+    assert cache.get("b", "t") is None
+    assert cache.get("a", "t") is not None
+    
+    disabled = server.PrincipalCache(max_size=10, ttl_seconds=0)
+    disabled.put("a", "t", {"username": "a"})
+    assert disabled.get("a", "t") is None
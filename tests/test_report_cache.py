@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import server
+
+
+def test_cache_key_depends_on_epoch_and_version():
+    snapshot = {"epoch": "a", "data_version": 7, "updated_at": None}
+    key = server.report_cache_key("inventory_pdf", snapshot, full_name="Ana")
+    assert key == server.report_cache_key("inventory_pdf", dict(snapshot), full_name="Ana")
+    assert key != server.report_cache_key("inventory_pdf", {**snapshot, "epoch": "b"}, full_name="Ana")
+    assert key != server.report_cache_key("inventory_pdf", {**snapshot, "data_version": 8}, full_name="Ana")
+
+
+def test_recreated_stats_document_gets_a_new_epoch(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["inei_inventory_test"])
+
+    async def scenario():
+        await server.apply_inventory_stats_change(new_items=[{"estado": "bien", "dispositivo": "Tablet"}])
+        first = await server.get_inventory_data_snapshot()
+        assert first["data_version"] == 1 and isinstance(first["updated_at"], datetime)
+
+        # generate_synthetic_data.py --replace o una base nueva: la versión vuelve a 1
+        await server.db.inventory_stats.drop()
+        await server.apply_inventory_stats_change(new_items=[{"estado": "bien", "dispositivo": "Tablet"}])
+        second = await server.get_inventory_data_snapshot()
+        assert second["data_version"] == 1
+        assert second["epoch"] != first["epoch"]
+
+        # Documento sin época (anterior a este cambio): se le asigna una y se conserva
+        await server.db.inventory_stats.update_one({"_id": server.INVENTORY_STATS_ID}, {"$unset": {"epoch": ""}})
+        third = await server.get_inventory_data_snapshot()
+        assert third["epoch"] not in (first["epoch"], second["epoch"])
+        assert (await server.get_inventory_data_snapshot())["epoch"] == third["epoch"]
+
+    asyncio.run(scenario())
+
+
+def test_replace_load_keeps_epoch_and_bumps_version(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import generate_synthetic_data as generator
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["inei_inventory_test"])
+
+    async def scenario():
+        await server.apply_inventory_stats_change(new_items=[{"estado": "bien", "dispositivo": "Tablet"}])
+        before = await server.get_inventory_data_snapshot()
+
+        # Otro documento con los mismos contadores: sin la versión nueva, el reporte cacheado seguiría vigente
+        await generator.prepare_database(replace=True)
+        await server.db.inventory.insert_one({"persona": "Otra", "estado": "bien", "dispositivo": "Tablet",
+                                              "robado": False})
+        await generator.finish_load()
+        after = await server.get_inventory_data_snapshot()
+        assert after["epoch"] == before["epoch"]
+        assert after["data_version"] > before["data_version"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,67 @@
+import server
+
+COUNTERS = {
+    "total_items": 100000, "items_robados": 1000, "items_bien": 90000, "items_mal_estado": 9000,
+    "items_en_reparacion": 1000, "devices_by_type": {"Tablet": 80000, "Laptop": 20000}
+}
+
+
+def plan(**fields):
+    return server.plan_inventory_search(server.InventorySearch(**fields), COUNTERS)
+
+
+def test_full_dni_drives_with_hint():
+    result = plan(dni="01234567", estado="bien", persona="Maria")
+    assert result["driver"] == "dni:exact"
+    assert result["hint"] == [("dni", 1)]
+    assert {"dni": "01234567"} in result["query"]["$and"]
+
+
+def test_selective_estado_beats_broad_prefix():
+    result = plan(estado="en reparacion", dispositivo="Tab")
+    assert result["driver"] == "estado:exact"
+    assert result["hint"] == [("estado", 1), ("persona", 1), ("_id", 1)]
+
+
+def test_prefix_filters_are_escaped_and_anchored():
+    result = plan(numero_serie="A.1")
+    assert result["query"] == {"numero_serie": {"$regex": "^A\\.1"}}
+
+
+def test_empty_search_has_no_driver():
+    result = plan()
+    assert result["driver"] is None and result["query"] == {} and result["hint"] is None
+    assert result["estimate"] == 100000.0
+
+
+def test_text_estimate_shrinks_with_more_words():
+    one = plan(persona="Garcia")["predicates"][0]["estimate"]
+    two = plan(persona="Garcia Perez")["predicates"][0]["estimate"]
+    assert two < one
+
+
+def test_full_words_drive_with_text_index():
+    result = plan(persona="Garcia Perez", estado="bien")
+    assert result["driver"] == "persona:text"
+    assert result["query"]["$and"][0] == {"$text": {"$search": "Garcia Perez"}}
+    assert result["hint"] is None
+
+
+def test_partial_words_fall_back_to_regex():
+    result = plan(persona="Garc", estado="mal estado")
+    assert result["driver"] == "estado:exact"
+    assert not any("$text" in clause for clause in result["query"]["$and"])
+    
+    assert plan(persona="Garc")["driver"] is None
+
+
+def test_name_index_vocabulary_decides_full_words(monkeypatch):
+    index = server.NameIndex("inventory", "inventory", "persona")
+    index.load([("1", "José García Pérez")])
+    index.finish_load()
+    index.ready = True
+    monkeypatch.setattr(server, "inventory_name_index", index)
+    
+    assert plan(persona="garcía perez")["driver"] == "persona:text"
+    assert plan(persona="José")["driver"] == "persona:text"
+    assert plan(persona="Garci")["driver"] is None
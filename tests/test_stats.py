@@ -0,0 +1,20 @@
+import server
+
+
+def test_counters_equal_ignores_zero_keys():
+    a = {"total_items": 3, "robados": 1, "por_estado": {"bien": 2, "mal estado": 1, "en reparacion": 0},
+         "por_dispositivo": {"Tablet": 3}, "por_sede": {}}
+    b = {"total_items": 3, "robados": 1, "por_estado": {"bien": 2, "mal estado": 1},
+         "por_dispositivo": {"Tablet": 3, "Laptop": 0}}
+    assert server._counters_equal(a, b)
+
+
+def test_counters_equal_detects_drift():
+    a = {"total_items": 3, "robados": 0, "por_estado": {"bien": 3}}
+    assert not server._counters_equal(a, {**a, "total_items": 4})
+    assert not server._counters_equal(a, {**a, "por_estado": {"bien": 2, "mal estado": 1}})
+    assert not server._counters_equal(a, {**a, "por_sede": {"Socabaya": 3}})
+
+
+def test_counters_equal_missing_totals_count_as_zero():
+    assert server._counters_equal({}, {"total_items": 0, "robados": 0, "por_estado": {"bien": 0}})